@@ -19,13 +19,14 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 
+from app.api.changelog.models import SQLModel as ChangeLogSQLModel
 from app.api.runs.models import SQLModel as RunSQLModel
 from app.api.user.models import SQLModel as UserSQLModel
 from app.core.config import Settings
 
 merged_metadata = MetaData()
 
-for model in [RunSQLModel, UserSQLModel]:
+for model in [ChangeLogSQLModel, RunSQLModel, UserSQLModel]:
     for table in model.metadata.tables.values():
         table.to_metadata(merged_metadata)
 
@@ -0,0 +1,50 @@
+"""run rollups
+
+Revision ID: 3f0d8a6c5e21
+Revises: b7e2c94f1a3d
+Create Date: 2026-10-18 11:42:07.518832
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f0d8a6c5e21'
+down_revision: Union[str, Sequence[str], None] = 'b7e2c94f1a3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('runrollup',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.Enum('WEEKLY', 'MONTHLY', 'YEARLY', name='runrollupperiod'), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('distance_m', sa.Integer(), nullable=False),
+    sa.Column('duration_s', sa.Integer(), nullable=False),
+    sa.Column('calories', sa.Integer(), nullable=False),
+    sa.Column('vo2max_sum', sa.Integer(), nullable=False),
+    sa.Column('vo2max_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'period', 'period_start')
+    )
+    for period, precision in [('WEEKLY', 'week'), ('MONTHLY', 'month'), ('YEARLY', 'year')]:
+        op.execute(f"""
+            INSERT INTO runrollup (user_id, period, period_start, distance_m,
+                                   duration_s, calories, vo2max_sum, vo2max_count)
+            SELECT user_id, '{period}', date(date_trunc('{precision}', run_date)),
+                   sum(distance_m), sum(duration_s), sum(calories), sum(vo2max), count(*)
+            FROM run
+            GROUP BY user_id, date(date_trunc('{precision}', run_date))
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('runrollup')
+    sa.Enum(name='runrollupperiod').drop(op.get_bind())
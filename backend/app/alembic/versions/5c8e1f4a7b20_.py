@@ -0,0 +1,31 @@
+"""key run date index on id for keyset pagination
+
+Revision ID: 5c8e1f4a7b20
+Revises: 9a4c1e7b3d58
+Create Date: 2026-10-18 15:02:41.317580
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8e1f4a7b20'
+down_revision: Union[str, Sequence[str], None] = '9a4c1e7b3d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_run_user_id_run_date', table_name='run')
+    op.create_index('ix_run_user_id_run_date', 'run', ['user_id', 'run_date', 'id'], unique=False, postgresql_include=['distance_m', 'duration_s', 'calories', 'vo2max'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_run_user_id_run_date', table_name='run')
+    op.create_index('ix_run_user_id_run_date', 'run', ['user_id', 'run_date'], unique=False, postgresql_include=['id', 'distance_m', 'duration_s', 'calories', 'vo2max'])
@@ -0,0 +1,72 @@
+"""change log for continuous backups
+
+Revision ID: 7d2f9b1c4e63
+Revises: 5c8e1f4a7b20
+Create Date: 2026-10-18 16:24:08.519204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2f9b1c4e63'
+down_revision: Union[str, Sequence[str], None] = '5c8e1f4a7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the source tables, leaderboards and rollups are rebuilt from them. The
+# user data version is bumped by every write so updates to it alone are not
+# logged
+TRACKED_TABLES = {
+    'user': 'INSERT OR DELETE OR UPDATE OF id, email, full_name',
+    'run': 'INSERT OR UPDATE OR DELETE',
+    'personalbests': 'INSERT OR UPDATE OR DELETE',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('changelog',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('table_name', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('operation', sqlmodel.sql.sqltypes.AutoString(length=6), nullable=False),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("""
+        CREATE FUNCTION record_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO changelog (table_name, operation, data)
+                VALUES (TG_TABLE_NAME, TG_OP, to_jsonb(OLD));
+                RETURN OLD;
+            END IF;
+
+            INSERT INTO changelog (table_name, operation, data)
+            VALUES (TG_TABLE_NAME, TG_OP, to_jsonb(NEW));
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    for table, events in TRACKED_TABLES.items():
+        op.execute(f"""
+            CREATE TRIGGER {table}_changelog
+            AFTER {events} ON "{table}"
+            FOR EACH ROW EXECUTE FUNCTION record_change()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRACKED_TABLES:
+        op.execute(f'DROP TRIGGER {table}_changelog ON "{table}"')
+
+    op.execute('DROP FUNCTION record_change()')
+    op.drop_table('changelog')
@@ -0,0 +1,40 @@
+"""user passwords
+
+Revision ID: 9957ed098090
+Revises: c4a8e2f61d97
+Create Date: 2026-10-18 19:52:14.369559
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9957ed098090'
+down_revision: Union[str, Sequence[str], None] = 'c4a8e2f61d97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# password changes are logged so continuous backups restore logins
+CHANGELOG_TRIGGER = """
+    CREATE TRIGGER user_changelog
+    AFTER INSERT OR DELETE OR UPDATE OF {columns} ON "user"
+    FOR EACH ROW EXECUTE FUNCTION record_change()
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('password_hash', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True))
+    op.execute('DROP TRIGGER user_changelog ON "user"')
+    op.execute(CHANGELOG_TRIGGER.format(columns='id, email, full_name, password_hash'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER user_changelog ON "user"')
+    op.execute(CHANGELOG_TRIGGER.format(columns='id, email, full_name'))
+    op.drop_column('user', 'password_hash')
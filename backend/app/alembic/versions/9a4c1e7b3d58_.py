@@ -0,0 +1,29 @@
+"""user data version
+
+Revision ID: 9a4c1e7b3d58
+Revises: e41b6d2a9c07
+Create Date: 2026-10-18 14:03:12.661470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c1e7b3d58'
+down_revision: Union[str, Sequence[str], None] = 'e41b6d2a9c07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user', 'data_version')
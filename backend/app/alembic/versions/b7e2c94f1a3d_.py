@@ -0,0 +1,59 @@
+"""personal best leaderboard
+
+Revision ID: b7e2c94f1a3d
+Revises: 6ae48025abc4
+Create Date: 2026-10-18 10:12:41.204318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c94f1a3d'
+down_revision: Union[str, Sequence[str], None] = '6ae48025abc4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('personalbestrun',
+    sa.Column('personal_best_id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['personal_best_id'], ['personalbests.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['run_id'], ['run.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('personal_best_id', 'run_id')
+    )
+    op.create_index(op.f('ix_personalbestrun_run_id'), 'personalbestrun', ['run_id'], unique=False)
+    op.execute("""
+        INSERT INTO personalbestrun (personal_best_id, run_id)
+        SELECT personal_best_id, run_id FROM (
+            SELECT personalbests.id AS personal_best_id,
+                   run.id AS run_id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY personalbests.id
+                       ORDER BY CASE
+                           WHEN personalbests.type = 'SPEED' THEN run.duration_s
+                           WHEN personalbests.type = 'DURATION' THEN -run.duration_s
+                           ELSE -run.distance_m
+                       END, run.id
+                   ) AS position
+            FROM personalbests
+            JOIN run ON run.user_id = personalbests.user_id
+                AND (personalbests.min_distance_m IS NULL
+                     OR run.distance_m >= personalbests.min_distance_m)
+                AND (personalbests.max_distance_m IS NULL
+                     OR run.distance_m <= personalbests.max_distance_m)
+        ) AS ranking
+        WHERE position <= 10
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_personalbestrun_run_id'), table_name='personalbestrun')
+    op.drop_table('personalbestrun')
@@ -0,0 +1,66 @@
+"""stored run speed for pace ranking, filters and sorting
+
+Revision ID: c4a8e2f61d97
+Revises: 7d2f9b1c4e63
+Create Date: 2026-10-18 18:41:27.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a8e2f61d97'
+down_revision: Union[str, Sequence[str], None] = '7d2f9b1c4e63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SPEED_SQL = (
+    "CASE WHEN duration_s > 0 "
+    "THEN distance_m::float8 * 3600 / (duration_s::float8 * 1000) "
+    "ELSE 0 END"
+)
+
+# refill the speed leaderboards ranked by the given order
+REBUILD_SPEED_LEADERBOARDS = """
+    DELETE FROM personalbestrun
+    USING personalbests
+    WHERE personalbests.id = personalbestrun.personal_best_id
+        AND personalbests.type = 'SPEED';
+
+    INSERT INTO personalbestrun (personal_best_id, run_id)
+    SELECT personal_best_id, run_id FROM (
+        SELECT personalbests.id AS personal_best_id,
+               run.id AS run_id,
+               ROW_NUMBER() OVER (
+                   PARTITION BY personalbests.id
+                   ORDER BY {order}, run.id
+               ) AS position
+        FROM personalbests
+        JOIN run ON run.user_id = personalbests.user_id
+            AND (personalbests.min_distance_m IS NULL
+                 OR run.distance_m >= personalbests.min_distance_m)
+            AND (personalbests.max_distance_m IS NULL
+                 OR run.distance_m <= personalbests.max_distance_m)
+        WHERE personalbests.type = 'SPEED'
+    ) AS ranking
+    WHERE position <= 10
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('run', sa.Column('speed_kmh', sa.Double(), sa.Computed(SPEED_SQL, persisted=True), nullable=False))
+    op.create_index('ix_run_user_id_speed_kmh', 'run', ['user_id', 'speed_kmh', 'id'], unique=False)
+    # speed leaderboards were ranked by duration alone
+    op.execute(REBUILD_SPEED_LEADERBOARDS.format(order='-run.speed_kmh'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(REBUILD_SPEED_LEADERBOARDS.format(order='run.duration_s'))
+    op.drop_index('ix_run_user_id_speed_kmh', table_name='run')
+    op.drop_column('run', 'speed_kmh')
@@ -0,0 +1,33 @@
+"""run and personal best indexes
+
+Revision ID: e41b6d2a9c07
+Revises: 3f0d8a6c5e21
+Create Date: 2026-10-18 12:31:55.904126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41b6d2a9c07'
+down_revision: Union[str, Sequence[str], None] = '3f0d8a6c5e21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_run_user_id_run_date', 'run', ['user_id', 'run_date'], unique=False, postgresql_include=['id', 'distance_m', 'duration_s', 'calories', 'vo2max'])
+    op.create_index('ix_run_user_id_distance_m', 'run', ['user_id', 'distance_m'], unique=False, postgresql_include=['id', 'duration_s'])
+    op.create_index('ix_personalbests_user_id_sort_order', 'personalbests', ['user_id', 'sort_order'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_personalbests_user_id_sort_order', table_name='personalbests')
+    op.drop_index('ix_run_user_id_distance_m', table_name='run')
+    op.drop_index('ix_run_user_id_run_date', table_name='run')
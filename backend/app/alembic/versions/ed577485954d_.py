@@ -0,0 +1,56 @@
+"""change log transactions, change log off switch
+
+Revision ID: ed577485954d
+Revises: 9957ed098090
+Create Date: 2026-10-18 20:37:05.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ed577485954d'
+down_revision: Union[str, Sequence[str], None] = '9957ed098090'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# changes are not logged by sessions with the change log turned off, as
+# the application and scripts do in development where changes are never
+# shipped
+RECORD_CHANGE = """
+    CREATE OR REPLACE FUNCTION record_change() RETURNS trigger AS $$
+    BEGIN
+        {guard}
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO changelog (table_name, operation, data)
+            VALUES (TG_TABLE_NAME, TG_OP, to_jsonb(OLD));
+            RETURN OLD;
+        END IF;
+
+        INSERT INTO changelog (table_name, operation, data)
+        VALUES (TG_TABLE_NAME, TG_OP, to_jsonb(NEW));
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+CHANGE_LOG_GUARD = """
+        IF current_setting('treadmilltracker.change_log', true) = 'off' THEN
+            RETURN NULL;
+        END IF;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('changelog', sa.Column('txid', sa.BigInteger(), server_default=sa.text('pg_current_xact_id()::text::bigint'), nullable=True))
+    op.execute(RECORD_CHANGE.format(guard=CHANGE_LOG_GUARD))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(RECORD_CHANGE.format(guard=''))
+    op.drop_column('changelog', 'txid')
@@ -0,0 +1,30 @@
+from sqlmodel import SQLModel
+
+
+class PoolMetricsPublic(SQLModel):
+    pool_size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    overflow_max: int
+    checkouts: int
+    checkout_wait_avg_ms: float
+    checkout_wait_max_ms: float
+    checkout_timeouts: int
+    connections_created: int
+    invalidations: int
+    idle_pings: int
+    idle_ping_failures: int
+
+
+class CacheMetricsPublic(SQLModel):
+    hits: int
+    misses: int
+    entries: int | None = None
+    evictions: int | None = None
+    expirations: int | None = None
+
+
+class MetricsPublic(SQLModel):
+    pools: dict[str, PoolMetricsPublic]
+    response_cache: CacheMetricsPublic
@@ -0,0 +1,25 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, status
+from fastapi_utils.cbv import cbv
+
+from app.api.admin.models import MetricsPublic
+from app.core.authentication import get_current_user
+from app.core.cache import response_cache
+from app.core.database_manager import database_manager
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@cbv(router)
+class AdminRouter:
+    def __init__(self, user_id: Annotated[int, Depends(get_current_user)]):
+        self.user_id = user_id
+
+    @router.get("/metrics", status_code=status.HTTP_200_OK)
+    def get_metrics(self) -> MetricsPublic:
+        """retrieve database pool and response cache metrics"""
+        return MetricsPublic(
+            pools=database_manager.get_pool_metrics(),
+            response_cache=response_cache.metrics(),
+        )
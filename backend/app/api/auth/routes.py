@@ -1,16 +1,79 @@
 import secrets
-from fastapi import APIRouter, Request
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import status
 from fastapi_utils.cbv import cbv
+from starlette.concurrency import run_in_threadpool
+
+from app.api.user.models import User, UserLogin, UserPublic
+from app.api.user.repository import AsyncUserRepository
+from app.core.authentication import (
+    auth_tokens,
+    get_current_user_public,
+    passwords,
+    user_cache,
+)
+from app.core.config import settings
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @cbv(router)
 class AuthRouter:
+    ERROR_MESSAGE_LOGIN: str = "Invalid email or password"
+
     @router.get("/csrf")
     def get_csrf_token(self, request: Request) -> str:
-        """retrieve csrf token"""
+        """retrieve csrf token, with signed tokens the one the csrf
+        middleware set in the token cookie"""
+        if settings.CSRF_MODE == "signed":
+            return request.state.csrf_token
+
         if "X-CSRF-Token" not in request.session:
             request.session["X-CSRF-Token"] = secrets.token_urlsafe(32)
 
         return request.session["X-CSRF-Token"]
+
+    @router.post("/login", status_code=status.HTTP_200_OK)
+    async def login(
+        self,
+        response: Response,
+        user_login: UserLogin,
+        users_repository: Annotated[
+            AsyncUserRepository, Depends(AsyncUserRepository)
+        ],
+    ) -> UserPublic:
+        """check a users password and set their auth token cookie. The
+        hash is checked in the threadpool as it takes tens of ms"""
+        user: User | None = await users_repository.get_user_by_email(
+            user_login.email
+        )
+
+        if not await run_in_threadpool(
+            passwords.verify,
+            user_login.password,
+            user.password_hash if user else None,
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=self.ERROR_MESSAGE_LOGIN,
+            )
+
+        user_public: UserPublic = UserPublic.model_validate(user)
+        user_cache.set(user_public)
+        auth_tokens.set_cookie(response, auth_tokens.issue(user_public.id))
+
+        return user_public
+
+    @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+    async def logout(self, response: Response) -> None:
+        """clear the auth token cookie"""
+        auth_tokens.delete_cookie(response)
+
+    @router.get("/user", status_code=status.HTTP_200_OK)
+    async def get_user(
+        self, user: Annotated[UserPublic, Depends(get_current_user_public)]
+    ) -> UserPublic:
+        """retrieve the authenticated user"""
+        return user
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Field, SQLModel
+
+
+class ChangeLog(SQLModel, table=True):
+    """a row written by a trigger for each insert, update or delete on the
+    tracked tables, queued until it is shipped to the backup store"""
+
+    id: int = Field(primary_key=True, sa_type=BigInteger)
+    table_name: str = Field(max_length=64)
+    operation: str = Field(max_length=6)
+    data: dict = Field(sa_type=JSONB)
+    changed_at: datetime = Field(
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"server_default": func.now()},
+    )
+    # the transaction making the change, a backup includes it when it is
+    # visible in the snapshot the backup was dumped from
+    txid: int | None = Field(
+        default=None,
+        sa_type=BigInteger,
+        sa_column_kwargs={
+            "server_default": text("pg_current_xact_id()::text::bigint")
+        },
+    )
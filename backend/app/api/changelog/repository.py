@@ -0,0 +1,101 @@
+import json
+from itertools import groupby
+from typing import Sequence
+
+from sqlalchemy import Column, Table, TextClause, delete, text
+from sqlmodel import SQLModel, col, select
+
+from app.api.changelog.models import ChangeLog
+from app.api.runs.models import PersonalBests, Run
+from app.api.user.models import User
+from app.core.repository import Repository
+
+
+class ChangeLogRepository(Repository):
+    # the tables with a change log trigger, leaderboards and rollups are
+    # derived from them
+    TRACKED_TABLES: dict[str, type[SQLModel]] = {
+        "user": User,
+        "run": Run,
+        "personalbests": PersonalBests,
+    }
+
+    def get_changes(self, limit: int) -> Sequence[ChangeLog]:
+        """get the oldest queued changes"""
+        return self.execute_query(
+            select(ChangeLog).order_by(col(ChangeLog.id).asc()).limit(limit)
+        ).all()
+
+    def delete_changes(self, ids: list[int]) -> None:
+        """remove shipped changes from the queue"""
+        self.execute_query(delete(ChangeLog).where(col(ChangeLog.id).in_(ids)))
+        self.commit()
+
+    def clear(self) -> None:
+        """empty the queue, used after replaying changes into a restored
+        database whose triggers logged them again"""
+        self.execute_query(delete(ChangeLog))
+        self.commit()
+
+    def apply_changes(self, changes: list[dict]) -> None:
+        """replay changes in order without committing. Inserts and updates
+        are upserted and deletes matched on primary key, so replaying a
+        change already in the database is harmless. Consecutive changes of
+        the same kind are sent as one executemany"""
+        for (table_name, operation), group in groupby(
+            changes,
+            key=lambda change: (change["table_name"], change["operation"]),
+        ):
+            self.execute_query(
+                self._get_replay_statement(table_name, operation),
+                [{"data": json.dumps(change["data"])} for change in group],
+            )
+
+    def reset_sequences(self) -> None:
+        """move the id sequences of the tracked tables past replayed ids"""
+        for table_name in self.TRACKED_TABLES:
+            self.execute_query(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table_name}\"',"
+                    f" 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                    f'FROM "{table_name}"'
+                )
+            )
+
+    def _get_replay_statement(
+        self, table_name: str, operation: str
+    ) -> TextClause:
+        """build the statement replaying a change to a tracked table, the
+        row is decoded from its JSON by postgres into the table row type"""
+        if table_name not in self.TRACKED_TABLES:
+            raise ValueError(f"Untracked table {table_name}")
+
+        table: Table = self.TRACKED_TABLES[
+            table_name
+        ].__table__  # ty: ignore[unresolved-attribute]
+        # generated columns are recalculated by postgres and cannot be set
+        written: list[Column] = [
+            column for column in table.c if column.computed is None
+        ]
+        columns: str = ", ".join(f'"{column.name}"' for column in written)
+        keys: str = ", ".join(
+            f'"{column.name}"' for column in table.primary_key
+        )
+        record: str = (
+            f'jsonb_populate_record(NULL::"{table_name}", '
+            f"CAST(:data AS jsonb))"
+        )
+
+        if operation == "DELETE":
+            return text(
+                f'DELETE FROM "{table_name}" '
+                f"WHERE ({keys}) = (SELECT {keys} FROM {record})"
+            )
+
+        return text(
+            f'INSERT INTO "{table_name}" ({columns}) '
+            f"SELECT {columns} FROM {record} "
+            f"ON CONFLICT ({keys}) DO UPDATE SET ({columns}) = ROW("
+            + ", ".join(f'EXCLUDED."{column.name}"' for column in written)
+            + ")"
+        )
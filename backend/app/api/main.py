@@ -1,8 +1,14 @@
 from fastapi import APIRouter
 from app.api.runs import routes as runs_routes
 from app.api.auth import routes as auth_routes
+from app.api.admin import routes as admin_routes
+from app.core.config import settings
 
 api_router = APIRouter()
 api_router.include_router(runs_routes.router)
 api_router.include_router(auth_routes.router)
 
+# any signed in user could read the pool and cache metrics, and there are
+# no admin users, so they are only served in development
+if settings.DEVELOPMENT:
+    api_router.include_router(admin_routes.router)
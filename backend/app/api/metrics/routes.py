@@ -0,0 +1,119 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+from fastapi_utils.cbv import cbv
+
+from app.core.cache import response_cache
+from app.core.database_manager import database_manager
+from app.core.metrics import MetricsExposition, job_metrics, request_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@cbv(router)
+class MetricsRouter:
+    MEDIA_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+    @router.get(
+        "/metrics",
+        status_code=status.HTTP_200_OK,
+        response_class=PlainTextResponse,
+        include_in_schema=False,
+    )
+    async def get_metrics(self) -> PlainTextResponse:
+        """request, database pool, response cache and database job metrics
+        in the Prometheus text format. Served on the event loop, the only
+        thread that updates the request metrics"""
+        exposition = MetricsExposition()
+
+        self._add_request_metrics(exposition)
+        self._add_pool_metrics(exposition)
+        self._add_cache_metrics(exposition)
+        self._add_job_metrics(exposition)
+
+        return PlainTextResponse(
+            exposition.render(), media_type=self.MEDIA_TYPE
+        )
+
+    def _add_request_metrics(self, exposition: MetricsExposition) -> None:
+        exposition.add_histograms(
+            "request_duration_seconds",
+            "Request latency by route.",
+            request_metrics.latency,
+        )
+        exposition.add(
+            "responses_total",
+            "counter",
+            "Responses by route and status code.",
+            [
+                ({"route": route, "method": method, "status": status}, count)
+                for (route, method, status), count in sorted(
+                    request_metrics.responses.items()
+                )
+            ],
+        )
+        exposition.add(
+            "requests_in_flight",
+            "gauge",
+            "Requests being handled.",
+            [({}, request_metrics.in_flight)],
+        )
+
+    def _add_pool_metrics(self, exposition: MetricsExposition) -> None:
+        """one gauge per pool figure, labelled by engine"""
+        pools: dict[str, dict] = database_manager.get_pool_metrics()
+
+        for name in next(iter(pools.values())):
+            exposition.add(
+                f"db_pool_{name}",
+                "gauge",
+                f"Connection pool {name.replace('_', ' ')}.",
+                [
+                    ({"engine": engine}, pool[name])
+                    for engine, pool in pools.items()
+                ],
+            )
+
+    def _add_cache_metrics(self, exposition: MetricsExposition) -> None:
+        """cache events as a counter, entries held as a gauge"""
+        metrics: dict[str, int | None] = response_cache.metrics()
+        entries: int | None = metrics.pop("entries", None)
+
+        exposition.add(
+            "response_cache_events_total",
+            "counter",
+            "Response cache events by type.",
+            [
+                ({"event": event}, count)
+                for event, count in metrics.items()
+                if count is not None
+            ],
+        )
+
+        if entries is not None:
+            exposition.add(
+                "response_cache_entries",
+                "gauge",
+                "Responses held in the cache.",
+                [({}, entries)],
+            )
+
+    def _add_job_metrics(self, exposition: MetricsExposition) -> None:
+        """one gauge per figure recorded by the database jobs, labelled by
+        job"""
+        jobs: dict[str, dict[str, float]] = job_metrics.read()
+
+        names: set[str] = {
+            name for figures in jobs.values() for name in figures
+        }
+
+        for name in sorted(names):
+            exposition.add(
+                f"job_{name}",
+                "gauge",
+                f"Database job {name.replace('_', ' ')}.",
+                [
+                    ({"job": job}, figures[name])
+                    for job, figures in sorted(jobs.items())
+                    if name in figures
+                ],
+            )
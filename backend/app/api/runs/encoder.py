@@ -0,0 +1,70 @@
+from datetime import date
+from typing import Iterable, Sequence
+
+from sqlalchemy import Row
+
+from app.api.runs.models import RunPublic
+
+
+class RunsEncoder:
+    """encode run rows straight to the JSON RunsPublic serializes to,
+    without validating each row through RunPublic. Rows are the public
+    columns of a run in field order, with the pace calculated by the
+    query. The columns are numbers, ISO dates and the period labels of
+    grouped runs, none of which need escaping, so each run is a single
+    string format and the runs are joined into one buffer"""
+
+    RUN_TEMPLATE: str = (
+        '{"distance_m":%d,"duration_s":%d,"calories":%d,"vo2max":"%s",'
+        '"run_date":"%s","id":%s,"pace":%r}'
+    )
+
+    def encode(
+        self, runs: Sequence[Row], next_cursor: str | None = None
+    ) -> bytes:
+        """encode runs as a RunsPublic response body"""
+        cursor: str = "null" if next_cursor is None else f'"{next_cursor}"'
+
+        return (
+            f'{{"data":[{",".join(self._encode_runs(runs))}],'
+            f'"next_cursor":{cursor}}}'
+        ).encode()
+
+    def encode_lines(self, runs: Sequence[Row]) -> bytes:
+        """encode runs as newline delimited JSON, each line a RunPublic"""
+        return "".join(f"{run}\n" for run in self._encode_runs(runs)).encode()
+
+    def _encode_runs(self, runs: Sequence[Row]) -> Iterable[str]:
+        """the query leaves the pace of runs lying exactly half way between
+        two rounded paces null, those are calculated as RunPublic does"""
+        template: str = self.RUN_TEMPLATE
+
+        for (
+            distance_m,
+            duration_s,
+            calories,
+            vo2max,
+            run_date,
+            id,
+            pace,
+        ) in runs:
+            yield template % (
+                distance_m,
+                duration_s,
+                calories,
+                vo2max,
+                (
+                    run_date.isoformat()
+                    if isinstance(run_date, date)
+                    else run_date
+                ),
+                "null" if id is None else id,
+                (
+                    RunPublic.calculate_pace(distance_m, duration_s)
+                    if pace is None
+                    else pace
+                ),
+            )
+
+
+runs_encoder = RunsEncoder()
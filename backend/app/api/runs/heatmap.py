@@ -0,0 +1,77 @@
+import base64
+from datetime import date
+from typing import Sequence
+
+from sqlalchemy import Row
+
+from app.api.runs.models import RunHeatmapFormat, RunHeatmapPublic
+
+
+class RunHeatmap:
+    """the distance run on each day between two dates as delta encoded
+    columns. days holds the number of days from the previous day with runs,
+    the first counted from the start date, and distances_m the metres run
+    on each of those days, so days without runs take no space.
+
+    packed, the start date as days since the epoch, the number of days in
+    the range, the number of days with runs and then both columns are
+    written as unsigned LEB128 varints, a year of runs fitting in around a
+    kilobyte"""
+
+    EPOCH: date = date(1970, 1, 1)
+
+    def __init__(
+        self, start_date: date, end_date: date, days: Sequence[Row]
+    ) -> None:
+        self.start_date: date = start_date
+        self.end_date: date = end_date
+        self.days: list[int] = []
+        self.distances_m: list[int] = []
+        previous_date: date = start_date
+
+        for run_date, distance_m in days:
+            self.days.append((run_date - previous_date).days)
+            self.distances_m.append(int(distance_m))
+            previous_date = run_date
+
+    def public(self, heatmap_format: RunHeatmapFormat) -> RunHeatmapPublic:
+        """the columns as arrays, or packed and base64 encoded"""
+        if heatmap_format == RunHeatmapFormat.JSON:
+            return RunHeatmapPublic(
+                start_date=self.start_date,
+                end_date=self.end_date,
+                days=self.days,
+                distances_m=self.distances_m,
+            )
+
+        return RunHeatmapPublic(
+            start_date=self.start_date,
+            end_date=self.end_date,
+            packed=base64.b64encode(self.pack()).decode(),
+        )
+
+    def pack(self) -> bytes:
+        buffer: bytearray = bytearray()
+
+        for value in (
+            (self.start_date - self.EPOCH).days,
+            (self.end_date - self.start_date).days + 1,
+            len(self.days),
+            *self.days,
+            *self.distances_m,
+        ):
+            self._write_varint(buffer, value)
+
+        return bytes(buffer)
+
+    def _write_varint(self, buffer: bytearray, value: int) -> None:
+        """seven bits a byte, least significant first, the high bit set on
+        every byte but the last"""
+        if value < 0:
+            raise ValueError("Heatmap values must not be negative")
+
+        while value > 0x7F:
+            buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+
+        buffer.append(value)
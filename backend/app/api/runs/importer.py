@@ -0,0 +1,157 @@
+import codecs
+import csv
+import json
+import time
+from datetime import date, datetime
+from typing import AsyncIterator, Iterable, Iterator
+
+from anyio import from_thread
+from pydantic import ValidationError
+
+from app.api.runs.models import RunImportError, RunImportPublic, RunPublic
+
+
+class RunImporter:
+    """validate runs read from a CSV or NDJSON source a row at a time,
+    grouping them into chunks that are each inserted in one transaction"""
+
+    FORMATS: list[str] = ["csv", "ndjson"]
+    MEDIA_TYPES: dict[str, str] = {
+        "text/csv": "csv",
+        "application/x-ndjson": "ndjson",
+        "application/jsonl": "ndjson",
+    }
+    CHUNK_SIZE: int = 1000
+
+    def __init__(self, import_format: str, chunk_size: int = CHUNK_SIZE):
+        if import_format not in self.FORMATS:
+            raise ValueError(f"Unsupported import format {import_format}")
+
+        self.import_format: str = import_format
+        self.chunk_size: int = chunk_size
+        self.imported: int = 0
+        self.errors: list[RunImportError] = []
+        self.started: float = time.perf_counter()
+
+    @classmethod
+    def get_format(cls, name: str) -> str | None:
+        """get the import format of a media type or file name"""
+        if import_format := cls.MEDIA_TYPES.get(name.split(";")[0].strip()):
+            return import_format
+
+        extension: str = name.rsplit(".", 1)[-1].lower()
+
+        if extension == "jsonl":
+            return "ndjson"
+
+        return extension if extension in cls.FORMATS else None
+
+    @staticmethod
+    def read_lines(stream: AsyncIterator[bytes]) -> Iterator[str]:
+        """the lines of a streamed UTF-8 body, decoded as each part of it
+        arrives so the body is never held whole. Iterated from a worker
+        thread, which waits on the event loop for the stream. A line is
+        held back until its line break is complete, so a CRLF split across
+        parts does not add a blank line"""
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        pending: str = ""
+
+        while True:
+            try:
+                data: bytes = from_thread.run(stream.__anext__)
+            except StopAsyncIteration:
+                break
+
+            lines: list[str] = (pending + decoder.decode(data)).splitlines(
+                keepends=True
+            )
+            pending = (
+                lines.pop() if lines and not lines[-1].endswith("\n") else ""
+            )
+
+            yield from lines
+
+        yield from (pending + decoder.decode(b"", final=True)).splitlines(
+            keepends=True
+        )
+
+    def chunks(
+        self, lines: Iterable[str]
+    ) -> Iterator[list[tuple[int, RunPublic]]]:
+        """yield chunks of valid runs with their row numbers, rows that fail
+        validation are recorded as errors and skipped"""
+        chunk: list[tuple[int, RunPublic]] = []
+
+        for row_number, row in self._read_rows(lines):
+            try:
+                chunk.append((row_number, self._validate(row)))
+            except (ValidationError, ValueError, TypeError) as e:
+                self._add_error(row_number, e)
+
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    def record(
+        self, chunk: list[tuple[int, RunPublic]], errors: dict[int, str]
+    ) -> None:
+        """record the outcome of inserting a chunk, errors are keyed by the
+        position of the failed run within the chunk"""
+        self.imported += len(chunk) - len(errors)
+
+        for position, error in errors.items():
+            self.errors.append(
+                RunImportError(row=chunk[position][0], error=error)
+            )
+
+    def result(self) -> RunImportPublic:
+        elapsed_s: float = time.perf_counter() - self.started
+
+        return RunImportPublic(
+            imported=self.imported,
+            failed=len(self.errors),
+            elapsed_s=round(elapsed_s, 3),
+            rows_per_s=round(self.imported / elapsed_s, 1) if elapsed_s else 0,
+            errors=sorted(self.errors, key=lambda error: error.row),
+        )
+
+    def _read_rows(self, lines: Iterable[str]) -> Iterator[tuple[int, object]]:
+        """read rows with their line numbers, skipping blank lines"""
+        if self.import_format == "csv":
+            reader: csv.DictReader = csv.DictReader(lines)
+
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(lines, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError as e:
+                        self._add_error(line_number, e)
+
+    def _validate(self, row: object) -> RunPublic:
+        """validate a row as a run with a parsed date and positive duration"""
+        run: RunPublic = RunPublic.model_validate(row)
+
+        if not isinstance(run.run_date, date):
+            run.run_date = datetime.strptime(run.run_date, "%Y-%m-%d").date()
+
+        if run.duration_s <= 0:
+            raise ValueError("duration_s must be greater than 0")
+
+        return run
+
+    def _add_error(self, row_number: int, error: Exception) -> None:
+        if isinstance(error, ValidationError):
+            message: str = "; ".join(
+                f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}"
+                for e in error.errors()
+            )
+        else:
+            message: str = str(error)
+
+        self.errors.append(RunImportError(row=row_number, error=message))
@@ -2,11 +2,21 @@ import decimal
 from datetime import date
 from enum import Enum
 
+from sqlalchemy import Column, Computed, Double, Index
 from sqlmodel import Field, Relationship, SQLModel
 from pydantic import computed_field
 
 from app.api.user.models import User
-from typing import List
+from typing import Dict, List
+
+
+# speed in km/h as the float RunPublic.calculate_speed returns, exact
+# integer products divided once so postgres and python agree to the bit
+RUN_SPEED_SQL: str = (
+    "CASE WHEN duration_s > 0 "
+    "THEN distance_m::float8 * 3600 / (duration_s::float8 * 1000) "
+    "ELSE 0 END"
+)
 
 
 class RunBase(SQLModel):
@@ -18,11 +28,58 @@ class RunBase(SQLModel):
 
 
 class Run(RunBase, table=True):
+    __table_args__ = (
+        Index(
+            "ix_run_user_id_run_date",
+            "user_id",
+            "run_date",
+            "id",
+            postgresql_include=[
+                "distance_m",
+                "duration_s",
+                "calories",
+                "vo2max",
+            ],
+        ),
+        Index(
+            "ix_run_user_id_distance_m",
+            "user_id",
+            "distance_m",
+            postgresql_include=["id", "duration_s"],
+        ),
+        Index("ix_run_user_id_speed_kmh", "user_id", "speed_kmh", "id"),
+    )
+
     id: int = Field(primary_key=True, index=True)
     user_id: int = Field(foreign_key="user.id")
+    # generated by postgres from the distance and duration, so runs can be
+    # ranked, filtered and sorted by pace through an index
+    speed_kmh: float | None = Field(
+        default=None,
+        sa_column=Column(
+            Double, Computed(RUN_SPEED_SQL, persisted=True), nullable=False
+        ),
+    )
     user: "User" = Relationship(back_populates="runs")
 
 
+class RunRollupPeriod(str, Enum):
+    WEEKLY = "weekly"
+    MONTHLY = "monthly"
+    YEARLY = "yearly"
+
+
+class RunRollup(SQLModel, table=True):
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    period: RunRollupPeriod = Field(primary_key=True)
+    period_start: date = Field(primary_key=True)
+    distance_m: int
+    duration_s: int
+    calories: int
+    vo2max_sum: int
+    vo2max_count: int
+
+
 class RunPublic(RunBase):
     id: int | None = None
     run_date: str | date
@@ -31,16 +88,90 @@ class RunPublic(RunBase):
     @computed_field
     @property
     def pace(self) -> float:
-        if self.distance_m > 0:
-            pace: float = round(
-                (self.distance_m * 3600) / (self.duration_s * 1000), 2
-            )
+        return self.calculate_pace(self.distance_m, self.duration_s)
+
+    @staticmethod
+    def calculate_pace(distance_m: int, duration_s: int) -> float:
+        if distance_m > 0:
+            pace: float = round((distance_m * 3600) / (duration_s * 1000), 2)
             return float(f"{pace:.2f}")
         return 0.0
 
+    @staticmethod
+    def calculate_speed(distance_m: int, duration_s: int) -> float:
+        """the unrounded pace, equal to the speed_kmh postgres stores"""
+        if duration_s > 0:
+            return (distance_m * 3600) / (duration_s * 1000)
+        return 0.0
+
+
+class RunSort(str, Enum):
+    DATE = "date"
+    PACE = "pace"
+
 
 class RunsPublic(SQLModel):
     data: List[RunPublic]
+    next_cursor: str | None = None
+
+
+class RunHeatmapFormat(str, Enum):
+    JSON = "json"
+    BASE64 = "base64"
+    BINARY = "binary"
+
+
+class RunHeatmapPublic(SQLModel):
+    start_date: date
+    end_date: date
+    days: List[int] | None = None
+    distances_m: List[int] | None = None
+    packed: str | None = None
+
+
+class RunSeriesMetric(str, Enum):
+    DISTANCE = "distance"
+    DURATION = "duration"
+    PACE = "pace"
+    VO2MAX = "vo2max"
+    CALORIES = "calories"
+
+
+class RunSeriesMethod(str, Enum):
+    LTTB = "lttb"
+    MIN_MAX = "minmax"
+
+
+class RunSeriesPublic(SQLModel):
+    metric: RunSeriesMetric
+    method: RunSeriesMethod
+    total: int
+    dates: List[str]
+    values: List[int | float]
+
+
+class RunTrainingLoadPublic(SQLModel):
+    start_date: date
+    end_date: date
+    distances_m: Dict[str, List[int]]
+    durations_s: Dict[str, List[int]]
+    paces: Dict[str, List[float | None]]
+    acute_loads: List[float]
+    chronic_loads: List[float]
+    forms: List[float]
+
+
+class RunImportError(SQLModel):
+    row: int
+    error: str
+
+
+class RunImportPublic(SQLModel):
+    imported: int
+    failed: int
+    elapsed_s: float
+    rows_per_s: float
+    errors: List[RunImportError]
 
 
 class PersonalBestType(str, Enum):
@@ -58,11 +189,24 @@ class PersonalBestsBase(SQLModel):
 
 
 class PersonalBests(PersonalBestsBase, table=True):
+    __table_args__ = (
+        Index("ix_personalbests_user_id_sort_order", "user_id", "sort_order"),
+    )
+
     id: int = Field(primary_key=True, index=True)
     user_id: int = Field(foreign_key="user.id")
     user: "User" = Relationship(back_populates="personal_bests")
 
 
+class PersonalBestRun(SQLModel, table=True):
+    personal_best_id: int = Field(
+        foreign_key="personalbests.id", primary_key=True, ondelete="CASCADE"
+    )
+    run_id: int = Field(
+        foreign_key="run.id", primary_key=True, index=True, ondelete="CASCADE"
+    )
+
+
 class PersonalBestPublic(PersonalBestsBase):
     id: int | None = None
     runs: List[RunPublic] | None = None
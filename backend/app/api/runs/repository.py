@@ -1,21 +1,100 @@
-from datetime import datetime, date
-from typing import Type
+import base64
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from typing import AsyncIterator, Type
 
-from sqlalchemy import Sequence, Row, func, cast, String, DECIMAL, Select
-from sqlalchemy.exc import NoResultFound
+from sqlalchemy import (
+    Sequence,
+    Row,
+    func,
+    cast,
+    String,
+    DECIMAL,
+    Float,
+    Select,
+    and_,
+    or_,
+    case,
+    Case,
+    ColumnElement,
+    Subquery,
+    Lateral,
+    delete,
+    insert,
+    update,
+    tuple_,
+    literal,
+    literal_column,
+    null,
+    true,
+    union_all,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DataError, IntegrityError, NoResultFound
+from sqlalchemy.orm import InstrumentedAttribute, aliased
 from sqlalchemy.sql.functions import Function
 from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.api.runs.heatmap import RunHeatmap
+from app.api.runs.series import RunSeries
+from app.api.runs.training_load import (
+    RunChange,
+    TrainingLoad,
+    training_loads,
+)
 from app.api.runs.models import (
     PersonalBests,
     PersonalBestPublic,
+    PersonalBestRun,
     PersonalBestType,
 )
-from app.api.runs.models import Run, RunPublic
-from app.core.repository import Repository
+from app.api.runs.models import (
+    Run,
+    RunPublic,
+    RunRollup,
+    RunRollupPeriod,
+    RunSort,
+    RunSeriesMethod,
+    RunSeriesMetric,
+    RunSeriesPublic,
+    RunTrainingLoadPublic,
+)
+from app.api.user.models import User
+from app.core.repository import Repository, AsyncRepository
 
 
 class RunsRepository(Repository):
+    PERSONAL_BEST_RUNS_LIMIT: int = 10
+    HEATMAP_DAYS: int = 365
+    HEATMAP_MAX_DAYS: int = 366 * 20
+    TRAINING_LOAD_DAYS: int = 90
+    TRAINING_LOAD_MAX_DAYS: int = 366 * 20
+    ROLLUP_PRECISION: dict[RunRollupPeriod, str] = {
+        RunRollupPeriod.WEEKLY: "week",
+        RunRollupPeriod.MONTHLY: "month",
+        RunRollupPeriod.YEARLY: "year",
+    }
+    ROLLUP_TOTALS: list[str] = [
+        "distance_m",
+        "duration_s",
+        "calories",
+        "vo2max_sum",
+        "vo2max_count",
+    ]
+    # pace in km/h, distance_m * 3600 / (duration_s * 1000), over the
+    # unqualified columns of a single table query. Kept as SQL text as
+    # building and cache keying the equivalent expression costs more than
+    # encoding the rows it is calculated for
+    PACE_SQL: str = (
+        "CASE WHEN distance_m <= 0 THEN 0.0::float8 "
+        "WHEN distance_m::bigint * 720 % nullif(duration_s, 0) = 0 "
+        "AND distance_m::bigint * 720 / nullif(duration_s, 0) % 2 = 1 "
+        "THEN NULL "
+        "ELSE round(distance_m::bigint * 720::numeric "
+        "/ (nullif(duration_s, 0)::bigint * 200), 2)::float8 END"
+    )
+
     def get_run(self, user_id: int, run_id: int | None) -> Type[Run] | None:
         """retrieve a single run"""
         if not run_id:
@@ -32,14 +111,74 @@ class RunsRepository(Repository):
         if not run:
             raise ValueError("Run not found")
 
-        self.delete(run)
+        personal_best_ids: list[int] = self._remove_from_personal_bests(run)
+        self._update_run_rollups(user_id, [run], -1)
+        removed: RunChange = self._get_run_change(run, -1)
+
+        self.delete(run, commit=False)
+        self.flush()
+        self.rebuild_personal_bests(user_id, personal_best_ids, commit=False)
+        training_loads.apply(
+            user_id, self._commit_user_changes(user_id), [removed]
+        )
 
     def add_run(self, user_id: int, run: RunPublic) -> None:
         run: Run = Run(**run.model_dump(exclude={"user_id"}))
         run.user_id = user_id
         run.run_date = self._parse_date(run.run_date)
 
-        self.add(run)
+        self.add(run, commit=False)
+        self.flush()
+        self._add_to_personal_bests(run)
+        self._update_run_rollups(user_id, [run], 1)
+        training_loads.apply(
+            user_id,
+            self._commit_user_changes(user_id),
+            [self._get_run_change(run, 1)],
+        )
+
+    def add_runs(
+        self,
+        user_id: int,
+        runs: list[RunPublic],
+        personal_best_ids: set[int] | None = None,
+    ) -> dict[int, str]:
+        """add a batch of runs in one transaction with a single executemany,
+        updating the leaderboards and rollups once for the whole batch.
+
+        when the database rejects the data of the batch it is split in half
+        and each half retried, so a bad run costs a few extra transactions
+        rather than one per run. The errors of runs that fail alone are
+        returned keyed by their position in the batch. Any other error, a
+        lost connection say, is raised rather than blamed on the runs.
+
+        given personal_best_ids, the leaderboards are not rebuilt, instead
+        the ids of those the added runs qualify for are collected so an
+        import of many batches rebuilds them once"""
+        try:
+            self._insert_runs(user_id, runs, personal_best_ids)
+
+            return {}
+        except (DataError, IntegrityError) as e:
+            self.rollback()
+
+            if len(runs) == 1:
+                return {0: str(e.orig).strip()}
+        except Exception:
+            self.rollback()
+            raise
+
+        middle: int = len(runs) // 2
+
+        return {
+            **self.add_runs(user_id, runs[:middle], personal_best_ids),
+            **{
+                middle + position: error
+                for position, error in self.add_runs(
+                    user_id, runs[middle:], personal_best_ids
+                ).items()
+            },
+        }
 
     def update_run(self, user_id: int, updated_run: RunPublic) -> None:
         run: Type[Run] | None = self.get_run(user_id, updated_run.id)
@@ -47,44 +186,139 @@ class RunsRepository(Repository):
         if not run:
             raise NoResultFound("Run not found")
 
+        personal_best_ids: list[int] = self._remove_from_personal_bests(run)
+        self._update_run_rollups(user_id, [run], -1)
+        removed: RunChange = self._get_run_change(run, -1)
+
         run.run_date = self._parse_date(updated_run.run_date)
         run.distance_m = updated_run.distance_m
         run.duration_s = updated_run.duration_s
         run.calories = updated_run.calories
         run.vo2max = int(updated_run.vo2max)
 
-        self.add(run)
+        self.add(run, commit=False)
+        self.flush()
+        self.rebuild_personal_bests(user_id, personal_best_ids, commit=False)
+        self._add_to_personal_bests(run)
+        self._update_run_rollups(user_id, [run], 1)
+        training_loads.apply(
+            user_id,
+            self._commit_user_changes(user_id),
+            [removed, self._get_run_change(run, 1)],
+        )
 
     def personal_bests(self, user_id: int) -> list[PersonalBestPublic]:
         """get personal bests for a user, ordered by sort order"""
-        personal_best_types = self.execute_query(
-            select(PersonalBests)
-            .where(PersonalBests.user_id == user_id)
-            .order_by(col(PersonalBests.sort_order).asc())
-        ).all()
+        personal_bests: dict[int, PersonalBestPublic] = {}
 
-        if not personal_best_types:
-            raise NoResultFound("No personal best types found")
+        for personal_best_type, run in self._get_personal_best_runs(user_id):
+            if personal_best_type.id not in personal_bests:
+                personal_bests[personal_best_type.id] = PersonalBestPublic(
+                    **personal_best_type.model_dump(), runs=[]
+                )
+
+            if run:
+                personal_bests[personal_best_type.id].runs.append(
+                    RunPublic(**run.model_dump())
+                )
 
-        personal_bests = []
+        if not personal_bests:
+            raise NoResultFound("No personal bests found")
+
+        return list(personal_bests.values())
 
-        for personal_best_type in personal_best_types:
-            personal_bests_public = PersonalBestPublic(
-                **personal_best_type.model_dump()
+    def rebuild_personal_bests(
+        self,
+        user_id: int,
+        personal_best_ids: list[int] | None = None,
+        commit: bool = True,
+    ) -> None:
+        """rebuild the personal best leaderboard of a user from their full
+        run history, limited to personal_best_ids when given. Required
+        whenever a personal best type or its distance bounds change"""
+        if personal_best_ids is not None and not personal_best_ids:
+            return
+
+        self._lock_personal_bests(user_id)
+        personal_best_query: Select = select(PersonalBests.id).where(
+            PersonalBests.user_id == user_id
+        )
+
+        if personal_best_ids is not None:
+            personal_best_query = personal_best_query.where(
+                col(PersonalBests.id).in_(personal_best_ids)
             )
-            personal_bests_public.runs = self._get_personal_best_runs(
-                user_id,
-                personal_best_type.type,
-                personal_best_type.min_distance_m,
-                personal_best_type.max_distance_m,
+
+        self.execute_query(
+            delete(PersonalBestRun).where(
+                col(PersonalBestRun.personal_best_id).in_(personal_best_query)
             )
+        )
 
-            personal_bests.append(personal_bests_public)
+        ranking = self._get_personal_best_ranking(user_id, personal_best_ids)
 
-        if not personal_bests:
-            raise NoResultFound("No personal bests found")
+        self.execute_query(
+            insert(PersonalBestRun).from_select(
+                ["personal_best_id", "run_id"],
+                select(  # ty: ignore[no-matching-overload]
+                    ranking.c.personal_best_id, ranking.c.id
+                )
+                .where(ranking.c.position <= self.PERSONAL_BEST_RUNS_LIMIT)
+                .where(ranking.c.id.is_not(None)),
+            )
+        )
+
+        if commit:
+            self._commit_user_changes(user_id)
+
+    def rebuild_run_rollups(self, user_id: int, commit: bool = True) -> None:
+        """rebuild the weekly, monthly and yearly rollups of a user from
+        their full run history"""
+        self.execute_query(
+            delete(RunRollup).where(col(RunRollup.user_id) == user_id)
+        )
+
+        for period in RunRollupPeriod:
+            period_start: Function = func.date(
+                func.date_trunc(self.ROLLUP_PRECISION[period], Run.run_date)
+            )
+
+            self.execute_query(
+                insert(RunRollup).from_select(
+                    [
+                        "user_id",
+                        "period",
+                        "period_start",
+                        "distance_m",
+                        "duration_s",
+                        "calories",
+                        "vo2max_sum",
+                        "vo2max_count",
+                    ],
+                    select(  # ty: ignore[no-matching-overload]
+                        Run.user_id,
+                        literal(period, col(RunRollup.period).type),
+                        period_start,
+                        func.sum(Run.distance_m),
+                        func.sum(Run.duration_s),
+                        func.sum(Run.calories),
+                        func.sum(Run.vo2max),
+                        func.count(),
+                    )
+                    .where(Run.user_id == user_id)
+                    .group_by(Run.user_id, period_start),
+                )
+            )
 
-        return personal_bests
+        if commit:
+            self._commit_user_changes(user_id)
+
+    def get_data_version(self, user_id: int) -> int:
+        """get the version of a users run data, incremented on every
+        committed change"""
+        return self.execute_query(
+            select(User.data_version).where(User.id == user_id)
+        ).one()
 
     def get_runs(
         self,
@@ -92,13 +326,34 @@ class RunsRepository(Repository):
         start_date: str | None,
         end_date: str | None,
         group_by: str = "daily",
+        public_columns: bool = False,
+        sort: RunSort = RunSort.DATE,
+        min_pace: float | None = None,
+        max_pace: float | None = None,
     ) -> Sequence[Row]:
-        """get all runs for a user, grouped by daily week, month or year"""
+        """get all runs for a user, grouped by daily week, month or year.
+        With public_columns the runs are rows of their public columns, pace
+        included, rather than models. Daily runs can be sorted by and
+        filtered on their pace"""
         if group_by == "daily":
-            runs: Sequence[Row] = self._get_runs(user_id, start_date, end_date)
+            runs: Sequence[Row] = self._get_runs(
+                user_id,
+                start_date,
+                end_date,
+                public_columns,
+                sort,
+                min_pace,
+                max_pace,
+            )
+        elif (
+            sort != RunSort.DATE or min_pace is not None or max_pace is not None
+        ):
+            raise ValueError(
+                "Pace sorting and filters are only supported for daily runs"
+            )
         else:
             runs: Sequence[Row] = self._get_grouped_runs(
-                user_id, start_date, end_date, group_by
+                user_id, start_date, end_date, group_by, public_columns
             )
 
         if not runs:
@@ -106,35 +361,424 @@ class RunsRepository(Repository):
 
         return runs
 
-    def _get_personal_best_runs(
+    def get_runs_page(
         self,
         user_id: int,
-        personal_best_type: str,
-        min_distance_m: int | None,
-        max_distance_m: int | None,
-    ) -> list[RunPublic | None]:
-        """get personal best runs for a user, ordered by distance or duration"""
-        query: Select = select(Run).where(Run.user_id == user_id).limit(10)
+        start_date: str | None,
+        end_date: str | None,
+        limit: int,
+        cursor: str | None = None,
+        public_columns: bool = False,
+        sort: RunSort = RunSort.DATE,
+        min_pace: float | None = None,
+        max_pace: float | None = None,
+    ) -> tuple[Sequence[Row], str | None]:
+        """get a page of daily runs for a user, newest or fastest first,
+        with the cursor of the next page when there is one. Pages are keyed
+        on (run_date, id) or (speed_kmh, id) so each costs one index range
+        scan however deep into the history it is"""
+        query: Select = self._get_runs_query(
+            user_id,
+            start_date,
+            end_date,
+            public_columns,
+            sort,
+            min_pace,
+            max_pace,
+        )
 
-        if max_distance_m:
-            query = query.where(col(Run.distance_m) <= max_distance_m)
+        if cursor:
+            query = query.where(
+                tuple_(self._get_sort_column(sort), col(Run.id))
+                < self._decode_cursor(cursor, sort)
+            )
 
-        if min_distance_m:
-            query = query.where(col(Run.distance_m) >= min_distance_m)
+        runs: Sequence[Row] = self.execute_query(query.limit(limit + 1)).all()
 
-        if personal_best_type == PersonalBestType.SPEED:
-            query = query.order_by(col(Run.duration_s).asc())
+        if not runs:
+            raise NoResultFound("No runs found")
 
-        if personal_best_type == PersonalBestType.DURATION:
-            query = query.order_by(col(Run.duration_s).desc())
+        if len(runs) > limit:
+            return runs[:limit], self._encode_cursor(runs[limit - 1], sort)
 
-        if personal_best_type == PersonalBestType.DISTANCE:
-            query = query.order_by(col(Run.distance_m).desc())
+        return runs, None
 
-        return [
-            RunPublic(**run.model_dump())
-            for run in self.execute_query(query).all()
-        ]
+    def get_heatmap(
+        self, user_id: int, start_date: str | None, end_date: str | None
+    ) -> RunHeatmap:
+        """get the distance a user ran each day between two dates, by
+        default the year to today, summed in one scan of the run date
+        index"""
+        last_date: date = (
+            self._parse_date(end_date) if end_date else date.today()
+        )
+        first_date: date = (
+            self._parse_date(start_date)
+            if start_date
+            else last_date - timedelta(days=self.HEATMAP_DAYS)
+        )
+
+        if first_date > last_date:
+            raise ValueError("Heatmap start date is after its end date")
+
+        if (last_date - first_date).days >= self.HEATMAP_MAX_DAYS:
+            raise ValueError("Heatmap range is limited to 20 years")
+
+        return RunHeatmap(
+            first_date,
+            last_date,
+            self.execute_query(
+                select(  # ty: ignore[no-matching-overload]
+                    Run.run_date, func.sum(Run.distance_m)
+                )
+                .where(Run.user_id == user_id)
+                .where(col(Run.run_date) >= first_date)
+                .where(col(Run.run_date) <= last_date)
+                .group_by(col(Run.run_date))
+                .order_by(col(Run.run_date))
+            ).all(),
+        )
+
+    def get_series(
+        self,
+        user_id: int,
+        metric: RunSeriesMetric,
+        start_date: str | None,
+        end_date: str | None,
+        group_by: str,
+        points: int,
+        method: RunSeriesMethod,
+    ) -> RunSeriesPublic:
+        """get a metric of the runs of a user in date order, decimated to at
+        most points points"""
+        return RunSeries(
+            metric,
+            self.get_runs(user_id, start_date, end_date, group_by, True),
+        ).decimate(points, method)
+
+    def get_training_load(
+        self, user_id: int, start_date: str | None, end_date: str | None
+    ) -> RunTrainingLoadPublic:
+        """get the rolling totals and training load of a user for each day
+        between two dates, by default the 90 days to today. The load is
+        built from the daily totals of every run, once per data version,
+        and kept up to date as runs are changed"""
+        last_date: date = (
+            self._parse_date(end_date) if end_date else date.today()
+        )
+        first_date: date = (
+            self._parse_date(start_date)
+            if start_date
+            else last_date - timedelta(days=self.TRAINING_LOAD_DAYS)
+        )
+
+        if first_date > last_date:
+            raise ValueError("Training load start date is after its end date")
+
+        if (last_date - first_date).days >= self.TRAINING_LOAD_MAX_DAYS:
+            raise ValueError("Training load range is limited to 20 years")
+
+        version: int = self.get_data_version(user_id)
+        training_load: RunTrainingLoadPublic | None = training_loads.public(
+            user_id, version, first_date, last_date
+        )
+
+        if training_load is not None:
+            return training_load
+
+        # the version is read in the statement reading the totals so both
+        # are of one snapshot, a change committed in between would be
+        # applied to totals that already include it
+        days: Sequence[Row] = self.execute_query(
+            select(  # ty: ignore[no-matching-overload]
+                Run.run_date,
+                func.sum(Run.distance_m),
+                func.sum(Run.duration_s),
+                select(User.data_version)
+                .where(User.id == user_id)
+                .scalar_subquery(),
+            )
+            .where(Run.user_id == user_id)
+            .group_by(col(Run.run_date))
+            .order_by(col(Run.run_date))
+        ).all()
+
+        if not days:
+            raise NoResultFound("No runs found")
+
+        version = days[0][3]
+        training_loads.set(
+            user_id,
+            version,
+            TrainingLoad(days[0][0], [day[:3] for day in days]),
+        )
+
+        return training_loads.public(user_id, version, first_date, last_date)
+
+    def _commit_user_changes(self, user_id: int) -> int:
+        """increment the users data version within the pending changes and
+        commit, returning the new version. Their cached responses are
+        keyed by the version so are no longer read"""
+        version: int = self.execute_query(
+            update(User)
+            .where(col(User.id) == user_id)
+            .values(data_version=col(User.data_version) + 1)
+            .returning(col(User.data_version))
+        ).scalar_one()
+        self.commit()
+
+        return version
+
+    def _get_run_change(self, run: Run, sign: int) -> RunChange:
+        """the change a run makes to the daily totals of the training load,
+        sign -1 when it is removed"""
+        return (run.run_date, sign * run.distance_m, sign * run.duration_s)
+
+    def _insert_runs(
+        self,
+        user_id: int,
+        runs: list[RunPublic],
+        personal_best_ids: set[int] | None = None,
+    ) -> None:
+        """insert runs and update the derived data of their user, committing
+        once. Inserting with returning lets the driver batch the rows into
+        multi row statements rather than sending one per run. Only the
+        leaderboards the runs qualify for are rebuilt, or collected into
+        personal_best_ids when given"""
+        run_ids: list[int] = (
+            self.execute_query(
+                insert(Run).returning(col(Run.id)),
+                [
+                    {
+                        "user_id": user_id,
+                        "run_date": self._parse_date(run.run_date),
+                        "distance_m": run.distance_m,
+                        "duration_s": run.duration_s,
+                        "calories": run.calories,
+                        "vo2max": int(run.vo2max),
+                    }
+                    for run in runs
+                ],
+            )
+            .scalars()
+            .all()
+        )
+        qualified_ids: list[int] = self._get_personal_best_ids(run_ids)
+
+        if personal_best_ids is None:
+            self.rebuild_personal_bests(user_id, qualified_ids, commit=False)
+
+        self._update_run_rollups(user_id, runs, 1)
+        training_loads.apply(
+            user_id,
+            self._commit_user_changes(user_id),
+            [
+                (self._parse_date(run.run_date), run.distance_m, run.duration_s)
+                for run in runs
+            ],
+        )
+
+        if personal_best_ids is not None:
+            personal_best_ids.update(qualified_ids)
+
+    def _get_personal_best_ids(self, run_ids: list[int]) -> list[int]:
+        """the ids of the personal best types any of the runs qualify for"""
+        return list(
+            self.execute_query(
+                select(PersonalBests.id)
+                .distinct()
+                .join(Run, self._get_personal_best_run_filter())
+                .where(col(Run.id).in_(run_ids))
+            ).all()
+        )
+
+    def _get_personal_best_runs(self, user_id: int) -> Sequence[Row]:
+        """get the leaderboard runs for every personal best type of a user,
+        ranked within each type and at most PERSONAL_BEST_RUNS_LIMIT of
+        each"""
+        leaderboard: Lateral = (
+            select(  # ty: ignore[no-matching-overload]
+                *Run.__table__.c,  # ty: ignore[unresolved-attribute]
+                self._get_personal_best_order().label("rank"),
+            )
+            .join(PersonalBestRun, col(PersonalBestRun.run_id) == Run.id)
+            .where(col(PersonalBestRun.personal_best_id) == PersonalBests.id)
+            .order_by(self._get_personal_best_order().asc(), col(Run.id).asc())
+            .limit(self.PERSONAL_BEST_RUNS_LIMIT)
+            .lateral()
+        )
+
+        return self.execute_query(
+            select(PersonalBests, aliased(Run, leaderboard))
+            .outerjoin(leaderboard, true())
+            .where(PersonalBests.user_id == user_id)
+            .order_by(
+                col(PersonalBests.sort_order).asc(),
+                col(PersonalBests.id).asc(),
+                leaderboard.c.rank.asc(),
+                leaderboard.c.id.asc(),
+            )
+        ).all()
+
+    def _get_personal_best_ranking(
+        self, user_id: int, personal_best_ids: list[int] | None = None
+    ) -> Subquery:
+        """rank the runs of every personal best type of a user in a single
+        query using a window function, types without runs get a single
+        row with null run columns"""
+        query: Select = (
+            select(  # ty: ignore[no-matching-overload]
+                col(PersonalBests.id).label("personal_best_id"),
+                *Run.__table__.c,  # ty: ignore[unresolved-attribute]
+                func.row_number()
+                .over(
+                    partition_by=PersonalBests.id,
+                    order_by=(
+                        self._get_personal_best_order().asc(),
+                        col(Run.id).asc(),
+                    ),
+                )
+                .label("position"),
+            )
+            .select_from(PersonalBests)
+            .outerjoin(Run, self._get_personal_best_run_filter())
+            .where(PersonalBests.user_id == user_id)
+        )
+
+        if personal_best_ids is not None:
+            query = query.where(col(PersonalBests.id).in_(personal_best_ids))
+
+        return query.subquery()
+
+    def _get_personal_best_run_filter(self) -> ColumnElement[bool]:
+        """join condition matching runs to personal best types by user and
+        distance bounds"""
+        return and_(
+            col(Run.user_id) == col(PersonalBests.user_id),
+            or_(
+                col(PersonalBests.min_distance_m).is_(None),
+                col(Run.distance_m) >= PersonalBests.min_distance_m,
+            ),
+            or_(
+                col(PersonalBests.max_distance_m).is_(None),
+                col(Run.distance_m) <= PersonalBests.max_distance_m,
+            ),
+        )
+
+    def _add_to_personal_bests(self, run: Run) -> None:
+        """add a run to each leaderboard it qualifies for, comparing it only
+        against the current last placed run of a full leaderboard. The
+        leaderboards are locked first, so a concurrent change can not make
+        the comparison stale or fill a leaderboard past its limit"""
+        self._lock_personal_bests(run.user_id)
+        personal_best_types: Sequence[PersonalBests] = self.execute_query(
+            select(PersonalBests)
+            .join(Run, self._get_personal_best_run_filter())
+            .where(Run.id == run.id)
+        ).all()
+
+        if not personal_best_types:
+            return
+
+        leaderboards: dict[int, list[Run]] = defaultdict(list)
+
+        for personal_best_run, leaderboard_run in self.execute_query(
+            select(PersonalBestRun, Run)
+            .join(Run, col(Run.id) == PersonalBestRun.run_id)
+            .where(
+                col(PersonalBestRun.personal_best_id).in_(
+                    [personal_best.id for personal_best in personal_best_types]
+                )
+            )
+        ).all():
+            leaderboards[personal_best_run.personal_best_id].append(
+                leaderboard_run
+            )
+
+        for personal_best in personal_best_types:
+            leaderboard: list[Run] = leaderboards[personal_best.id]
+
+            if run.id in [
+                leaderboard_run.id for leaderboard_run in leaderboard
+            ]:
+                continue
+
+            if len(leaderboard) >= self.PERSONAL_BEST_RUNS_LIMIT:
+                last_placed: Run = max(
+                    leaderboard,
+                    key=lambda r: self._get_personal_best_rank(
+                        personal_best, r
+                    ),
+                )
+
+                if self._get_personal_best_rank(
+                    personal_best, run
+                ) >= self._get_personal_best_rank(personal_best, last_placed):
+                    continue
+
+                self.execute_query(
+                    delete(PersonalBestRun)
+                    .where(PersonalBestRun.personal_best_id == personal_best.id)
+                    .where(PersonalBestRun.run_id == last_placed.id)
+                )
+
+            self.add(
+                PersonalBestRun(
+                    personal_best_id=personal_best.id, run_id=run.id
+                ),
+                commit=False,
+            )
+
+    def _remove_from_personal_bests(self, run: Run) -> list[int]:
+        """remove a run from every leaderboard, returning the ids of the
+        personal best types that need refilling"""
+        self._lock_personal_bests(run.user_id)
+
+        return list(
+            self.execute_query(
+                delete(PersonalBestRun)
+                .where(PersonalBestRun.run_id == run.id)
+                .returning(PersonalBestRun.personal_best_id)
+            ).scalars()
+        )
+
+    def _lock_personal_bests(self, user_id: int) -> None:
+        """lock every personal best type of a user until the transaction
+        ends, serializing changes to their leaderboards. All are locked in
+        id order so transactions changing different types can not
+        deadlock"""
+        self.execute_query(
+            select(PersonalBests.id)
+            .where(PersonalBests.user_id == user_id)
+            .order_by(col(PersonalBests.id))
+            .with_for_update()
+        ).all()
+
+    def _get_personal_best_rank(
+        self, personal_best: PersonalBests, run: Run
+    ) -> tuple[int | float, int]:
+        """python equivalent of the personal best ranking expression, lower
+        ranks higher. The speed is recalculated from the distance and
+        duration as that of an updated run is not reread"""
+        if personal_best.type == PersonalBestType.SPEED:
+            return (
+                -RunPublic.calculate_speed(run.distance_m, run.duration_s),
+                run.id,
+            )
+        elif personal_best.type == PersonalBestType.DURATION:
+            return -run.duration_s, run.id
+        else:
+            return -run.distance_m, run.id
+
+    def _get_personal_best_order(self) -> Case:
+        """get the ranking expression for personal best runs, descending
+        speed, so runs of uneven distances within a band rank by pace, or
+        descending duration or distance"""
+        return case(
+            (PersonalBests.type == PersonalBestType.SPEED, -Run.speed_kmh),
+            (PersonalBests.type == PersonalBestType.DURATION, -Run.duration_s),
+            else_=-Run.distance_m,
+        )
 
     def _parse_date(self, run_date: str | date) -> date:
         """parse date string to date object"""
@@ -144,18 +788,112 @@ class RunsRepository(Repository):
             return run_date
 
     def _get_runs(
-        self, user_id: int, start_date: str | None, end_date: str | None
+        self,
+        user_id: int,
+        start_date: str | None,
+        end_date: str | None,
+        public_columns: bool = False,
+        sort: RunSort = RunSort.DATE,
+        min_pace: float | None = None,
+        max_pace: float | None = None,
     ) -> Sequence[Row]:
-        """get all runs for a user, ordered by date"""
+        """get all runs for a user, ordered by date or pace"""
+        return self.execute_query(
+            self._get_runs_query(
+                user_id,
+                start_date,
+                end_date,
+                public_columns,
+                sort,
+                min_pace,
+                max_pace,
+            )
+        ).all()
+
+    def _get_runs_query(
+        self,
+        user_id: int,
+        start_date: str | None,
+        end_date: str | None,
+        public_columns: bool = False,
+        sort: RunSort = RunSort.DATE,
+        min_pace: float | None = None,
+        max_pace: float | None = None,
+    ) -> Select:
+        """query for the runs of a user, newest or fastest first, ties
+        broken by id so the order can be used as a pagination key. Pace
+        filters compare the unrounded pace in km/h"""
         query: Select = (
-            select(Run)
-            .where(Run.user_id == user_id)
-            .order_by(col(Run.run_date).desc())
+            select(  # ty: ignore[no-matching-overload]
+                *self._get_public_columns(
+                    Run.__table__.c  # ty: ignore[unresolved-attribute]
+                )
+            )
+            if public_columns
+            else select(Run)
         )
+        query = query.where(Run.user_id == user_id).order_by(
+            self._get_sort_column(sort).desc(), col(Run.id).desc()
+        )
+
+        if min_pace is not None:
+            query = query.where(col(Run.speed_kmh) >= min_pace)
 
-        query = self._apply_date_filters(query, start_date, end_date)
+        if max_pace is not None:
+            query = query.where(col(Run.speed_kmh) <= max_pace)
+
+        return self._apply_date_filters(query, start_date, end_date)
+
+    def _get_sort_column(self, sort: RunSort) -> InstrumentedAttribute:
+        return col(Run.speed_kmh) if sort == RunSort.PACE else col(Run.run_date)
+
+    def _get_public_columns(self, columns) -> list[ColumnElement]:
+        """the columns of RunPublic in field order, for runs read as rows
+        rather than models, from a query with a single from clause. Grouped
+        runs have no id"""
+        return [
+            columns.distance_m,
+            columns.duration_s,
+            columns.calories,
+            columns.vo2max,
+            columns.run_date,
+            columns.id if "id" in columns else null().label("id"),
+            self._get_pace(),
+        ]
 
-        return self.execute_query(query).all()
+    def _get_pace(self) -> ColumnElement:
+        """the pace RunPublic calculates, in km/h rounded to 2 places.
+        RunPublic rounds the float nearest the pace, the query rounds the
+        exact pace half up, so the two only differ for paces exactly half
+        way between two rounded paces. Those are left null for the caller
+        to calculate, as are the paces of runs without a duration"""
+        return literal_column(self.PACE_SQL, Float).label("pace")
+
+    def _encode_cursor(self, run: Run, sort: RunSort = RunSort.DATE) -> str:
+        """encode the pagination key of a run as an opaque cursor. The speed
+        is recalculated as rows of the public columns do not hold it, repr
+        keeps every bit of it"""
+        key: str = (
+            repr(RunPublic.calculate_speed(run.distance_m, run.duration_s))
+            if sort == RunSort.PACE
+            else run.run_date.isoformat()
+        )
+
+        return base64.urlsafe_b64encode(f"{key}|{run.id}".encode()).decode()
+
+    def _decode_cursor(
+        self, cursor: str, sort: RunSort = RunSort.DATE
+    ) -> tuple[date | float, int]:
+        """decode a cursor into its (run_date, id) or (speed_kmh, id) key,
+        raising ValueError when it is malformed"""
+        key, run_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+
+        if sort == RunSort.PACE:
+            return float(key), int(run_id)
+
+        return self._parse_date(key), int(run_id)
 
     def _get_grouped_runs(
         self,
@@ -163,10 +901,101 @@ class RunsRepository(Repository):
         start_date: str | None,
         end_date: str | None,
         group_by: str,
+        public_columns: bool = False,
     ) -> Sequence[Row]:
         """get all runs for a user, grouped by daily week,
-        month or year, ordered by date"""
+        month or year, ordered by date. Periods entirely inside the date
+        range are read from the rollups, periods only partially covered
+        by the date range are aggregated from the runs"""
+        period: RunRollupPeriod = self._get_rollup_period(group_by)
+        first_period_start: date | None = None
+        last_period_end: date | None = None
+
+        # noinspection PyArgumentList
+        query: Select = (
+            select(  # ty: ignore[no-matching-overload]
+                col(RunRollup.duration_s).label("duration_s"),
+                col(RunRollup.distance_m).label("distance_m"),
+                col(RunRollup.calories).label("calories"),
+                cast(
+                    self._get_group_filter(group_by, RunRollup.period_start),
+                    String,
+                ).label("run_date"),
+                func.round(
+                    cast(RunRollup.vo2max_sum, DECIMAL)
+                    / RunRollup.vo2max_count,
+                    1,
+                ).label("vo2max"),
+            )
+            .where(RunRollup.user_id == user_id)
+            .where(RunRollup.period == period)
+        )
+
+        if start_date:
+            first_period_start = self._get_period_start(
+                self._parse_date(start_date), period
+            )
+
+            if first_period_start < self._parse_date(start_date):
+                first_period_start = self._get_next_period_start(
+                    first_period_start, period
+                )
+
+            query = query.where(
+                col(RunRollup.period_start) >= first_period_start
+            )
+
+        if end_date:
+            last_period_end = self._get_period_start(
+                self._parse_date(end_date) + timedelta(days=1), period
+            )
+
+            query = query.where(col(RunRollup.period_start) < last_period_end)
+
+        if first_period_start or last_period_end:
+            rollups: Subquery = union_all(
+                query,
+                self._aggregate_runs(
+                    user_id,
+                    start_date,
+                    end_date,
+                    group_by,
+                    first_period_start,
+                    last_period_end,
+                ),
+            ).subquery()
+            query = select(*rollups.c)  # ty: ignore[no-matching-overload]
+
+        if public_columns:
+            grouped_runs: Subquery = query.subquery()
+            query = select(  # ty: ignore[no-matching-overload]
+                *self._get_public_columns(grouped_runs.c)
+            )
+
+        return self.execute_query(
+            query.order_by(literal_column("run_date").desc())
+        ).all()
+
+    def _aggregate_runs(
+        self,
+        user_id: int,
+        start_date: str | None,
+        end_date: str | None,
+        group_by: str,
+        first_period_start: date | None,
+        last_period_end: date | None,
+    ) -> Select:
+        """aggregate the runs of the periods only partially covered by the
+        date range, those before first_period_start or from
+        last_period_end"""
         group_filter: Function = self._get_group_filter(group_by)
+        partial_periods: list[ColumnElement[bool]] = []
+
+        if first_period_start:
+            partial_periods.append(col(Run.run_date) < first_period_start)
+
+        if last_period_end:
+            partial_periods.append(col(Run.run_date) >= last_period_end)
 
         # noinspection PyArgumentList
         query: Select = (
@@ -180,13 +1009,90 @@ class RunsRepository(Repository):
                 ),
             )
             .where(Run.user_id == user_id)
+            .where(or_(*partial_periods))
             .group_by(group_filter)
-            .order_by(group_filter.desc())
         )
 
-        query = self._apply_date_filters(query, start_date, end_date)
+        return self._apply_date_filters(query, start_date, end_date)
+
+    def _update_run_rollups(
+        self, user_id: int, runs: Sequence[Run | RunPublic], sign: int
+    ) -> None:
+        """add (sign 1) or remove (sign -1) runs from the weekly, monthly and
+        yearly rollups of a user, dropping emptied periods. Runs are totalled
+        per period first so each period is upserted once"""
+        rollups: dict[tuple[RunRollupPeriod, date], dict] = {}
+
+        for run in runs:
+            run_date: date = self._parse_date(run.run_date)
 
-        return self.execute_query(query).all()
+            for period in RunRollupPeriod:
+                period_start: date = self._get_period_start(run_date, period)
+                rollup: dict = rollups.setdefault(
+                    (period, period_start),
+                    {
+                        "user_id": user_id,
+                        "period": period,
+                        "period_start": period_start,
+                        **{column: 0 for column in self.ROLLUP_TOTALS},
+                    },
+                )
+                rollup["distance_m"] += sign * run.distance_m
+                rollup["duration_s"] += sign * run.duration_s
+                rollup["calories"] += sign * run.calories
+                rollup["vo2max_sum"] += sign * int(run.vo2max)
+                rollup["vo2max_count"] += sign
+
+        upsert = postgresql.insert(RunRollup)
+
+        self.execute_query(
+            upsert.on_conflict_do_update(
+                index_elements=["user_id", "period", "period_start"],
+                set_={
+                    column: getattr(RunRollup, column)
+                    + getattr(upsert.excluded, column)
+                    for column in self.ROLLUP_TOTALS
+                },
+            ),
+            list(rollups.values()),
+        )
+
+        if sign < 0:
+            self.execute_query(
+                delete(RunRollup)
+                .where(col(RunRollup.user_id) == user_id)
+                .where(col(RunRollup.vo2max_count) <= 0)
+            )
+
+    def _get_rollup_period(self, group_by: str) -> RunRollupPeriod:
+        """get the rollup period for group by, defaulting to yearly"""
+        try:
+            return RunRollupPeriod(group_by)
+        except ValueError:
+            return RunRollupPeriod.YEARLY
+
+    def _get_period_start(
+        self, run_date: date, period: RunRollupPeriod
+    ) -> date:
+        """get the first day of the week, month or year containing run
+        date, weeks start on monday to match date_trunc"""
+        if period == RunRollupPeriod.WEEKLY:
+            return run_date - timedelta(days=run_date.weekday())
+        elif period == RunRollupPeriod.MONTHLY:
+            return run_date.replace(day=1)
+        else:
+            return run_date.replace(month=1, day=1)
+
+    def _get_next_period_start(
+        self, period_start: date, period: RunRollupPeriod
+    ) -> date:
+        """get the first day of the period following period start"""
+        if period == RunRollupPeriod.WEEKLY:
+            return period_start + timedelta(weeks=1)
+        elif period == RunRollupPeriod.MONTHLY:
+            return (period_start + timedelta(days=32)).replace(day=1)
+        else:
+            return period_start.replace(year=period_start.year + 1)
 
     def _apply_date_filters(
         self, query: Select, start_date: str | None, end_date: str | None
@@ -202,17 +1108,197 @@ class RunsRepository(Repository):
 
         return query
 
-    def _get_group_filter(self, group_by: str) -> Function:
+    def _get_group_filter(
+        self, group_by: str, run_date: InstrumentedAttribute = Run.run_date
+    ) -> Function:
         """get group filter so runs are grouped by daily week, month or year"""
         if group_by == "weekly":
-            return func.date(func.date_trunc("week", Run.run_date))
+            return func.date(func.date_trunc("week", run_date))
         elif group_by == "monthly":
             return func.concat(
-                cast(func.date_part("year", Run.run_date), String),
+                cast(func.date_part("year", run_date), String),
                 "-",
                 func.lpad(
-                    cast(func.date_part("month", Run.run_date), String), 2, "0"
+                    cast(func.date_part("month", run_date), String), 2, "0"
                 ),
             )
         else:
-            return func.date_part("year", Run.run_date)
+            return func.date_part("year", run_date)
+
+
+class AsyncRunsRepository(AsyncRepository):
+    """async RunsRepository, each call runs the synchronous repository
+    inside run_sync so reads and write paths share one implementation
+    while the database IO uses the async driver"""
+
+    STREAM_BATCH_SIZE: int = 500
+
+    async def get_run(self, user_id: int, run_id: int | None) -> Run | None:
+        return await self.run_sync(
+            lambda session: RunsRepository(session).get_run(user_id, run_id)
+        )
+
+    async def delete_run(self, user_id: int, run_id: int) -> None:
+        await self.run_sync(
+            lambda session: RunsRepository(session).delete_run(user_id, run_id)
+        )
+
+    async def add_run(self, user_id: int, run: RunPublic) -> None:
+        await self.run_sync(
+            lambda session: RunsRepository(session).add_run(user_id, run)
+        )
+
+    async def add_runs(
+        self,
+        user_id: int,
+        runs: list[RunPublic],
+        personal_best_ids: set[int] | None = None,
+    ) -> dict[int, str]:
+        return await self.run_sync(
+            lambda session: RunsRepository(session).add_runs(
+                user_id, runs, personal_best_ids
+            )
+        )
+
+    async def rebuild_personal_bests(
+        self, user_id: int, personal_best_ids: list[int] | None = None
+    ) -> None:
+        await self.run_sync(
+            lambda session: RunsRepository(session).rebuild_personal_bests(
+                user_id, personal_best_ids
+            )
+        )
+
+    async def update_run(self, user_id: int, updated_run: RunPublic) -> None:
+        await self.run_sync(
+            lambda session: RunsRepository(session).update_run(
+                user_id, updated_run
+            )
+        )
+
+    async def get_data_version(self, user_id: int) -> int:
+        return await self.run_sync(
+            lambda session: RunsRepository(session).get_data_version(user_id)
+        )
+
+    async def get_runs_page(
+        self,
+        user_id: int,
+        start_date: str | None,
+        end_date: str | None,
+        limit: int,
+        cursor: str | None = None,
+        public_columns: bool = False,
+        sort: RunSort = RunSort.DATE,
+        min_pace: float | None = None,
+        max_pace: float | None = None,
+    ) -> tuple[Sequence[Row], str | None]:
+        return await self.run_sync(
+            lambda session: RunsRepository(session).get_runs_page(
+                user_id,
+                start_date,
+                end_date,
+                limit,
+                cursor,
+                public_columns,
+                sort,
+                min_pace,
+                max_pace,
+            )
+        )
+
+    async def get_heatmap(
+        self, user_id: int, start_date: str | None, end_date: str | None
+    ) -> RunHeatmap:
+        return await self.run_sync(
+            lambda session: RunsRepository(session).get_heatmap(
+                user_id, start_date, end_date
+            )
+        )
+
+    async def get_training_load(
+        self, user_id: int, start_date: str | None, end_date: str | None
+    ) -> RunTrainingLoadPublic:
+        return await self.run_sync(
+            lambda session: RunsRepository(session).get_training_load(
+                user_id, start_date, end_date
+            )
+        )
+
+    async def get_series(
+        self,
+        user_id: int,
+        metric: RunSeriesMetric,
+        start_date: str | None,
+        end_date: str | None,
+        group_by: str,
+        points: int,
+        method: RunSeriesMethod,
+    ) -> RunSeriesPublic:
+        return await self.run_sync(
+            lambda session: RunsRepository(session).get_series(
+                user_id, metric, start_date, end_date, group_by, points, method
+            )
+        )
+
+    def stream_runs(
+        self,
+        user_id: int,
+        start_date: str | None,
+        end_date: str | None,
+        public_columns: bool = False,
+    ) -> AsyncIterator[Sequence[Run | Row]]:
+        """stream the runs of a user, newest first, in batches read from a
+        server side cursor so memory use does not grow with history. The
+        query is built, and its dates parsed, before anything is streamed
+        so a bad date raises ValueError here rather than mid response"""
+        query: Select = RunsRepository(
+            self.session.sync_session
+        )._get_runs_query(user_id, start_date, end_date, public_columns)
+
+        return self._stream_runs(query, public_columns)
+
+    async def _stream_runs(
+        self, query: Select, public_columns: bool
+    ) -> AsyncIterator[Sequence[Run | Row]]:
+        """the request session is closed before a streamed body is sent, so
+        the cursor is held open on a session owned by the stream itself"""
+        async with AsyncSession(self.session.bind) as session:
+            result = await session.stream(
+                query.execution_options(yield_per=self.STREAM_BATCH_SIZE)
+            )
+
+            if not public_columns:
+                result = result.scalars()
+
+            async for runs in result.partitions():
+                yield runs
+
+    async def personal_bests(self, user_id: int) -> list[PersonalBestPublic]:
+        return await self.run_sync(
+            lambda session: RunsRepository(session).personal_bests(user_id)
+        )
+
+    async def get_runs(
+        self,
+        user_id: int,
+        start_date: str | None,
+        end_date: str | None,
+        group_by: str = "daily",
+        public_columns: bool = False,
+        sort: RunSort = RunSort.DATE,
+        min_pace: float | None = None,
+        max_pace: float | None = None,
+    ) -> Sequence[Row]:
+        return await self.run_sync(
+            lambda session: RunsRepository(session).get_runs(
+                user_id,
+                start_date,
+                end_date,
+                group_by,
+                public_columns,
+                sort,
+                min_pace,
+                max_pace,
+            )
+        )
@@ -1,12 +1,41 @@
-from typing import Annotated
+from typing import Annotated, AsyncIterator, Sequence
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 
+from sqlalchemy import Row
 from sqlalchemy.orm.exc import NoResultFound
 from app.core.authentication import get_current_user
 from fastapi_utils.cbv import cbv
-from app.api.runs.models import RunsPublic, RunPublic, PersonalBestsPublic
-from app.api.runs.repository import RunsRepository
+from app.api.runs.encoder import runs_encoder
+from app.api.runs.heatmap import RunHeatmap
+from app.api.runs.importer import RunImporter
+from app.api.runs.models import (
+    Run,
+    RunsPublic,
+    RunPublic,
+    RunSort,
+    RunHeatmapFormat,
+    RunHeatmapPublic,
+    RunSeriesMethod,
+    RunSeriesMetric,
+    RunSeriesPublic,
+    RunTrainingLoadPublic,
+    RunImportPublic,
+    PersonalBestsPublic,
+)
+from app.api.runs.repository import AsyncRunsRepository
+from app.core.cache import response_cache
+from app.core.config import settings
 
 
 router = APIRouter(prefix="/runs", tags=["runs"])
@@ -15,45 +44,306 @@ router = APIRouter(prefix="/runs", tags=["runs"])
 @cbv(router)
 class RunRouter:
     ERROR_MESSAGE_404: str = "Run not found"
+    ERROR_MESSAGE_IMPORT_FORMAT: str = "Import must be CSV or NDJSON"
+    ERROR_MESSAGE_PAGINATION: str = (
+        "Pagination is only supported for daily runs"
+    )
 
     def __init__(
         self,
-        runs_repository: Annotated[RunsRepository, Depends(RunsRepository)],
+        runs_repository: Annotated[
+            AsyncRunsRepository, Depends(AsyncRunsRepository)
+        ],
         user_id: Annotated[int, Depends(get_current_user)],
     ):
         self.runs_repository = runs_repository
         self.user_id = user_id
 
     @router.get("/", status_code=status.HTTP_200_OK)
-    def get_runs(
+    async def get_runs(
         self,
+        request: Request,
+        response: Response,
         start_date: str | None = None,
         end_date: str | None = None,
         group_by: str = "daily",
+        limit: Annotated[int | None, Query(ge=1, le=1000)] = None,
+        cursor: str | None = None,
+        sort: RunSort = RunSort.DATE,
+        min_pace: float | None = None,
+        max_pace: float | None = None,
     ) -> RunsPublic:
-        """retrieve Runs"""
+        """retrieve Runs, a page at a time when limit is given. Daily runs
+        can be sorted fastest first and filtered on their pace in km/h"""
+        if (limit or cursor) and group_by != "daily":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=self.ERROR_MESSAGE_PAGINATION,
+            )
+
         try:
-            return RunsPublic(
-                data=self.runs_repository.get_runs(
-                    self.user_id, start_date, end_date, group_by
+            version: int = await self.runs_repository.get_data_version(
+                self.user_id
+            )
+
+            if not_modified := self._check_etag(request, response, version):
+                return not_modified
+
+            key: tuple = (
+                group_by,
+                start_date,
+                end_date,
+                limit,
+                cursor,
+                sort,
+                min_pace,
+                max_pace,
+            )
+
+            if settings.FAST_JSON_ENABLED:
+                body: bytes = await response_cache.get_or_set(
+                    self.user_id,
+                    version,
+                    ("runs.json", *key),
+                    lambda: self._get_runs_json(
+                        start_date,
+                        end_date,
+                        group_by,
+                        limit,
+                        cursor,
+                        sort,
+                        min_pace,
+                        max_pace,
+                    ),
                 )
+
+                return Response(
+                    body,
+                    media_type="application/json",
+                    headers=response.headers,
+                )
+
+            return await response_cache.get_or_set(
+                self.user_id,
+                version,
+                ("runs", *key),
+                lambda: self._get_runs(
+                    start_date,
+                    end_date,
+                    group_by,
+                    limit,
+                    cursor,
+                    sort,
+                    min_pace,
+                    max_pace,
+                ),
+            )
+        except NoResultFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=self.ERROR_MESSAGE_404,
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+
+    @router.get("/export", status_code=status.HTTP_200_OK)
+    async def export(
+        self, start_date: str | None = None, end_date: str | None = None
+    ) -> StreamingResponse:
+        """stream every run as newline delimited JSON, newest first"""
+        try:
+            runs: AsyncIterator[
+                Sequence[Run | Row]
+            ] = self.runs_repository.stream_runs(
+                self.user_id,
+                start_date,
+                end_date,
+                settings.FAST_JSON_ENABLED,
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+
+        return StreamingResponse(
+            self._export_runs(runs), media_type="application/x-ndjson"
+        )
+
+    @router.get(
+        "/heatmap",
+        status_code=status.HTTP_200_OK,
+        response_model_exclude_none=True,
+    )
+    async def get_heatmap(
+        self,
+        request: Request,
+        response: Response,
+        start_date: str | None = None,
+        end_date: str | None = None,
+        heatmap_format: Annotated[
+            RunHeatmapFormat, Query(alias="format")
+        ] = RunHeatmapFormat.JSON,
+    ) -> RunHeatmapPublic:
+        """retrieve the distance run each day between two dates, the year
+        to today by default, as delta encoded columns. Several years are
+        fetched with one wider range, base64 and binary pack the columns"""
+        try:
+            version: int = await self.runs_repository.get_data_version(
+                self.user_id
+            )
+
+            if not_modified := self._check_etag(request, response, version):
+                return not_modified
+
+            heatmap: RunHeatmap = await response_cache.get_or_set(
+                self.user_id,
+                version,
+                ("heatmap", start_date, end_date),
+                lambda: self.runs_repository.get_heatmap(
+                    self.user_id, start_date, end_date
+                ),
+            )
+
+            if heatmap_format == RunHeatmapFormat.BINARY:
+                return Response(
+                    heatmap.pack(),
+                    media_type="application/octet-stream",
+                    headers=response.headers,
+                )
+
+            return heatmap.public(heatmap_format)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+
+    @router.get("/series", status_code=status.HTTP_200_OK)
+    async def get_series(
+        self,
+        request: Request,
+        response: Response,
+        metric: RunSeriesMetric,
+        start_date: str | None = None,
+        end_date: str | None = None,
+        group_by: str = "daily",
+        points: Annotated[int, Query(ge=3, le=5000)] = 500,
+        method: RunSeriesMethod = RunSeriesMethod.LTTB,
+    ) -> RunSeriesPublic:
+        """retrieve a metric of the runs in date order for charting,
+        decimated to at most points points however long the range"""
+        try:
+            version: int = await self.runs_repository.get_data_version(
+                self.user_id
+            )
+
+            if not_modified := self._check_etag(request, response, version):
+                return not_modified
+
+            return await response_cache.get_or_set(
+                self.user_id,
+                version,
+                (
+                    "series",
+                    metric.value,
+                    start_date,
+                    end_date,
+                    group_by,
+                    points,
+                    method.value,
+                ),
+                lambda: self.runs_repository.get_series(
+                    self.user_id,
+                    metric,
+                    start_date,
+                    end_date,
+                    group_by,
+                    points,
+                    method,
+                ),
+            )
+        except NoResultFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=self.ERROR_MESSAGE_404,
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+
+    @router.get("/training_load", status_code=status.HTTP_200_OK)
+    async def get_training_load(
+        self,
+        request: Request,
+        response: Response,
+        start_date: str | None = None,
+        end_date: str | None = None,
+    ) -> RunTrainingLoadPublic:
+        """retrieve the rolling 7, 28 and 365 day totals and paces, the
+        acute and chronic training load and form for each day between two
+        dates, the 90 days to today by default"""
+        try:
+            version: int = await self.runs_repository.get_data_version(
+                self.user_id
+            )
+
+            if not_modified := self._check_etag(request, response, version):
+                return not_modified
+
+            return await response_cache.get_or_set(
+                self.user_id,
+                version,
+                ("training_load", start_date, end_date),
+                lambda: self.runs_repository.get_training_load(
+                    self.user_id, start_date, end_date
+                ),
             )
         except NoResultFound:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=self.ERROR_MESSAGE_404,
             )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
             )
 
     @router.get("/personal_bests", status_code=status.HTTP_200_OK)
-    def get_personal_bests(self) -> PersonalBestsPublic:
+    async def get_personal_bests(
+        self, request: Request, response: Response
+    ) -> PersonalBestsPublic:
         """retrieve personal bests"""
         try:
-            return PersonalBestsPublic(
-                data=self.runs_repository.personal_bests(self.user_id)
+            version: int = await self.runs_repository.get_data_version(
+                self.user_id
+            )
+
+            if not_modified := self._check_etag(request, response, version):
+                return not_modified
+
+            return await response_cache.get_or_set(
+                self.user_id,
+                version,
+                ("personal_bests",),
+                self._get_personal_bests,
             )
         except NoResultFound:
             raise HTTPException(
@@ -66,20 +356,73 @@ class RunRouter:
             )
 
     @router.post("/", status_code=status.HTTP_201_CREATED)
-    def post(self, run: RunPublic) -> None:
+    async def post(self, run: RunPublic) -> None:
         """create a run"""
         try:
-            self.runs_repository.add_run(self.user_id, run)
+            await self.runs_repository.add_run(self.user_id, run)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
             )
 
+    @router.post("/import", status_code=status.HTTP_200_OK)
+    async def import_runs(
+        self,
+        request: Request,
+        import_format: Annotated[str | None, Query(alias="format")] = None,
+    ) -> RunImportPublic:
+        """bulk import runs from a CSV or NDJSON body, the format is taken
+        from the content type unless given"""
+        import_format = import_format or RunImporter.get_format(
+            request.headers.get("content-type", "")
+        )
+
+        if import_format not in RunImporter.FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=self.ERROR_MESSAGE_IMPORT_FORMAT,
+            )
+
+        importer: RunImporter = RunImporter(import_format)
+
+        # the leaderboards the runs qualify for, rebuilt once at the end
+        # even when the import fails, as each chunk is already committed
+        personal_best_ids: set[int] = set()
+
+        try:
+            # the body is parsed in a worker thread as it is received, each
+            # chunk inserted before the next is read
+            async for chunk in iterate_in_threadpool(
+                importer.chunks(RunImporter.read_lines(request.stream()))
+            ):
+                importer.record(
+                    chunk,
+                    await self.runs_repository.add_runs(
+                        self.user_id,
+                        [run for _, run in chunk],
+                        personal_best_ids,
+                    ),
+                )
+        except UnicodeDecodeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+        finally:
+            await self.runs_repository.rebuild_personal_bests(
+                self.user_id, sorted(personal_best_ids)
+            )
+
+        return importer.result()
+
     @router.patch("/", status_code=status.HTTP_200_OK)
-    def patch(self, run: RunPublic) -> None:
+    async def patch(self, run: RunPublic) -> None:
         """update a run"""
         try:
-            self.runs_repository.update_run(self.user_id, run)
+            await self.runs_repository.update_run(self.user_id, run)
         except NoResultFound:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -91,10 +434,10 @@ class RunRouter:
             )
 
     @router.delete("/{run_id}", status_code=status.HTTP_204_NO_CONTENT)
-    def delete(self, run_id: int) -> None:
+    async def delete(self, run_id: int) -> None:
         """delete a run"""
         try:
-            self.runs_repository.delete_run(self.user_id, run_id)
+            await self.runs_repository.delete_run(self.user_id, run_id)
         except (ValueError, NoResultFound):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -104,3 +447,131 @@ class RunRouter:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
             )
+
+    def _check_etag(
+        self, request: Request, response: Response, version: int
+    ) -> Response | None:
+        """set the etag of the users data version, returning a 304 response
+        when the client already holds it. The same version keys the cached
+        response, so a cached body is never sent under a newer etag"""
+        etag: str = f'"{self.user_id}-{version}"'
+        headers: dict[str, str] = {
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",
+        }
+
+        if etag in self._get_if_none_match(request):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+            )
+
+        response.headers.update(headers)
+
+        return None
+
+    def _get_if_none_match(self, request: Request) -> list[str]:
+        """get the etags sent in If-None-Match, ignoring weak prefixes"""
+        return [
+            etag.strip().removeprefix("W/")
+            for etag in request.headers.get("if-none-match", "").split(",")
+            if etag.strip()
+        ]
+
+    async def _get_runs(
+        self,
+        start_date: str | None,
+        end_date: str | None,
+        group_by: str,
+        limit: int | None,
+        cursor: str | None,
+        sort: RunSort,
+        min_pace: float | None,
+        max_pace: float | None,
+    ) -> RunsPublic:
+        if limit:
+            runs, next_cursor = await self.runs_repository.get_runs_page(
+                self.user_id,
+                start_date,
+                end_date,
+                limit,
+                cursor,
+                False,
+                sort,
+                min_pace,
+                max_pace,
+            )
+
+            return RunsPublic(data=runs, next_cursor=next_cursor)
+
+        return RunsPublic(
+            data=await self.runs_repository.get_runs(
+                self.user_id,
+                start_date,
+                end_date,
+                group_by,
+                False,
+                sort,
+                min_pace,
+                max_pace,
+            )
+        )
+
+    async def _get_runs_json(
+        self,
+        start_date: str | None,
+        end_date: str | None,
+        group_by: str,
+        limit: int | None,
+        cursor: str | None,
+        sort: RunSort,
+        min_pace: float | None,
+        max_pace: float | None,
+    ) -> bytes:
+        """the runs as an encoded RunsPublic, read as rows of their public
+        columns"""
+        if limit:
+            runs, next_cursor = await self.runs_repository.get_runs_page(
+                self.user_id,
+                start_date,
+                end_date,
+                limit,
+                cursor,
+                True,
+                sort,
+                min_pace,
+                max_pace,
+            )
+
+            return runs_encoder.encode(runs, next_cursor)
+
+        return runs_encoder.encode(
+            await self.runs_repository.get_runs(
+                self.user_id,
+                start_date,
+                end_date,
+                group_by,
+                True,
+                sort,
+                min_pace,
+                max_pace,
+            )
+        )
+
+    async def _export_runs(
+        self, batches: AsyncIterator[Sequence[Run | Row]]
+    ) -> AsyncIterator[bytes]:
+        """serialize each streamed batch of runs to NDJSON lines"""
+        async for runs in batches:
+            if settings.FAST_JSON_ENABLED:
+                yield runs_encoder.encode_lines(runs)
+                continue
+
+            yield b"".join(
+                RunPublic(**run.model_dump()).model_dump_json().encode() + b"\n"
+                for run in runs
+            )
+
+    async def _get_personal_bests(self) -> PersonalBestsPublic:
+        return PersonalBestsPublic(
+            data=await self.runs_repository.personal_bests(self.user_id)
+        )
@@ -0,0 +1,166 @@
+from datetime import date
+from decimal import Decimal
+from typing import Sequence
+
+from sqlalchemy import Row
+
+from app.api.runs.models import (
+    RunPublic,
+    RunSeriesMethod,
+    RunSeriesMetric,
+    RunSeriesPublic,
+)
+
+
+class RunSeries:
+    """a metric of a users runs in date order, decimated to at most a
+    target number of points so the size of a chart does not grow with the
+    length of the history. Built from rows of the public run columns"""
+
+    # positions of the metrics in the public run columns
+    METRIC_COLUMNS: dict[RunSeriesMetric, int] = {
+        RunSeriesMetric.DISTANCE: 0,
+        RunSeriesMetric.DURATION: 1,
+        RunSeriesMetric.CALORIES: 2,
+        RunSeriesMetric.VO2MAX: 3,
+        RunSeriesMetric.PACE: 6,
+    }
+    RUN_DATE_COLUMN: int = 4
+    MIN_POINTS: int = 3
+
+    def __init__(self, metric: RunSeriesMetric, runs: Sequence[Row]) -> None:
+        """the series is held as columns, each built in one pass over the
+        runs, which are read newest first"""
+        runs = runs[::-1]
+        column: int = self.METRIC_COLUMNS[metric]
+        run_dates: list[date | str] = [
+            run[self.RUN_DATE_COLUMN] for run in runs
+        ]
+
+        self.metric: RunSeriesMetric = metric
+        self.dates: list[str] = [
+            run_date.isoformat() if isinstance(run_date, date) else run_date
+            for run_date in run_dates
+        ]
+        self.x: list[int] = [
+            self._get_ordinal(run_date) for run_date in run_dates
+        ]
+        self.y: list[int | float] = [
+            self._get_value(run, run[column])
+            if run[column] is None or isinstance(run[column], Decimal)
+            else run[column]
+            for run in runs
+        ]
+
+    def decimate(self, points: int, method: RunSeriesMethod) -> RunSeriesPublic:
+        """the series reduced to at most points points, keeping the first
+        and last"""
+        points = max(points, self.MIN_POINTS)
+
+        if len(self.y) <= points:
+            indexes: list[int] = list(range(len(self.y)))
+        elif method == RunSeriesMethod.LTTB:
+            indexes = self._largest_triangle_three_buckets(points)
+        else:
+            indexes = self._min_max(points)
+
+        return RunSeriesPublic(
+            metric=self.metric,
+            method=method,
+            total=len(self.y),
+            dates=[self.dates[index] for index in indexes],
+            values=[self.y[index] for index in indexes],
+        )
+
+    def _largest_triangle_three_buckets(self, points: int) -> list[int]:
+        """Largest-Triangle-Three-Buckets, the points between the first
+        and last are split into points - 2 buckets and from each the point
+        forming the largest triangle with the point kept from the previous
+        bucket and the average of the next bucket is kept"""
+        x: list[int] = self.x
+        y: list[int | float] = self.y
+        buckets: int = points - 2
+        indexes: list[int] = [0]
+        previous: int = 0
+
+        for bucket in range(buckets):
+            start: int = self._get_bucket_start(bucket, buckets)
+            end: int = self._get_bucket_start(bucket + 1, buckets)
+            next_end: int = self._get_bucket_start(bucket + 2, buckets)
+            average_x: float = sum(x[end:next_end]) / (next_end - end)
+            average_y: float = sum(y[end:next_end]) / (next_end - end)
+            previous_x: int = x[previous]
+            previous_y: int | float = y[previous]
+            largest_area: float = -1.0
+
+            for index in range(start, end):
+                # twice the triangle area, only the ordering matters
+                area: float = abs(
+                    (previous_x - average_x) * (y[index] - previous_y)
+                    - (previous_x - x[index]) * (average_y - previous_y)
+                )
+
+                if area > largest_area:
+                    largest_area = area
+                    previous = index
+
+            indexes.append(previous)
+
+        indexes.append(len(y) - 1)
+
+        return indexes
+
+    def _get_bucket_start(self, bucket: int, buckets: int) -> int:
+        """the first index of a bucket of the points between the first and
+        last, the bucket after the last holding only the last point"""
+        return min(bucket * (len(self.y) - 2) // buckets + 1, len(self.y))
+
+    def _min_max(self, points: int) -> list[int]:
+        """the smallest and largest value of each bucket of the points
+        between the first and last, in date order, keeping the peaks LTTB
+        may smooth over. With an odd number of points to fill the last
+        bucket keeps only whichever is further from its average"""
+        y: list[int | float] = self.y
+        buckets: int = (points - 1) // 2
+        indexes: list[int] = [0]
+
+        for bucket in range(buckets):
+            bucket_indexes: range = range(
+                self._get_bucket_start(bucket, buckets),
+                self._get_bucket_start(bucket + 1, buckets),
+            )
+            low: int = min(bucket_indexes, key=y.__getitem__)
+            high: int = max(bucket_indexes, key=y.__getitem__)
+
+            if bucket == buckets - 1 and points % 2:
+                values: list[int | float] = [
+                    y[index] for index in bucket_indexes
+                ]
+                average: float = sum(values) / len(values)
+                low = high = max(
+                    low, high, key=lambda index: abs(y[index] - average)
+                )
+
+            indexes.extend(sorted({low, high}))
+
+        indexes.append(len(y) - 1)
+
+        return indexes
+
+    def _get_value(self, run: Row, value: Decimal | None) -> float:
+        """the averaged vo2max of grouped runs, or the pace of runs the
+        query leaves for RunPublic to calculate"""
+        if value is None:
+            return RunPublic.calculate_pace(run.distance_m, run.duration_s)
+
+        return float(value)
+
+    def _get_ordinal(self, run_date: date | str) -> int:
+        """the day number of a run date or of the first day of a week,
+        month or year label"""
+        if isinstance(run_date, date):
+            return run_date.toordinal()
+
+        year, month, day = (run_date.split("-") + ["1", "1"])[:3]
+
+        return date(int(year), int(month), int(day)).toordinal()
@@ -0,0 +1,263 @@
+import threading
+from datetime import date, timedelta
+from itertools import accumulate
+from operator import sub
+from typing import Iterable, Sequence
+
+from sqlalchemy import Row
+
+from app.api.runs.models import RunPublic, RunTrainingLoadPublic
+from app.core.cache import LRUCacheBackend
+from app.core.config import settings
+
+# a change to the daily totals of a user, negative when a run is removed
+RunChange = tuple[date, int, int]
+
+
+class TrainingLoad:
+    """the rolling totals and training load of a users runs, held as one
+    column per measure with an entry for every day from the first run.
+
+    distance_sums and duration_sums are cumulative sums, entry n the total
+    of the days before day n, so the total of any window is the difference
+    of two entries. The acute and chronic loads are exponentially weighted
+    averages of the minutes run each day over 7 and 42 days, and form is
+    the chronic load less the acute load. A change to a day only requires
+    the columns from that day on to be recalculated, a run on the latest
+    day a single entry of each"""
+
+    WINDOWS: list[int] = [7, 28, 365]
+    ACUTE_DAYS: int = 7
+    CHRONIC_DAYS: int = 42
+
+    def __init__(self, first_date: date, days: Sequence[Row]) -> None:
+        self.first_date: date = first_date
+        self.distances_m: list[int] = []
+        self.durations_s: list[int] = []
+        self.distance_sums: list[int] = [0]
+        self.duration_sums: list[int] = [0]
+        self.acute_loads: list[float] = []
+        self.chronic_loads: list[float] = []
+
+        self.apply(
+            (run_date, int(distance_m), int(duration_s))
+            for run_date, distance_m, duration_s in days
+        )
+
+    @property
+    def last_date(self) -> date:
+        return self.first_date + timedelta(days=len(self.distances_m) - 1)
+
+    def apply(self, changes: Iterable[RunChange]) -> bool:
+        """add changes to the daily totals, recalculating the columns once
+        from the earliest day changed. False, leaving the columns as they
+        were, when a change is before the first day"""
+        changes = list(changes)
+
+        if not changes:
+            return True
+
+        first_day: int = (min(changes)[0] - self.first_date).days
+
+        if first_day < 0:
+            return False
+
+        # days added between the last day and the changes need calculating
+        first_day = min(first_day, len(self.distances_m))
+        self._pad((max(changes)[0] - self.first_date).days + 1)
+
+        for run_date, distance_m, duration_s in changes:
+            day: int = (run_date - self.first_date).days
+            self.distances_m[day] += distance_m
+            self.durations_s[day] += duration_s
+
+        self._update(first_day)
+
+        return True
+
+    def public(self, start_date: date, end_date: date) -> RunTrainingLoadPublic:
+        """every column for each day between two dates, days before the
+        first run having no load. The dates are limited to today or the
+        last run, if later, so the columns are not padded to any date"""
+        end_date = min(end_date, max(date.today(), self.last_date))
+        start_date = min(start_date, end_date)
+
+        if end_date > self.last_date:
+            day: int = len(self.distances_m)
+            self._pad((end_date - self.first_date).days + 1)
+            self._update(day)
+
+        days: range = range(
+            (start_date - self.first_date).days,
+            (end_date - self.first_date).days + 1,
+        )
+        distances_m: dict[int, list[int]] = {
+            window: self._get_totals(self.distance_sums, days, window)
+            for window in self.WINDOWS
+        }
+        durations_s: dict[int, list[int]] = {
+            window: self._get_totals(self.duration_sums, days, window)
+            for window in self.WINDOWS
+        }
+        acute_loads: list[float] = self._get_loads(self.acute_loads, days)
+        chronic_loads: list[float] = self._get_loads(self.chronic_loads, days)
+
+        return RunTrainingLoadPublic(
+            start_date=start_date,
+            end_date=end_date,
+            distances_m={f"{w}d": distances_m[w] for w in self.WINDOWS},
+            durations_s={f"{w}d": durations_s[w] for w in self.WINDOWS},
+            paces={
+                f"{window}d": [
+                    RunPublic.calculate_pace(distance_m, duration_s)
+                    if duration_s
+                    else None
+                    for distance_m, duration_s in zip(
+                        distances_m[window], durations_s[window]
+                    )
+                ]
+                for window in self.WINDOWS
+            },
+            acute_loads=[round(load, 2) for load in acute_loads],
+            chronic_loads=[round(load, 2) for load in chronic_loads],
+            forms=[
+                round(chronic - acute, 2)
+                for acute, chronic in zip(acute_loads, chronic_loads)
+            ],
+        )
+
+    def _pad(self, days: int) -> None:
+        """add days without runs up to days days, leaving the cumulative
+        columns to be updated"""
+        missing: int = max(days - len(self.distances_m), 0)
+        self.distances_m.extend([0] * missing)
+        self.durations_s.extend([0] * missing)
+
+    def _update(self, day: int) -> None:
+        """recalculate the cumulative columns from day on, each continuing
+        from the entry before day"""
+        # the sums are one entry ahead of the days they total
+        sum_day: int = day + 1
+        self.distance_sums[sum_day:] = self._accumulate(
+            self.distances_m[day:], self.distance_sums[day]
+        )
+        self.duration_sums[sum_day:] = self._accumulate(
+            self.durations_s[day:], self.duration_sums[day]
+        )
+        minutes: list[float] = [
+            duration_s / 60 for duration_s in self.durations_s[day:]
+        ]
+        self.acute_loads[day:] = self._average(
+            minutes, self.acute_loads[day - 1] if day else 0.0, self.ACUTE_DAYS
+        )
+        self.chronic_loads[day:] = self._average(
+            minutes,
+            self.chronic_loads[day - 1] if day else 0.0,
+            self.CHRONIC_DAYS,
+        )
+
+    def _accumulate(self, values: list[int], initial: int) -> list[int]:
+        return list(accumulate(values, initial=initial))[1:]
+
+    def _average(
+        self, loads: list[float], initial: float, days: int
+    ) -> list[float]:
+        """an exponentially weighted average, each day moving 1 / days of
+        the way from the previous average to its load"""
+        return list(
+            accumulate(
+                loads,
+                lambda average, load: average + (load - average) / days,
+                initial=initial,
+            )
+        )[1:]
+
+    def _get_totals(
+        self, sums: list[int], days: range, window: int
+    ) -> list[int]:
+        """the total of the window of days ending on each day, the
+        difference of the sums at the day after each day and window days
+        before it"""
+        return list(
+            map(
+                sub,
+                self._get_sums(sums, days.start + 1, days.stop + 1),
+                self._get_sums(
+                    sums, days.start + 1 - window, days.stop + 1 - window
+                ),
+            )
+        )
+
+    def _get_sums(self, sums: list[int], start: int, stop: int) -> list[int]:
+        """the sums from start to stop, those before the first day zero"""
+        first: int = max(start, 0)
+        last: int = max(stop, 0)
+
+        return [0] * min(first - start, stop - start) + sums[first:last]
+
+    def _get_loads(self, loads: list[float], days: range) -> list[float]:
+        return [loads[day] if day >= 0 else 0.0 for day in days]
+
+
+class TrainingLoadCache:
+    """the training load of recently requested users, held in process with
+    the data version of the user it was built from. A load is only read at
+    the version it was built or updated to, so a change made by another
+    process is seen as a newer version and the load rebuilt. Changes made
+    here are applied to the cached load, moving it on a version, rather
+    than discarding it"""
+
+    def __init__(self, max_entries: int, ttl_s: int) -> None:
+        self.backend: LRUCacheBackend = LRUCacheBackend(max_entries, ttl_s)
+        self.lock: threading.Lock = threading.Lock()
+
+    def public(
+        self, user_id: int, version: int, start_date: date, end_date: date
+    ) -> RunTrainingLoadPublic | None:
+        """the training load of a user at version between two dates, None
+        when it is not cached"""
+        with self.lock:
+            training_load: TrainingLoad | None = self._get(user_id, version)
+
+            if training_load is None:
+                return None
+
+            return training_load.public(start_date, end_date)
+
+    def set(
+        self, user_id: int, version: int, training_load: TrainingLoad
+    ) -> None:
+        with self.lock:
+            self.backend.set(self._get_key(user_id), (version, training_load))
+
+    def apply(
+        self, user_id: int, version: int, changes: Iterable[RunChange]
+    ) -> None:
+        """apply the changes committed as version to the load built at the
+        version before, any other load is left to be rebuilt"""
+        with self.lock:
+            training_load: TrainingLoad | None = self._get(user_id, version - 1)
+
+            if training_load is not None and training_load.apply(changes):
+                self.backend.set(
+                    self._get_key(user_id), (version, training_load)
+                )
+
+    def _get(self, user_id: int, version: int) -> TrainingLoad | None:
+        entry: tuple[int, TrainingLoad] | None = self.backend.get(
+            self._get_key(user_id)
+        )
+
+        if entry is None or entry[0] != version:
+            return None
+
+        return entry[1]
+
+    def _get_key(self, user_id: int) -> str:
+        return f"user:{user_id}"
+
+
+training_loads = TrainingLoadCache(
+    max_entries=settings.TRAINING_LOAD_CACHE_MAX_ENTRIES,
+    ttl_s=settings.TRAINING_LOAD_CACHE_TTL_S,
+)
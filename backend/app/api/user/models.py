@@ -10,9 +10,25 @@ class User(SQLModel, table=True):
     id: int = Field(primary_key=True, index=True)
     email: str = Field(unique=True, index=True)
     full_name: Optional[str] = Field(default=None, max_length=255)
+    data_version: int = Field(
+        default=0, sa_column_kwargs={"server_default": "0"}
+    )
+    # scrypt hash, users without one cannot log in
+    password_hash: Optional[str] = Field(default=None, max_length=255)
     runs: List["Run"] = Relationship(back_populates="user")
     personal_bests: List["PersonalBests"] = Relationship(back_populates="user")
 
     @field_validator("email")
     def validate_email(cls, value: str) -> str:
         return EmailStr.validate(value)
+
+
+class UserPublic(SQLModel):
+    id: int
+    email: str
+    full_name: Optional[str] = None
+
+
+class UserLogin(SQLModel):
+    email: str
+    password: str
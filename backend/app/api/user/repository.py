@@ -0,0 +1,52 @@
+from sqlalchemy import update
+from sqlmodel import select, col
+
+from app.api.user.models import User, UserPublic
+from app.core.repository import Repository, AsyncRepository
+
+
+class UserRepository(Repository):
+    def get_user(self, user_id: int) -> UserPublic | None:
+        """retrieve the public fields of a user, the password hash is left
+        unread"""
+        user = self.execute_query(
+            select(User.id, User.email, User.full_name).where(
+                User.id == user_id
+            )
+        ).one_or_none()
+
+        return UserPublic.model_validate(user._mapping) if user else None
+
+    def get_user_by_email(self, email: str) -> User | None:
+        return self.execute_query(
+            select(User).where(User.email == email)
+        ).one_or_none()
+
+    def set_password(self, email: str, password_hash: str) -> None:
+        """set the password hash of a user"""
+        user_id: int | None = self.execute_query(
+            update(User)
+            .where(col(User.email) == email)
+            .values(password_hash=password_hash)
+            .returning(col(User.id))
+        ).scalar_one_or_none()
+
+        if user_id is None:
+            raise ValueError("User not found")
+
+        self.commit()
+
+
+class AsyncUserRepository(AsyncRepository):
+    """async UserRepository, each call runs the synchronous repository
+    inside run_sync"""
+
+    async def get_user(self, user_id: int) -> UserPublic | None:
+        return await self.run_sync(
+            lambda session: UserRepository(session).get_user(user_id)
+        )
+
+    async def get_user_by_email(self, email: str) -> User | None:
+        return await self.run_sync(
+            lambda session: UserRepository(session).get_user_by_email(email)
+        )
@@ -1,2 +1,284 @@
-def get_current_user() -> int:
-    return 4
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+from functools import cached_property
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.user.models import UserPublic
+from app.api.user.repository import AsyncUserRepository
+from app.core.cache import LRUCacheBackend
+from app.core.config import settings
+from app.core.database_manager import database_manager
+
+
+class Passwords:
+    """scrypt password hashes, stored with their parameters and salt as
+    scrypt$n$r$p$salt$hash so the cost can be raised without invalidating
+    existing hashes"""
+
+    N: int = 2**14
+    R: int = 8
+    P: int = 1
+    SALT_BYTES: int = 16
+    HASH_BYTES: int = 32
+
+    def hash(self, password: str) -> str:
+        salt: bytes = secrets.token_bytes(self.SALT_BYTES)
+        digest: bytes = self._scrypt(password, salt, self.N, self.R, self.P)
+
+        return "$".join(
+            [
+                "scrypt",
+                str(self.N),
+                str(self.R),
+                str(self.P),
+                self._encode(salt),
+                self._encode(digest),
+            ]
+        )
+
+    def verify(self, password: str, password_hash: str | None) -> bool:
+        """check a password against a hash. Without a hash a dummy one is
+        checked, so an unknown email takes as long as a wrong password. A
+        malformed hash matches no password"""
+        if not password_hash:
+            self.verify(password, self._dummy_hash)
+
+            return False
+
+        try:
+            scheme, n, r, p, salt, digest = password_hash.split("$")
+
+            return scheme == "scrypt" and hmac.compare_digest(
+                self._scrypt(
+                    password, self._decode(salt), int(n), int(r), int(p)
+                ),
+                self._decode(digest),
+            )
+        except ValueError:
+            return False
+
+    @cached_property
+    def _dummy_hash(self) -> str:
+        return self.hash(secrets.token_urlsafe(16))
+
+    def _scrypt(self, password: str, salt: bytes, n: int, r: int, p: int):
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=n, r=r, p=p, dklen=self.HASH_BYTES
+        )
+
+    def _encode(self, value: bytes) -> str:
+        return base64.urlsafe_b64encode(value).rstrip(b"=").decode()
+
+    def _decode(self, value: str) -> bytes:
+        return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+class AuthTokens:
+    """issue and verify stateless auth tokens. A token is the user id, its
+    expiry and an HMAC of both, so verifying it is a hash without any IO.
+    Tokens are sent as an HttpOnly cookie, or by API clients as a bearer
+    token, and are signed and rotated like csrf tokens. Logging out only
+    clears the cookie, a token stays valid until it expires or every key
+    it could be verified with is dropped"""
+
+    def __init__(
+        self,
+        keys: list[str],
+        ttl_s: int,
+        cookie_name: str,
+        secure: bool,
+        same_site: str,
+    ) -> None:
+        self.keys: list[bytes] = [key.encode() for key in keys]
+        self.ttl_s: int = ttl_s
+        self.cookie_name: str = cookie_name
+        self.secure: bool = secure
+        self.same_site: str = same_site
+
+    def check_keys(self) -> None:
+        """refuse to run without keys, a token signed with an empty key
+        could be forged for any user"""
+        if not self.keys or not all(self.keys):
+            raise RuntimeError("AUTH_SECRET_KEYS must be set to non empty keys")
+
+    def issue(self, user_id: int) -> str:
+        payload: str = f"{user_id}.{int(time.time()) + self.ttl_s}"
+
+        return f"{payload}.{self._sign(self.keys[0], payload)}"
+
+    def verify(self, token: str | None) -> int | None:
+        """the user id of a token, None for tokens that are malformed,
+        expired or not signed with any of the keys"""
+        if not token or token.count(".") != 2:
+            return None
+
+        user_id, expires, signature = token.split(".")
+
+        # isdigit also accepts digits int can not parse, like superscripts
+        if not all(
+            field.isascii() and field.isdecimal()
+            for field in (user_id, expires)
+        ):
+            return None
+
+        if int(expires) <= time.time():
+            return None
+
+        payload: str = f"{user_id}.{expires}"
+        # every key is checked so the time taken does not reveal which
+        # key, if any, signed the token
+        valid: bool = False
+
+        for key in self.keys:
+            valid |= hmac.compare_digest(
+                signature.encode(), self._sign(key, payload).encode()
+            )
+
+        return int(user_id) if valid else None
+
+    def get_token(self, request: Request) -> str | None:
+        """the bearer token of a request, else its token cookie"""
+        authorization: str | None = request.headers.get("authorization")
+
+        if authorization:
+            scheme, _, token = authorization.partition(" ")
+
+            return token.strip() if scheme.lower() == "bearer" else None
+
+        return request.cookies.get(self.cookie_name)
+
+    def set_cookie(self, response: Response, token: str) -> None:
+        """the token cookie is HttpOnly, the SPA never reads it"""
+        response.set_cookie(
+            self.cookie_name,
+            token,
+            max_age=self.ttl_s,
+            path="/",
+            secure=self.secure,
+            httponly=True,
+            samesite=self.same_site,  # ty: ignore[invalid-argument-type]
+        )
+
+    def delete_cookie(self, response: Response) -> None:
+        response.delete_cookie(
+            self.cookie_name,
+            path="/",
+            secure=self.secure,
+            httponly=True,
+            samesite=self.same_site,  # ty: ignore[invalid-argument-type]
+        )
+
+    def _sign(self, key: bytes, payload: str) -> str:
+        digest: bytes = hmac.new(
+            key, f"auth.{payload}".encode(), hashlib.sha256
+        ).digest()
+
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+class UserCache:
+    """authenticated users held in process, so a request from a user seen
+    within the ttl is resolved without a query. Concurrent misses for the
+    same user share one lookup, made in a session of its own rather than
+    the requests, so a burst of requests as an entry expires sends one
+    query. Users are only cached once found, a token for a deleted user
+    looks it up on every request"""
+
+    def __init__(self, max_entries: int, ttl_s: int, enabled: bool = True):
+        self.backend: LRUCacheBackend = LRUCacheBackend(max_entries, ttl_s)
+        self.enabled: bool = enabled
+        self.lookups: dict[int, asyncio.Task] = {}
+
+    async def get(self, user_id: int) -> UserPublic | None:
+        if not self.enabled:
+            return await self._get_user(user_id)
+
+        user: UserPublic | None = self.backend.get(self._get_key(user_id))
+
+        if user is not None:
+            return user
+
+        if user_id not in self.lookups:
+            self.lookups[user_id] = asyncio.create_task(self._load(user_id))
+
+        # shielded so a cancelled request does not cancel the lookup of
+        # the others waiting on it
+        return await asyncio.shield(self.lookups[user_id])
+
+    def set(self, user: UserPublic) -> None:
+        if self.enabled:
+            self.backend.set(self._get_key(user.id), user)
+
+    async def _load(self, user_id: int) -> UserPublic | None:
+        try:
+            user: UserPublic | None = await self._get_user(user_id)
+
+            if user is not None:
+                self.set(user)
+
+            return user
+        finally:
+            del self.lookups[user_id]
+
+    async def _get_user(self, user_id: int) -> UserPublic | None:
+        async with AsyncSession(database_manager.get_async_engine()) as session:
+            return await AsyncUserRepository(session).get_user(user_id)
+
+    def _get_key(self, user_id: int) -> str:
+        return f"user:{user_id}"
+
+
+class UserAuthentication:
+    """dependency resolving the user of a request from its auth token"""
+
+    ERROR_MESSAGE_401: str = "Not authenticated"
+
+    def __init__(self, tokens: AuthTokens, users: UserCache) -> None:
+        self.tokens: AuthTokens = tokens
+        self.users: UserCache = users
+
+    async def __call__(self, request: Request) -> UserPublic:
+        user_id: int | None = self.tokens.verify(self.tokens.get_token(request))
+        user: UserPublic | None = (
+            None if user_id is None else await self.users.get(user_id)
+        )
+
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=self.ERROR_MESSAGE_401,
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        return user
+
+
+passwords = Passwords()
+
+auth_tokens = AuthTokens(
+    settings.AUTH_SECRET_KEYS,
+    settings.AUTH_TOKEN_TTL_S,
+    settings.AUTH_COOKIE_NAME,
+    settings.SESSION_COOKIE_SECURE,
+    settings.SESSION_SAME_SITE,
+)
+
+user_cache = UserCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl_s=settings.USER_CACHE_TTL_S,
+)
+
+get_current_user_public = UserAuthentication(auth_tokens, user_cache)
+
+
+async def get_current_user(
+    user: Annotated[UserPublic, Depends(get_current_user_public)],
+) -> int:
+    return user.id
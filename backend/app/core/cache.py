@@ -0,0 +1,148 @@
+import importlib
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class CacheBackend(ABC):
+    """storage for the response cache. Values are only ever read back by
+    the process type that wrote them, shared backends are responsible for
+    serializing them"""
+
+    @abstractmethod
+    def get(self, key: str) -> Any | None:
+        """get a value, None when missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        """store a value"""
+
+    def metrics(self) -> dict[str, int]:
+        """backend specific counters"""
+        return {}
+
+
+class LRUCacheBackend(CacheBackend):
+    """in process least recently used cache with a time to live"""
+
+    def __init__(self, max_entries: int, ttl_s: int) -> None:
+        self.max_entries: int = max_entries
+        self.ttl_s: int = ttl_s
+        self.lock: threading.Lock = threading.Lock()
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+    def get(self, key: str) -> Any | None:
+        with self.lock:
+            if key not in self.entries:
+                return None
+
+            expires_at, value = self.entries[key]
+
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                return None
+
+            self.entries.move_to_end(key)
+
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_s, value)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def metrics(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class ResponseCache:
+    """per user response cache. Keys embed the data version of the user
+    read for the request, the version every process writing their runs
+    increments as it commits, so a change made anywhere leaves the
+    responses of older versions unread until they expire. A response
+    computed while a write commits is at least as new as the version it
+    is stored under"""
+
+    def __init__(self, backend: CacheBackend, enabled: bool = True) -> None:
+        self.backend: CacheBackend = backend
+        self.enabled: bool = enabled
+        self.lock: threading.Lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    async def get_or_set(
+        self,
+        user_id: int,
+        version: int,
+        key: tuple,
+        callback: Callable[[], Awaitable[T]],
+    ) -> T:
+        """get a cached response for user at a data version, calling
+        callback on a miss"""
+        if not self.enabled:
+            return await callback()
+
+        cache_key: str = self._get_key(user_id, version, key)
+        value: T | None = self.backend.get(cache_key)
+
+        if value is not None:
+            self._count("hits")
+            return value
+
+        self._count("misses")
+        value = await callback()
+        self.backend.set(cache_key, value)
+
+        return value
+
+    def metrics(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                **self.backend.metrics(),
+            }
+
+    def _get_key(self, user_id: int, version: int, key: tuple) -> str:
+        return ":".join([f"user:{user_id}", str(version), *map(str, key)])
+
+    def _count(self, counter: str) -> None:
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+def get_cache_backend() -> CacheBackend:
+    """build the backend named by RESPONSE_CACHE_BACKEND, a module:class
+    path to a CacheBackend taking max_entries and ttl_s"""
+    module_name, class_name = settings.RESPONSE_CACHE_BACKEND.split(":")
+    backend: type[CacheBackend] = getattr(
+        importlib.import_module(module_name), class_name
+    )
+
+    return backend(
+        max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_s=settings.RESPONSE_CACHE_TTL_S,
+    )
+
+
+response_cache = ResponseCache(
+    get_cache_backend(), enabled=settings.RESPONSE_CACHE_ENABLED
+)
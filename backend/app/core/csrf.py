@@ -0,0 +1,122 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+
+from starlette.requests import cookie_parser
+from starlette.types import Scope
+
+from app.core.config import settings
+
+
+class CSRFTokens:
+    """issue and verify stateless double submit csrf tokens. A token is its
+    expiry, a random nonce and an HMAC of both, so it is verified without
+    any session state. Tokens are signed with the first key and verified
+    against every key, so keys are rotated by putting a new key first and
+    dropping the old one once the tokens it signed have expired"""
+
+    # tokens expiring within this fraction of the ttl are reissued
+    REFRESH_FRACTION: float = 0.5
+
+    def __init__(
+        self,
+        keys: list[str],
+        ttl_s: int,
+        cookie_name: str,
+        secure: bool,
+        same_site: str,
+    ) -> None:
+        self.keys: list[bytes] = [key.encode() for key in keys]
+        self.ttl_s: int = ttl_s
+        self.cookie_name: str = cookie_name
+        self.secure: bool = secure
+        self.same_site: str = same_site
+
+    def check_keys(self) -> None:
+        """refuse to run without keys, a token signed with an empty key
+        could be forged by anyone"""
+        if not self.keys or not all(self.keys):
+            raise RuntimeError("CSRF_SECRET_KEYS must be set to non empty keys")
+
+    def issue(self) -> str:
+        payload: str = (
+            f"{int(time.time()) + self.ttl_s}.{secrets.token_urlsafe(16)}"
+        )
+
+        return f"{payload}.{self._sign(self.keys[0], payload)}"
+
+    def expires_in(self, token: str | None) -> float | None:
+        """the seconds until a token expires, None for tokens that are
+        malformed, expired or not signed with any of the keys"""
+        if not token or token.count(".") != 2:
+            return None
+
+        payload, signature = token.rsplit(".", 1)
+        expires: str = payload.split(".", 1)[0]
+
+        # isdigit also accepts digits int can not parse, like superscripts
+        if not expires.isascii() or not expires.isdecimal():
+            return None
+
+        expires_in: float = int(expires) - time.time()
+
+        if expires_in <= 0:
+            return None
+
+        # every key is checked so the time taken does not reveal which
+        # key, if any, signed the token
+        valid: bool = False
+
+        for key in self.keys:
+            valid |= hmac.compare_digest(
+                signature.encode(), self._sign(key, payload).encode()
+            )
+
+        return expires_in if valid else None
+
+    def needs_refresh(self, token: str | None) -> bool:
+        expires_in: float | None = self.expires_in(token)
+
+        return expires_in is None or (
+            expires_in < self.ttl_s * self.REFRESH_FRACTION
+        )
+
+    def get_cookie(self, scope: Scope) -> str | None:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                return cookie_parser(value.decode("latin-1")).get(
+                    self.cookie_name
+                )
+
+        return None
+
+    def set_cookie_header(self, token: str) -> tuple[bytes, bytes]:
+        """the token cookie is readable by the SPA, which sends it back in
+        the csrf header of unsafe requests"""
+        cookie: str = (
+            f"{self.cookie_name}={token}; Path=/; Max-Age={self.ttl_s}; "
+            f"SameSite={self.same_site}"
+        )
+
+        if self.secure:
+            cookie += "; Secure"
+
+        return b"set-cookie", cookie.encode("latin-1")
+
+    def _sign(self, key: bytes, payload: str) -> str:
+        digest: bytes = hmac.new(
+            key, f"csrf.{payload}".encode(), hashlib.sha256
+        ).digest()
+
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+csrf_tokens = CSRFTokens(
+    settings.CSRF_SECRET_KEYS,
+    settings.CSRF_TOKEN_TTL_S,
+    settings.CSRF_COOKIE_NAME,
+    settings.SESSION_COOKIE_SECURE,
+    settings.SESSION_SAME_SITE,
+)
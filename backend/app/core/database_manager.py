@@ -1,30 +1,68 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from app.core.config import settings
+from app.core.pool import (
+    IdleConnectionPing,
+    InstrumentedAsyncAdaptedQueuePool,
+    InstrumentedQueuePool,
+)
+from app.core.query_profiler import QueryProfiler
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 
 class DatabaseManager:
     def __init__(self) -> None:
         self.engine: Engine | None = None
+        self.async_engine: AsyncEngine | None = None
 
     def startup(self) -> None:
-        """Initialize the database engine"""
+        """Initialize the database engines, connections are only opened
+        when first used so an unused engine holds none"""
         self.engine = create_engine(
             str(settings.SQLALCHEMY_DATABASE_URI),
-            pool_size=10,
-            max_overflow=5,
-            pool_pre_ping=True,
-            pool_recycle=1800,
-            echo=settings.SQL_ALCHEMY_ECHO,
+            poolclass=InstrumentedQueuePool,
+            **self._get_pool_options(),
         )
+        self.async_engine = create_async_engine(
+            str(settings.SQLALCHEMY_DATABASE_URI),
+            poolclass=InstrumentedAsyncAdaptedQueuePool,
+            **self._get_pool_options(),
+        )
+
+        if (
+            settings.SQL_ALCHEMY_POOL_IDLE_PING_S
+            and not settings.SQL_ALCHEMY_POOL_PRE_PING
+        ):
+            for pool in [self.engine.pool, self.async_engine.sync_engine.pool]:
+                IdleConnectionPing(pool, settings.SQL_ALCHEMY_POOL_IDLE_PING_S)
+
+        if settings.QUERY_PROFILING_ENABLED:
+            query_profiler = QueryProfiler(
+                settings.SLOW_QUERY_MS, settings.SLOW_QUERY_EXPLAIN
+            )
+
+            for engine in [self.engine, self.async_engine.sync_engine]:
+                query_profiler.instrument(engine)
 
     def shutdown(self) -> None:
         """Shutdown the database engine"""
         if self.engine:
             self.engine.dispose()
 
+        if self.async_engine:
+            self.async_engine.sync_engine.dispose()
+
+    async def async_shutdown(self) -> None:
+        """Shutdown the database engines from within the event loop"""
+        if self.engine:
+            self.engine.dispose()
+
+        if self.async_engine:
+            await self.async_engine.dispose()
+
     def get_engine(self) -> Engine:
         """get database engine"""
         if not self.engine:
@@ -32,6 +70,42 @@ class DatabaseManager:
 
         return self.engine
 
+    def get_async_engine(self) -> AsyncEngine:
+        """get async database engine"""
+        if not self.async_engine:
+            raise RuntimeError("Database engine not initialized")
+
+        return self.async_engine
+
+    def get_pool_metrics(self) -> dict[str, dict]:
+        """get the pool metrics of both engines"""
+        async_pool = self.get_async_engine().sync_engine.pool
+
+        return {
+            "sync": self.get_engine().pool.metrics.snapshot(),
+            "async": async_pool.metrics.snapshot(),
+        }
+
+    def _get_pool_options(self) -> dict:
+        """pool options shared by both engines"""
+        return {
+            "pool_size": settings.SQL_ALCHEMY_POOL_SIZE,
+            "max_overflow": settings.SQL_ALCHEMY_MAX_OVERFLOW,
+            "pool_timeout": settings.SQL_ALCHEMY_POOL_TIMEOUT,
+            "pool_recycle": settings.SQL_ALCHEMY_POOL_RECYCLE,
+            "pool_pre_ping": settings.SQL_ALCHEMY_POOL_PRE_PING,
+            "echo": settings.SQL_ALCHEMY_ECHO,
+            "connect_args": self._get_connect_args(),
+        }
+
+    def _get_connect_args(self) -> dict:
+        """changes are only shipped outside development, so there sessions
+        turn the change log off rather than queue changes for nothing"""
+        if settings.DEVELOPMENT:
+            return {"options": "-c treadmilltracker.change_log=off"}
+
+        return {}
+
     def get_session(self) -> Generator[Session, None, None]:
         """get database session"""
         session: Session = Session(self.get_engine())
@@ -41,5 +115,14 @@ class DatabaseManager:
         finally:
             session.close()
 
+    async def get_async_session(self) -> AsyncGenerator[AsyncSession, None]:
+        """get async database session"""
+        session: AsyncSession = AsyncSession(self.get_async_engine())
+
+        try:
+            yield session
+        finally:
+            await session.close()
+
 
 database_manager = DatabaseManager()
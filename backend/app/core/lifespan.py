@@ -1,10 +1,18 @@
 from fastapi import FastAPI
+from app.core.authentication import auth_tokens
+from app.core.config import settings
+from app.core.csrf import csrf_tokens
 from app.core.database_manager import database_manager
 
 
 async def lifespan(app: FastAPI):
+    auth_tokens.check_keys()
+
+    if settings.CSRF_MODE == "signed":
+        csrf_tokens.check_keys()
+
     database_manager.startup()
 
     yield
 
-    database_manager.shutdown()
+    await database_manager.async_shutdown()
@@ -0,0 +1,199 @@
+import json
+import os
+import tempfile
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from app.core.config import settings
+
+
+class Histogram:
+    """cumulative histogram of observations in seconds. Only ever updated
+    from the event loop thread so plain integer increments are safe
+    without a lock"""
+
+    BUCKETS: tuple[float, ...] = (
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+    )
+
+    def __init__(self) -> None:
+        # the last count is for observations above every bucket
+        self.counts: list[int] = [0] * (len(self.BUCKETS) + 1)
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.BUCKETS, value)] += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> Iterator[tuple[str, int]]:
+        """the count of each bucket including those below it, ending with
+        the +Inf bucket which is the total count"""
+        total: int = 0
+
+        for bucket, count in zip(
+            [*map(str, self.BUCKETS), "+Inf"], self.counts, strict=True
+        ):
+            total += count
+            yield bucket, total
+
+
+class RequestMetrics:
+    """request latency, count and in flight telemetry labelled by route.
+    Routes are labelled by their endpoint, e.g. RunRouter.get_runs, so
+    path parameters do not create a label per run"""
+
+    def __init__(self) -> None:
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.responses: dict[tuple[str, str, int], int] = {}
+        self.in_flight: int = 0
+
+    def observe(
+        self, route: str, method: str, status_code: int, duration_s: float
+    ) -> None:
+        if (route, method) not in self.latency:
+            self.latency[(route, method)] = Histogram()
+
+        self.latency[(route, method)].observe(duration_s)
+        key: tuple[str, str, int] = (route, method, status_code)
+        self.responses[key] = self.responses.get(key, 0) + 1
+
+
+class JobMetrics:
+    """outcome of the last run of each database job. Jobs run as their own
+    process, so they are kept in a JSON file the application reads when
+    it is scraped, replaced atomically so a scrape never sees a partial
+    write"""
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+
+    @contextmanager
+    def track(self, job: str) -> Iterator[dict[str, float]]:
+        """time a job, recording whether it succeeded along with any sizes
+        it adds to the yielded dict"""
+        sizes: dict[str, float] = {}
+        started: float = time.perf_counter()
+        succeeded: bool = False
+
+        try:
+            yield sizes
+            succeeded = True
+        finally:
+            self._record(job, succeeded, time.perf_counter() - started, sizes)
+
+    def read(self) -> dict[str, dict[str, float]]:
+        try:
+            with open(self.path) as metrics_file:
+                return json.load(metrics_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _record(
+        self,
+        job: str,
+        succeeded: bool,
+        duration_s: float,
+        sizes: dict[str, float],
+    ) -> None:
+        jobs: dict[str, dict[str, float]] = self.read()
+        jobs[job] = {
+            **(jobs.get(job, {}) if not succeeded else {}),
+            "last_run_timestamp_seconds": time.time(),
+            "last_duration_seconds": duration_s,
+            "last_success": int(succeeded),
+            **sizes,
+        }
+
+        if succeeded:
+            jobs[job]["last_success_timestamp_seconds"] = time.time()
+
+        directory: str = os.path.dirname(os.path.abspath(self.path))
+
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, delete=False
+        ) as metrics_file:
+            json.dump(jobs, metrics_file)
+
+        os.replace(metrics_file.name, self.path)
+
+
+class MetricsExposition:
+    """render metrics in the Prometheus text exposition format"""
+
+    PREFIX: str = "treadmilltracker"
+
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+
+    def add(
+        self,
+        name: str,
+        metric_type: str,
+        help_text: str,
+        samples: list[tuple[dict[str, Any], float]],
+    ) -> None:
+        name = f"{self.PREFIX}_{name}"
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+
+        for labels, value in samples:
+            self.lines.append(f"{name}{self._labels(labels)} {value}")
+
+    def add_histograms(
+        self, name: str, help_text: str, histograms: dict[tuple, Histogram]
+    ) -> None:
+        name = f"{self.PREFIX}_{name}"
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} histogram")
+
+        for (route, method), histogram in sorted(histograms.items()):
+            labels: dict[str, Any] = {"route": route, "method": method}
+            count: int = 0
+
+            for bucket, count in histogram.cumulative_counts():
+                self.lines.append(
+                    f"{name}_bucket{self._labels({**labels, 'le': bucket})}"
+                    f" {count}"
+                )
+
+            self.lines.append(
+                f"{name}_sum{self._labels(labels)} {histogram.sum}"
+            )
+            self.lines.append(f"{name}_count{self._labels(labels)} {count}")
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+    def _labels(self, labels: dict[str, Any]) -> str:
+        if not labels:
+            return ""
+
+        return (
+            "{"
+            + ",".join(
+                f'{key}="{self._escape(str(value))}"'
+                for key, value in labels.items()
+            )
+            + "}"
+        )
+
+    def _escape(self, value: str) -> str:
+        return (
+            value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        )
+
+
+request_metrics = RequestMetrics()
+job_metrics = JobMetrics(settings.JOB_METRICS_PATH)
@@ -0,0 +1,156 @@
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+class PoolMetrics:
+    """counters for a connection pool, updated from pool events and from
+    InstrumentedPool.connect so checkout waits are measured as seen by the
+    caller"""
+
+    def __init__(self, pool: Pool) -> None:
+        self.pool: Pool = pool
+        self.lock: threading.Lock = threading.Lock()
+        self.checkouts: int = 0
+        self.checkout_wait_total_s: float = 0.0
+        self.checkout_wait_max_s: float = 0.0
+        self.checkout_timeouts: int = 0
+        self.connections_created: int = 0
+        self.invalidations: int = 0
+        self.idle_pings: int = 0
+        self.idle_ping_failures: int = 0
+        self.overflow_max: int = 0
+
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "invalidate", self._on_invalidate)
+        event.listen(pool, "soft_invalidate", self._on_invalidate)
+
+    def record_checkout(self, wait_s: float) -> None:
+        with self.lock:
+            self.checkouts += 1
+            self.checkout_wait_total_s += wait_s
+            self.checkout_wait_max_s = max(self.checkout_wait_max_s, wait_s)
+            self.overflow_max = max(self.overflow_max, self._overflow())
+
+    def record_timeout(self) -> None:
+        with self.lock:
+            self.checkout_timeouts += 1
+
+    def record_idle_ping(self, failed: bool) -> None:
+        with self.lock:
+            self.idle_pings += 1
+
+            if failed:
+                self.idle_ping_failures += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """current pool state and counters"""
+        with self.lock:
+            return {
+                "pool_size": self.pool.size(),  # ty: ignore
+                "checked_out": self.pool.checkedout(),  # ty: ignore
+                "checked_in": self.pool.checkedin(),  # ty: ignore
+                "overflow": self._overflow(),
+                "overflow_max": self.overflow_max,
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": round(
+                    self.checkout_wait_total_s * 1000 / self.checkouts, 3
+                )
+                if self.checkouts
+                else 0.0,
+                "checkout_wait_max_ms": round(
+                    self.checkout_wait_max_s * 1000, 3
+                ),
+                "checkout_timeouts": self.checkout_timeouts,
+                "connections_created": self.connections_created,
+                "invalidations": self.invalidations,
+                "idle_pings": self.idle_pings,
+                "idle_ping_failures": self.idle_ping_failures,
+            }
+
+    def _overflow(self) -> int:
+        return max(self.pool.overflow(), 0)  # ty: ignore
+
+    def _on_connect(self, *args) -> None:
+        with self.lock:
+            self.connections_created += 1
+
+    def _on_invalidate(self, *args) -> None:
+        with self.lock:
+            self.invalidations += 1
+
+
+class InstrumentedPool:
+    """pool mixin timing every checkout, including waits for a free
+    connection and opening new ones"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics: PoolMetrics = PoolMetrics(self)  # ty: ignore
+
+    def connect(self):
+        start = time.perf_counter()
+
+        try:
+            connection = super().connect()  # ty: ignore[unresolved-attribute]
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+
+        self.metrics.record_checkout(time.perf_counter() - start)
+
+        return connection
+
+
+class InstrumentedQueuePool(InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(
+    InstrumentedPool, AsyncAdaptedQueuePool
+):
+    pass
+
+
+class IdleConnectionPing:
+    """lighter alternative to pool_pre_ping, connections are only pinged
+    on checkout when they have been idle in the pool for longer than
+    idle_s, so busy connections skip the extra round trip"""
+
+    def __init__(self, pool: Pool, idle_s: int) -> None:
+        self.idle_s: int = idle_s
+        self.metrics: PoolMetrics | None = getattr(pool, "metrics", None)
+
+        event.listen(pool, "checkin", self._on_checkin)
+        event.listen(pool, "checkout", self._on_checkout)
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    def _on_checkout(
+        self, dbapi_connection, connection_record, connection_proxy
+    ) -> None:
+        checked_in_at: float | None = connection_record.info.get(
+            "checked_in_at"
+        )
+
+        if checked_in_at is None or (
+            time.monotonic() - checked_in_at < self.idle_s
+        ):
+            return
+
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception:
+            if self.metrics:
+                self.metrics.record_idle_ping(failed=True)
+
+            raise exc.DisconnectionError("Idle connection failed ping")
+
+        if self.metrics:
+            self.metrics.record_idle_ping(failed=False)
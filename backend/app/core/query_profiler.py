@@ -0,0 +1,130 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+# request and slow query logs, kept apart from other app loggers so their
+# level can be set on their own
+logger = logging.getLogger("app.queries")
+
+
+@dataclass
+class QueryStats:
+    """queries sent while handling a single request"""
+
+    queries: int = 0
+    duration_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: str | None = None
+
+    def record(self, statement: str, duration_ms: float) -> None:
+        self.queries += 1
+        self.duration_ms += duration_ms
+
+        if duration_ms > self.slowest_ms:
+            self.slowest_ms = duration_ms
+            self.slowest_statement = statement
+
+
+# the stats of the request being handled. The same object is shared by the
+# contexts copied from the request, such as threadpool calls and the
+# greenlets the async engine runs statements in, so it is updated in place
+query_stats: ContextVar[QueryStats | None] = ContextVar(
+    "query_stats", default=None
+)
+
+
+class QueryProfiler:
+    """time every statement an engine sends, adding it to the stats of the
+    current request. Statements slower than the threshold are logged with
+    their plan, SELECTs are EXPLAIN ANALYZEd and anything that writes is
+    only EXPLAINed so it is not run twice. A statement is explained at most
+    once per interval, time spent waiting on a busy event loop counts
+    towards a statement so under load the same fast statements can all
+    look slow"""
+
+    EXPLAINABLE: tuple[str, ...] = ("select", "insert", "update", "delete")
+    EXPLAIN_INTERVAL_S: int = 60
+
+    def __init__(self, slow_query_ms: int, explain: bool) -> None:
+        self.slow_query_ms: int = slow_query_ms
+        self.explain: bool = explain
+        self.explained_at: dict[str, float] = {}
+
+    def instrument(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn: Connection, *args) -> None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def _after_execute(
+        self,
+        conn: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        duration_ms: float = (
+            time.perf_counter() - conn.info["query_started"].pop()
+        ) * 1000
+
+        if stats := query_stats.get():
+            stats.record(statement, duration_ms)
+
+        if self.slow_query_ms and duration_ms >= self.slow_query_ms:
+            logger.warning(
+                json.dumps(
+                    {
+                        "event": "slow_query",
+                        "duration_ms": round(duration_ms, 2),
+                        "statement": " ".join(statement.split()),
+                        "plan": self._explain(conn, statement, parameters)
+                        if self.explain and not executemany
+                        else None,
+                    }
+                )
+            )
+
+    def _explain(
+        self, conn: Connection, statement: str, parameters: Any
+    ) -> list[str] | None:
+        """get the plan of a statement on a cursor of its own connection,
+        so explaining does not fire these events again. It runs within a
+        savepoint so a failure cannot abort the requests transaction"""
+        operation: str = statement.lstrip().split(None, 1)[0].lower()
+        now: float = time.monotonic()
+
+        if operation not in self.EXPLAINABLE or (
+            now - self.explained_at.get(statement, -self.EXPLAIN_INTERVAL_S)
+            < self.EXPLAIN_INTERVAL_S
+        ):
+            return None
+
+        self.explained_at[statement] = now
+
+        options: str = "ANALYZE, BUFFERS" if operation == "select" else "COSTS"
+        cursor = conn.connection.dbapi_connection.cursor()  # ty: ignore
+
+        try:
+            cursor.execute("SAVEPOINT query_profiler")
+
+            try:
+                cursor.execute(f"EXPLAIN ({options}) {statement}", parameters)
+                plan: list[str] = [row[0] for row in cursor.fetchall()]
+                cursor.execute("RELEASE SAVEPOINT query_profiler")
+
+                return plan
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT query_profiler")
+
+                return [f"explain failed: {e}"]
+        finally:
+            cursor.close()
@@ -1,12 +1,15 @@
-from sqlalchemy import Select, Delete, Update
+from sqlalchemy import Select, Delete, Update, Insert, TextClause
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from typing import Annotated
+from typing import Annotated, Callable, TypeVar
 
 from fastapi import Depends
 
 from app.core.database_manager import database_manager
 
+T = TypeVar("T")
+
 
 class Repository:
     def __init__(
@@ -14,9 +17,14 @@ class Repository:
     ):
         self.session: Session = session
 
-    def execute_query(self, query: Select | Delete | Update):
+    def execute_query(
+        self,
+        query: Select | Delete | Update | Insert | TextClause,
+        params: list[dict] | None = None,
+    ):
+        """execute query, once per entry of params when given"""
         return self.session.exec(
-            query
+            query, params=params
         )  # ty: ignore[no-matching-overload]
 
     def delete(self, model: object, commit: bool = True) -> None:
@@ -35,6 +43,60 @@ class Repository:
         if commit:
             self.commit()
 
+    def flush(self) -> None:
+        """flush pending changes without committing"""
+        self.session.flush()
+
     def commit(self):
         """commit session"""
         self.session.commit()
+
+    def rollback(self):
+        """rollback session"""
+        self.session.rollback()
+
+
+class AsyncRepository:
+    def __init__(
+        self,
+        session: Annotated[
+            AsyncSession, Depends(database_manager.get_async_session)
+        ],
+    ):
+        self.session: AsyncSession = session
+
+    async def execute_query(self, query: Select | Delete | Update | Insert):
+        return await self.session.exec(
+            query
+        )  # ty: ignore[no-matching-overload]
+
+    async def delete(self, model: object, commit: bool = True) -> None:
+        """delete a model instance"""
+        await self.session.delete(model)
+
+        if commit:
+            await self.commit()
+
+    async def add(self, model: object, commit: bool = True) -> None:
+        """insert/update a model instance"""
+        self.session.add(model)
+
+        if commit:
+            await self.commit()
+
+    async def flush(self) -> None:
+        """flush pending changes without committing"""
+        await self.session.flush()
+
+    async def commit(self):
+        """commit session"""
+        await self.session.commit()
+
+    async def rollback(self):
+        """rollback session"""
+        await self.session.rollback()
+
+    async def run_sync(self, callback: Callable[[Session], T]) -> T:
+        """run synchronous repository code against the async session, the
+        database IO is still performed without blocking the event loop"""
+        return await self.session.run_sync(callback)
@@ -7,3 +7,8 @@ class DevelopmentSettings(Settings):
     SESSION_SAME_SITE: str = "lax"
 
     SQL_ALCHEMY_ECHO: bool = False
+    SQL_ALCHEMY_POOL_SIZE: int = 5
+    SQL_ALCHEMY_MAX_OVERFLOW: int = 5
+    SQL_ALCHEMY_POOL_PRE_PING: bool = True
+
+    SLOW_QUERY_MS: int = 100
@@ -1,6 +1,9 @@
+from typing import Literal
+
 from pydantic import PostgresDsn, computed_field
 from pydantic_settings import BaseSettings
 import os
+import tempfile
 
 
 class Settings(BaseSettings):
@@ -20,15 +23,94 @@ class Settings(BaseSettings):
         "TREADMILL_TRACKER_S3_BUCKET", ""
     ).strip()
     AWS_S3_BACKUP_PATH: str = "backups/treadmilltracker/"
+    # S3 compatible endpoint to use in place of AWS, e.g. a local stand in
+    AWS_S3_ENDPOINT_URL: str | None = (
+        os.environ.get("AWS_S3_ENDPOINT_URL") or None
+    )
 
     DAYS_BACKUPS_TO_KEEP: int = 7
+    # custom format restores with pg_restore, plain is SQL for psql, both
+    # are gzip compressed as they are streamed to S3
+    BACKUP_FORMAT: Literal["custom", "plain"] = "custom"
+    BACKUP_COMPRESSION_LEVEL: int = 6
+    BACKUP_PART_SIZE_MB: int = 16
+    BACKUP_UPLOAD_CONCURRENCY: int = 4
+    BACKUP_DOWNLOAD_CONCURRENCY: int = 4
+    # parallel pg_restore jobs for custom format backports, 1 streams the
+    # backup into pg_restore without a temp file
+    RESTORE_JOBS: int = 4
+    # changes per object shipped by the continuous backup
+    CHANGE_BATCH_SIZE: int = 5000
+    # seconds between shipping runs of ship-changes --follow, the most
+    # change lost with the database between full backups
+    CHANGE_SHIP_INTERVAL_S: int = 300
 
     CORS_ORIGINS: list[str] = ["https://treadmilltracker.zz50.co.uk"]
     SESSION_SECRET: str = os.environ.get("FAST_API_SECRET_KEY", "")
     SESSION_COOKIE_SECURE: bool = True
     SESSION_SAME_SITE: str = "none"
+    # signed verifies a double submitted HMAC signed csrf token without any
+    # session state, session compares the header with a token held in the
+    # session cookie
+    CSRF_MODE: Literal["signed", "session"] = "signed"
+    # csrf tokens are signed with the first key and verified with all of
+    # them, a new key is put first and the old one dropped after the ttl.
+    # The application does not start in signed mode with an empty key
+    CSRF_SECRET_KEYS: list[str] = [os.environ.get("FAST_API_SECRET_KEY", "")]
+    CSRF_TOKEN_TTL_S: int = 86400
+    CSRF_COOKIE_NAME: str = "csrf_token"
+    # stateless signed auth tokens, rotated like the csrf keys. Dropping
+    # every key an outstanding token was signed with revokes it. Set as a
+    # JSON list in the AUTH_SECRET_KEYS environment variable, apart from
+    # the session secret, the application does not start without them
+    AUTH_SECRET_KEYS: list[str] = []
+    AUTH_TOKEN_TTL_S: int = 604800
+    AUTH_COOKIE_NAME: str = "auth_token"
+    # authenticated users held in process so resolving the user of a
+    # request needs no query, changes are seen once an entry expires
+    USER_CACHE_MAX_ENTRIES: int = 1024
+    USER_CACHE_TTL_S: int = 60
 
     SQL_ALCHEMY_ECHO: bool = False
+    SQL_ALCHEMY_POOL_SIZE: int = 10
+    SQL_ALCHEMY_MAX_OVERFLOW: int = 5
+    SQL_ALCHEMY_POOL_TIMEOUT: int = 30
+    SQL_ALCHEMY_POOL_RECYCLE: int = 1800
+    SQL_ALCHEMY_POOL_PRE_PING: bool = False
+    # ping connections idle for longer than this on checkout instead of
+    # pinging every checkout, 0 disables. Ignored when pre ping is on
+    SQL_ALCHEMY_POOL_IDLE_PING_S: int = 60
+
+    # count the queries and database time of each request, reported in a
+    # Server-Timing header and logged
+    QUERY_PROFILING_ENABLED: bool = True
+    # requests sending more queries than this are logged as warnings
+    QUERY_PROFILING_MAX_QUERIES: int = 20
+    QUERY_PROFILING_LOG_LEVEL: str = "INFO"
+    # statements slower than this are logged with their plan, 0 disables
+    SLOW_QUERY_MS: int = 500
+    SLOW_QUERY_EXPLAIN: bool = True
+
+    # Prometheus metrics served at /metrics, database jobs record their
+    # last run to a file the application reads when scraped
+    METRICS_ENABLED: bool = True
+    JOB_METRICS_PATH: str = os.path.join(
+        tempfile.gettempdir(), "treadmilltracker_job_metrics.json"
+    )
+
+    # encode run listings and exports straight from query rows rather than
+    # validating every run through RunPublic, the JSON is unchanged
+    FAST_JSON_ENABLED: bool = True
+
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: str = "app.core.cache:LRUCacheBackend"
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_TTL_S: int = 300
+
+    # users whose rolling training load is held in process, each updated
+    # in place as their runs change
+    TRAINING_LOAD_CACHE_MAX_ENTRIES: int = 256
+    TRAINING_LOAD_CACHE_TTL_S: int = 3600
 
     @computed_field
     @property
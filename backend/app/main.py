@@ -1,11 +1,21 @@
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
 from app.core.config import settings
+from app.core.csrf import csrf_tokens
 from app.core.lifespan import lifespan
 from app.api.main import api_router
+from app.api.metrics import routes as metrics_routes
+from app.core.metrics import request_metrics
 from app.middleware.CSRFMiddleware import CSRFMiddleware
+from app.middleware.MetricsMiddleware import MetricsMiddleware
+from app.middleware.QueryProfilerMiddleware import QueryProfilerMiddleware
+
+logging.basicConfig(format="%(message)s")
+logging.getLogger("app.queries").setLevel(settings.QUERY_PROFILING_LOG_LEVEL)
 
 
 app = FastAPI(
@@ -15,7 +25,10 @@ app = FastAPI(
 )
 
 # noinspection PyTypeChecker
-app.add_middleware(CSRFMiddleware)  # ty: ignore[invalid-argument-type]
+app.add_middleware(
+    CSRFMiddleware,  # ty: ignore[invalid-argument-type]
+    tokens=csrf_tokens if settings.CSRF_MODE == "signed" else None,
+)
 
 # noinspection PyTypeChecker
 app.add_middleware(
@@ -25,12 +38,32 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-# noinspection PyTypeChecker
-app.add_middleware(
-    SessionMiddleware,  # ty: ignore[invalid-argument-type]
-    secret_key=settings.SESSION_SECRET,
-    https_only=settings.SESSION_COOKIE_SECURE,
-    same_site=settings.SESSION_SAME_SITE,
-)
+
+# the session only holds the csrf token, signed tokens need no session
+if settings.CSRF_MODE == "session":
+    # noinspection PyTypeChecker
+    app.add_middleware(
+        SessionMiddleware,  # ty: ignore[invalid-argument-type]
+        secret_key=settings.SESSION_SECRET,
+        https_only=settings.SESSION_COOKIE_SECURE,
+        same_site=settings.SESSION_SAME_SITE,
+    )
+
+if settings.QUERY_PROFILING_ENABLED:
+    # noinspection PyTypeChecker
+    app.add_middleware(
+        QueryProfilerMiddleware,  # ty: ignore[invalid-argument-type]
+        max_queries=settings.QUERY_PROFILING_MAX_QUERIES,
+    )
+
+if settings.METRICS_ENABLED:
+    # noinspection PyTypeChecker
+    app.add_middleware(
+        MetricsMiddleware,  # ty: ignore[invalid-argument-type]
+        metrics=request_metrics,
+    )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_routes.router)
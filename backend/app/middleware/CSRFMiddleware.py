@@ -1,29 +1,98 @@
-from typing import Callable
+import hmac
 
-from starlette.requests import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse, Response
 from fastapi import status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.csrf import CSRFTokens
+
+
+class CSRFMiddleware:
+    """check the csrf token header of unsafe requests. With tokens the
+    header must match the signed token cookie, a stateless double submit
+    check, which is issued with responses to safe requests that lack a
+    current one. Without tokens the header must match the token held in
+    the session. Written as plain ASGI so safe requests pass straight
+    through and responses, streamed ones included, are sent without being
+    proxied"""
 
-class CSRFMiddleware(BaseHTTPMiddleware):
     CSRF_ERROR_MESSAGE: str = "CSRF token missing"
+    SAFE_METHODS: frozenset[str] = frozenset(["GET", "HEAD", "OPTIONS"])
+
+    def __init__(self, app: ASGIApp, tokens: CSRFTokens | None = None) -> None:
+        self.app: ASGIApp = app
+        self.tokens: CSRFTokens | None = tokens
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        if request.method in ["GET", "HEAD", "OPTIONS"]:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
 
-        header_token = request.headers.get("x-csrf-token")
-        session_token = request.session.get("X-CSRF-Token")
+        if scope["method"] in self.SAFE_METHODS:
+            if self.tokens is None:
+                return await self.app(scope, receive, send)
 
-        if (
-            not header_token
-            or not session_token
-            or header_token != session_token
-        ):
-            return JSONResponse(
+            return await self._issue_token(self.tokens, scope, receive, send)
+
+        if not self._is_valid(scope):
+            response = JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content=self.CSRF_ERROR_MESSAGE,
             )
 
-        return await call_next(request)
+            return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
+    async def _issue_token(
+        self, tokens: CSRFTokens, scope: Scope, receive: Receive, send: Send
+    ):
+        """set a new token cookie when the request has none or it is close
+        to expiring, so the SPA has one before its first unsafe request.
+        The token is added to the request state for the csrf endpoint"""
+        token: str | None = tokens.get_cookie(scope)
+
+        if not tokens.needs_refresh(token):
+            scope.setdefault("state", {})["csrf_token"] = token
+
+            return await self.app(scope, receive, send)
+
+        token = tokens.issue()
+        scope.setdefault("state", {})["csrf_token"] = token
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    tokens.set_cookie_header(token),
+                ]
+
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+    def _is_valid(self, scope: Scope) -> bool:
+        """compare the tokens in constant time so response timings do not
+        reveal how much of a guessed token matched"""
+        header_token: bytes | None = next(
+            (
+                value
+                for name, value in scope["headers"]
+                if name == b"x-csrf-token"
+            ),
+            None,
+        )
+
+        if self.tokens is None:
+            expected_token: str | None = scope.get("session", {}).get(
+                "X-CSRF-Token"
+            )
+        else:
+            expected_token = self.tokens.get_cookie(scope)
+
+            if self.tokens.expires_in(expected_token) is None:
+                return False
+
+        if not header_token or not expected_token:
+            return False
+
+        return hmac.compare_digest(header_token, expected_token.encode())
@@ -0,0 +1,64 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import RequestMetrics
+
+
+class MetricsMiddleware:
+    """record the latency and status of every request by route, and the
+    number in flight. Runs on the event loop thread only, so the counters
+    are updated without locks"""
+
+    UNMATCHED_ROUTE: str = "unmatched"
+    # any other method is counted as other, so clients cannot add labels
+    METHODS: frozenset[str] = frozenset(
+        {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+    )
+    OTHER_METHOD: str = "other"
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics) -> None:
+        self.app: ASGIApp = app
+        self.metrics: RequestMetrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start: float = time.perf_counter()
+        status_code: int = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+            await send(message)
+
+        self.metrics.in_flight += 1
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.observe(
+                self._get_route(scope),
+                self._get_method(scope),
+                status_code,
+                time.perf_counter() - start,
+            )
+
+    def _get_route(self, scope: Scope) -> str:
+        """label a request by the endpoint that handled it, the router adds
+        it to the scope once a route matches"""
+        if endpoint := scope.get("endpoint"):
+            return getattr(endpoint, "__qualname__", self.UNMATCHED_ROUTE)
+
+        return self.UNMATCHED_ROUTE
+
+    def _get_method(self, scope: Scope) -> str:
+        if scope["method"] in self.METHODS:
+            return scope["method"]
+
+        return self.OTHER_METHOD
@@ -0,0 +1,89 @@
+import json
+import logging
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.query_profiler import QueryStats, logger, query_stats
+
+
+class QueryProfilerMiddleware:
+    """collect the queries sent while handling each request, reporting
+    them in a Server-Timing header and a structured log line. Requests
+    sending more than max_queries are logged as warnings, which is how
+    a query per row or per personal best type loop shows up"""
+
+    def __init__(self, app: ASGIApp, max_queries: int) -> None:
+        self.app: ASGIApp = app
+        self.max_queries: int = max_queries
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats: QueryStats = QueryStats()
+        token = query_stats.set(stats)
+        start: float = time.perf_counter()
+        status_code: int = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", self._server_timing(stats, start)),
+                ]
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            query_stats.reset(token)
+            self._log(scope, status_code, stats, start)
+
+    def _server_timing(self, stats: QueryStats, start: float) -> bytes:
+        """time spent so far, queries sent after the response starts, such
+        as those of a streamed body, are only logged"""
+        return (
+            f'db;dur={stats.duration_ms:.2f};desc="{stats.queries} queries", '
+            f"db-slowest;dur={stats.slowest_ms:.2f}, "
+            f"app;dur={(time.perf_counter() - start) * 1000:.2f}"
+        ).encode()
+
+    def _log(
+        self, scope: Scope, status_code: int, stats: QueryStats, start: float
+    ) -> None:
+        level: int = (
+            logging.WARNING
+            if stats.queries > self.max_queries
+            else logging.INFO
+        )
+
+        if not logger.isEnabledFor(level):
+            return
+
+        logger.log(
+            level,
+            json.dumps(
+                {
+                    "event": "request",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(
+                        (time.perf_counter() - start) * 1000, 2
+                    ),
+                    "queries": stats.queries,
+                    "db_ms": round(stats.duration_ms, 2),
+                    "slowest_ms": round(stats.slowest_ms, 2),
+                    "slowest_statement": " ".join(
+                        stats.slowest_statement.split()
+                    )
+                    if stats.slowest_statement
+                    else None,
+                }
+            ),
+        )
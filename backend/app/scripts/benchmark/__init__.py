@@ -0,0 +1,23 @@
+import typer
+
+from .authentication import app as authentication_app
+from .data_generator import app as data_generator_app
+from .endpoints import app as endpoints_app
+from .load import app as load_app
+from .middleware import app as middleware_app
+from .personal_bests import app as personal_bests_app
+from .query_plans import app as query_plans_app
+from .serialization import app as serialization_app
+from .training_load import app as training_load_app
+
+app = typer.Typer()
+
+app.add_typer(authentication_app)
+app.add_typer(personal_bests_app)
+app.add_typer(query_plans_app)
+app.add_typer(load_app)
+app.add_typer(data_generator_app)
+app.add_typer(endpoints_app)
+app.add_typer(middleware_app)
+app.add_typer(serialization_app)
+app.add_typer(training_load_app)
@@ -0,0 +1,92 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+
+@dataclass
+class AsgiResponse:
+    status_code: int = 0
+    headers: list[tuple[bytes, bytes]] = field(default_factory=list)
+    body: bytes = b""
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise RuntimeError(f"{self.status_code}: {self.body.decode()}")
+
+
+class AsgiClient:
+    """minimal in-process ASGI client so benchmarks can drive the app
+    without a server or an extra http client dependency"""
+
+    def __init__(self, app: Callable, headers: dict[str, str] | None = None):
+        self.app: Callable = app
+        self.headers: dict[str, str] = headers or {}
+
+    async def get(self, url: str, **kwargs: Any) -> AsgiResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes = b"",
+        headers: dict[str, str] | None = None,
+    ) -> AsgiResponse:
+        """send a single request through the app"""
+        response = AsgiResponse()
+        request_sent: bool = False
+        response_complete = asyncio.Event()
+        parsed_url = urlsplit(url)
+
+        async def receive() -> dict:
+            nonlocal request_sent
+
+            if request_sent:
+                # like a server, only report a disconnect once the response
+                # is complete, streaming responses stop when they see one
+                await response_complete.wait()
+
+                return {"type": "http.disconnect"}
+
+            request_sent = True
+
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                response.status_code = message["status"]
+                response.headers = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response.body += message.get("body", b"")
+
+                if not message.get("more_body", False):
+                    response_complete.set()
+
+        await self.app(
+            {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": method,
+                "scheme": "https",
+                "path": parsed_url.path,
+                "raw_path": parsed_url.path.encode(),
+                "query_string": parsed_url.query.encode(),
+                "root_path": "",
+                "headers": [
+                    (name.lower().encode(), value.encode())
+                    for name, value in {
+                        "host": "benchmark",
+                        **self.headers,
+                        **(headers or {}),
+                    }.items()
+                ],
+                "client": ("127.0.0.1", 0),
+                "server": ("benchmark", 443),
+            },
+            receive,
+            send,
+        )
+
+        return response
@@ -0,0 +1,162 @@
+import asyncio
+from typing import Annotated
+
+import typer
+from fastapi import Depends, FastAPI
+from sqlalchemy import event
+from sqlmodel import Session, col, select
+
+from app.api.user.models import User, UserPublic
+from app.core.authentication import AuthTokens, UserAuthentication, UserCache
+from app.core.config import settings
+from app.core.database_manager import database_manager
+from app.scripts.benchmark.asgi_client import AsgiClient
+from app.scripts.benchmark.timing import RequestTimer
+
+
+class AuthenticationBenchmark:
+    """measure the per request overhead of authenticating requests sent
+    concurrently by a number of users. Each stack serves the same trivial
+    endpoint, without authentication, verifying a bearer token and
+    resolving the user from a warm user cache, from a cache emptied before
+    the run so concurrent misses share their lookups, and with a query for
+    every request. The time over the unauthenticated stack is the cost of
+    authentication"""
+
+    STACKS: list[str] = ["none", "cached", "cold", "uncached"]
+
+    def __init__(self, requests: int, concurrency: int, users: int) -> None:
+        self.requests: int = requests
+        self.concurrency: int = concurrency
+        self.users: int = users
+        self.query_count: int = 0
+        self.tokens: AuthTokens = AuthTokens(
+            ["benchmark"],
+            settings.AUTH_TOKEN_TTL_S,
+            settings.AUTH_COOKIE_NAME,
+            settings.SESSION_COOKIE_SECURE,
+            settings.SESSION_SAME_SITE,
+        )
+
+    def run(self) -> list[dict]:
+        return asyncio.run(self._run())
+
+    async def _run(self) -> list[dict]:
+        database_manager.startup()
+        engine = database_manager.get_async_engine().sync_engine
+        event.listen(engine, "before_cursor_execute", self._count_query)
+
+        try:
+            tokens: list[str] = [
+                self.tokens.issue(user_id) for user_id in self._get_user_ids()
+            ]
+            results: list[dict] = []
+
+            for stack in self.STACKS:
+                user_cache = UserCache(
+                    self.users, settings.USER_CACHE_TTL_S, stack != "uncached"
+                )
+                client = AsgiClient(self._app(stack, user_cache))
+
+                if stack == "cached":
+                    for token in tokens:
+                        await self._send(client, token)
+
+                results.append(
+                    {"stack": stack, **(await self._time(client, tokens))}
+                )
+
+            baseline: float = results[0]["mean_us"]
+
+            for result in results:
+                result["overhead_us"] = round(result["mean_us"] - baseline, 1)
+
+            return results
+        finally:
+            event.remove(engine, "before_cursor_execute", self._count_query)
+            await database_manager.async_shutdown()
+
+    def _app(self, stack: str, user_cache: UserCache) -> FastAPI:
+        app = FastAPI()
+
+        if stack == "none":
+
+            @app.get("/runs")
+            async def get_runs() -> dict:
+                return {"data": []}
+
+            return app
+
+        authentication = UserAuthentication(self.tokens, user_cache)
+
+        @app.get("/runs")
+        async def get_user_runs(
+            user: Annotated[UserPublic, Depends(authentication)],
+        ) -> dict:
+            return {"data": []}
+
+        return app
+
+    async def _time(self, client: AsgiClient, tokens: list[str]) -> dict:
+        """send the requests with at most concurrency in flight, cycling
+        through the users"""
+        timer = RequestTimer(self.requests, self.concurrency)
+
+        async def request(index: int) -> None:
+            await self._send(client, tokens[index % len(tokens)])
+
+        self.query_count = 0
+        await timer.run(request)
+
+        return {
+            "requests_per_second": timer.requests_per_second(),
+            "queries": self.query_count,
+            **timer.summary("us", [50, 99], mean=True),
+        }
+
+    async def _send(self, client: AsgiClient, token: str) -> None:
+        response = await client.request(
+            "GET", "/runs", headers={"authorization": f"Bearer {token}"}
+        )
+        response.raise_for_status()
+
+    def _get_user_ids(self) -> list[int]:
+        with Session(database_manager.get_engine()) as session:
+            user_ids: list[int] = list(
+                session.exec(
+                    select(User.id).order_by(col(User.id)).limit(self.users)
+                ).all()
+            )
+
+        if not user_ids:
+            raise typer.BadParameter("No users to authenticate as")
+
+        return user_ids
+
+    def _count_query(self, *args) -> None:
+        self.query_count += 1
+
+
+app = typer.Typer()
+
+
+@app.command()
+def authentication(
+    requests: Annotated[int, typer.Option()] = 10000,
+    concurrency: Annotated[int, typer.Option()] = 100,
+    users: Annotated[int, typer.Option()] = 10,
+):
+    results = AuthenticationBenchmark(requests, concurrency, users).run()
+
+    typer.echo(
+        f"{'stack':>9} {'req/s':>9} {'queries':>8} {'mean us':>9} "
+        f"{'p50 us':>9} {'p99 us':>9} {'overhead us':>12}"
+    )
+
+    for result in results:
+        typer.echo(
+            f"{result['stack']:>9} {result['requests_per_second']:>9} "
+            f"{result['queries']:>8} {result['mean_us']:>9} "
+            f"{result['p50_us']:>9} {result['p99_us']:>9} "
+            f"{result['overhead_us']:>12}"
+        )
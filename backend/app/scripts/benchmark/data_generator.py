@@ -0,0 +1,194 @@
+import random
+from datetime import date, timedelta
+from typing import Annotated
+
+import typer
+from sqlalchemy import delete, insert, text
+from sqlmodel import Session, col, select
+
+from app.api.runs.models import (
+    PersonalBests,
+    PersonalBestType,
+    Run,
+    RunRollup,
+)
+from app.api.runs.repository import RunsRepository
+from app.api.user.models import User
+from app.core.database_manager import database_manager
+
+
+class RunDataGenerator:
+    """generate users with years of plausible treadmill runs and personal
+    best types. Each user gets a base pace, weekly frequency and vo2max
+    that improve slowly over their history, so leaderboards and rollups
+    look like those of real users. The same seed always generates the
+    same data. Generated users are recognised by their email so they can
+    be replaced without touching real users"""
+
+    EMAIL_DOMAIN: str = "benchmark.example.com"
+    PERSONAL_BEST_TYPES: list[
+        tuple[str, PersonalBestType, int | None, int | None]
+    ] = [
+        ("5K", PersonalBestType.SPEED, 4900, 5100),
+        ("10K", PersonalBestType.SPEED, 9900, 10100),
+        ("Half Marathon", PersonalBestType.SPEED, 21000, 21300),
+        ("Distance", PersonalBestType.DISTANCE, None, None),
+        ("Duration", PersonalBestType.DURATION, None, None),
+    ]
+    # typical run distances in metres and how often each is run
+    DISTANCES: list[tuple[int, int]] = [
+        (3000, 2),
+        (5000, 6),
+        (8000, 3),
+        (10000, 3),
+        (15000, 1),
+        (21100, 1),
+    ]
+
+    def __init__(self, users: int, years: int, seed: int) -> None:
+        self.users: int = users
+        self.years: int = years
+        self.random: random.Random = random.Random(seed)
+
+    @classmethod
+    def get_user_ids(cls, session: Session) -> list[int]:
+        """get the ids of the generated users"""
+        return list(
+            session.exec(
+                select(User.id)
+                .where(col(User.email).endswith(f"@{cls.EMAIL_DOMAIN}"))
+                .order_by(col(User.id).asc())
+            ).all()
+        )
+
+    def run(self) -> tuple[int, int]:
+        """replace any generated users with new ones, returning the number
+        of users and runs generated. Tables are analyzed afterwards so
+        plans match those of a database that grew naturally"""
+        database_manager.startup()
+
+        try:
+            with Session(database_manager.get_engine()) as session:
+                self.clear(session)
+                repository = RunsRepository(session)
+                runs: int = 0
+
+                for user in range(1, self.users + 1):
+                    user_id: int = self._add_user(session, user)
+                    runs += self._add_runs(session, user_id)
+                    self._add_personal_bests(session, user_id)
+                    repository.rebuild_run_rollups(user_id, commit=False)
+                    repository.rebuild_personal_bests(user_id)
+
+                session.exec(
+                    text("ANALYZE")
+                )  # ty: ignore[no-matching-overload]
+                session.commit()
+
+                return self.users, runs
+        finally:
+            database_manager.shutdown()
+
+    def clear(self, session: Session) -> None:
+        """delete the generated users and everything derived from them"""
+        user_ids: list[int] = self.get_user_ids(session)
+
+        if not user_ids:
+            return
+
+        for model in [PersonalBests, Run, RunRollup]:
+            session.exec(  # ty: ignore[no-matching-overload]
+                delete(model).where(col(model.user_id).in_(user_ids))
+            )
+
+        session.exec(  # ty: ignore[no-matching-overload]
+            delete(User).where(col(User.id).in_(user_ids))
+        )
+        session.commit()
+
+    def _add_user(self, session: Session, user: int) -> int:
+        generated_user = User(
+            email=f"user-{user}@{self.EMAIL_DOMAIN}",
+            full_name=f"Benchmark User {user}",
+        )
+        session.add(generated_user)
+        session.flush()
+
+        return generated_user.id
+
+    def _add_runs(self, session: Session, user_id: int) -> int:
+        """insert the users run history in one executemany"""
+        pace_s_per_km: float = self.random.uniform(270, 420)
+        runs_per_week: float = self.random.uniform(1.5, 5)
+        vo2max: float = 60 - (pace_s_per_km - 270) / 10
+        distances, weights = zip(*self.DISTANCES)
+        runs: list[dict] = []
+        run_date: date = date.today() - timedelta(days=365 * self.years)
+
+        while run_date <= date.today():
+            distance_m: int = self.random.choices(distances, weights)[0]
+            distance_m += self.random.randint(-150, 150)
+            # longer runs are run slower, and every run varies a little
+            pace: float = pace_s_per_km * (1 + (distance_m - 5000) / 100000)
+            pace *= self.random.uniform(0.95, 1.08)
+
+            runs.append(
+                {
+                    "user_id": user_id,
+                    "run_date": run_date,
+                    "distance_m": distance_m,
+                    "duration_s": int(distance_m / 1000 * pace),
+                    "calories": int(distance_m / 1000 * 65),
+                    "vo2max": round(vo2max + self.random.uniform(-1, 1)),
+                }
+            )
+
+            # fitness improves with training until it plateaus
+            pace_s_per_km = max(pace_s_per_km * 0.999, 230)
+            vo2max = min(vo2max + 0.01, 65)
+            run_date += timedelta(
+                days=max(1, round(self.random.expovariate(runs_per_week / 7)))
+            )
+
+        session.exec(insert(Run), params=runs)  # ty: ignore
+
+        return len(runs)
+
+    def _add_personal_bests(self, session: Session, user_id: int) -> None:
+        """add the personal best types, most users track a subset"""
+        personal_best_types = self.PERSONAL_BEST_TYPES[
+            : self.random.randint(2, len(self.PERSONAL_BEST_TYPES))
+        ]
+
+        for sort_order, (
+            title,
+            personal_best_type,
+            min_distance_m,
+            max_distance_m,
+        ) in enumerate(personal_best_types):
+            session.add(
+                PersonalBests(
+                    title=title,
+                    sort_order=sort_order,
+                    type=personal_best_type,
+                    min_distance_m=min_distance_m,
+                    max_distance_m=max_distance_m,
+                    user_id=user_id,
+                )
+            )
+
+        session.flush()
+
+
+app = typer.Typer()
+
+
+@app.command()
+def generate_data(
+    users: Annotated[int, typer.Option()] = 20,
+    years: Annotated[int, typer.Option()] = 5,
+    seed: Annotated[int, typer.Option()] = 1,
+):
+    users, runs = RunDataGenerator(users, years, seed).run()
+
+    typer.echo(f"generated {users} users with {runs} runs")
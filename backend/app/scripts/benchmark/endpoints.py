@@ -0,0 +1,434 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess  # nosec
+from datetime import date, datetime, timedelta, timezone
+from typing import Annotated, Callable
+
+import typer
+from fastapi import Request
+from sqlalchemy import delete, event
+from sqlmodel import Session, col, func, select
+
+from app.api.runs.models import Run
+from app.api.runs.repository import RunsRepository
+from app.core.authentication import get_current_user
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.database_manager import database_manager
+from app.core.query_profiler import logger as query_logger
+from app.main import app as main_app
+from app.scripts.benchmark.asgi_client import AsgiClient
+from app.scripts.benchmark.data_generator import RunDataGenerator
+from app.scripts.benchmark.timing import RequestTimer
+
+# a scenario builds the method, path, body and headers of its nth request
+RequestFactory = Callable[[int], tuple[str, str, bytes, dict[str, str]]]
+
+
+class EndpointBenchmark:
+    """drive every RunRouter endpoint through the full application, with
+    its middleware and dependencies, against the users created by
+    generate-data. Requests are spread over the generated users and each
+    scenario reports throughput, latency percentiles and the number of
+    queries it sent per request. Scenarios that write run after those that
+    read, and the runs they create are deleted afterwards so the data is
+    left as it was found"""
+
+    USER_HEADER: str = "x-benchmark-user"
+    IMPORT_ROWS: int = 50
+
+    def __init__(
+        self, requests: int, concurrency: int, cache: bool, seed: int
+    ) -> None:
+        self.requests: int = requests
+        self.concurrency: int = concurrency
+        self.cache: bool = cache
+        self.random: random.Random = random.Random(seed)
+        self.user_ids: list[int] = []
+        self.created_runs: list[tuple[int, int]] = []
+        self.query_count: int = 0
+        self.path: str = f"{settings.API_V1_STR}/runs"
+
+    def run(self) -> dict:
+        started_at: datetime = datetime.now(timezone.utc)
+        results: list[dict] = asyncio.run(self._run())
+
+        return {
+            "commit": self._get_commit(),
+            "started_at": started_at.isoformat(),
+            "options": {
+                "requests": self.requests,
+                "concurrency": self.concurrency,
+                "cache": self.cache,
+                "users": len(self.user_ids),
+            },
+            "results": results,
+        }
+
+    async def _run(self) -> list[dict]:
+        database_manager.startup()
+        engines = [
+            database_manager.get_engine(),
+            database_manager.get_async_engine().sync_engine,
+        ]
+        cache_enabled: bool = response_cache.enabled
+
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._count_query)
+
+        main_app.dependency_overrides[get_current_user] = self._get_user_id
+        response_cache.enabled = self.cache
+        # request and slow query log lines would drown the results
+        log_level: int = query_logger.level
+        query_logger.setLevel(logging.ERROR)
+
+        try:
+            self.user_ids = self._get_user_ids()
+            client = AsgiClient(main_app)
+            client.headers.update(await self._get_csrf_headers(client))
+            results: list[dict] = []
+
+            for name, request_factory in self._get_read_scenarios():
+                results.append(
+                    await self._benchmark(client, name, request_factory)
+                )
+
+            max_run_id: int = self._get_max_run_id()
+
+            for name, request_factory in [
+                ("create", self._create_request),
+                ("import", self._import_request),
+            ]:
+                results.append(
+                    await self._benchmark(client, name, request_factory)
+                )
+
+            self.created_runs = self._get_created_runs(max_run_id)
+
+            for name, request_factory in [
+                ("update", self._update_request),
+                ("delete", self._delete_request),
+            ]:
+                results.append(
+                    await self._benchmark(
+                        client,
+                        name,
+                        request_factory,
+                        min(self.requests, len(self.created_runs)),
+                    )
+                )
+
+            self._remove_created_runs(max_run_id)
+
+            return results
+        finally:
+            main_app.dependency_overrides.pop(get_current_user, None)
+            response_cache.enabled = cache_enabled
+            query_logger.setLevel(log_level)
+
+            for engine in engines:
+                event.remove(engine, "before_cursor_execute", self._count_query)
+
+            await database_manager.async_shutdown()
+
+    def _get_read_scenarios(self) -> list[tuple[str, RequestFactory]]:
+        """the read scenarios, each a GET of a fixed url"""
+        last_year: int = date.today().year - 1
+
+        return [
+            (name, self._get_request(url))
+            for name, url in [
+                ("runs-daily", f"{self.path}/"),
+                ("runs-weekly", f"{self.path}/?group_by=weekly"),
+                ("runs-monthly", f"{self.path}/?group_by=monthly"),
+                ("runs-yearly", f"{self.path}/?group_by=yearly"),
+                (
+                    "runs-date-range",
+                    f"{self.path}/?start_date={last_year}-03-01"
+                    f"&end_date={last_year}-08-31",
+                ),
+                ("runs-page", f"{self.path}/?limit=50"),
+                ("export", f"{self.path}/export"),
+                ("personal-bests", f"{self.path}/personal_bests"),
+                ("heatmap", f"{self.path}/heatmap"),
+                (
+                    "heatmap-years",
+                    f"{self.path}/heatmap?start_date={last_year - 2}-01-01"
+                    f"&end_date={date.today().isoformat()}",
+                ),
+                (
+                    "series",
+                    f"{self.path}/series?metric=distance"
+                    f"&start_date={last_year - 2}-01-01"
+                    f"&end_date={date.today().isoformat()}",
+                ),
+                ("training-load", f"{self.path}/training_load"),
+            ]
+        ]
+
+    async def _benchmark(
+        self,
+        client: AsgiClient,
+        name: str,
+        request_factory: RequestFactory,
+        requests: int | None = None,
+    ) -> dict:
+        """send a scenarios requests with at most concurrency in flight"""
+        requests = self.requests if requests is None else requests
+        timer = RequestTimer(requests, self.concurrency)
+        errors: int = 0
+
+        async def request(index: int) -> None:
+            nonlocal errors
+            response = await client.request(*request_factory(index))
+
+            if response.status_code >= 400:
+                errors += 1
+
+        self.query_count = 0
+        await timer.run(request)
+
+        return {
+            "scenario": name,
+            "requests": requests,
+            "errors": errors,
+            "requests_per_second": timer.requests_per_second(),
+            "queries_per_request": round(self.query_count / requests, 2)
+            if requests
+            else 0,
+            **timer.summary("ms", [50, 95, 99]),
+        }
+
+    def _get_request(self, url: str) -> RequestFactory:
+        return lambda index: ("GET", url, b"", self._user_header(index))
+
+    def _create_request(
+        self, index: int
+    ) -> tuple[str, str, bytes, dict[str, str]]:
+        return (
+            "POST",
+            f"{self.path}/",
+            json.dumps(self._generate_run()).encode(),
+            {**self._user_header(index), "content-type": "application/json"},
+        )
+
+    def _import_request(
+        self, index: int
+    ) -> tuple[str, str, bytes, dict[str, str]]:
+        return (
+            "POST",
+            f"{self.path}/import",
+            "".join(
+                json.dumps(self._generate_run()) + "\n"
+                for _ in range(self.IMPORT_ROWS)
+            ).encode(),
+            {
+                **self._user_header(index),
+                "content-type": "application/x-ndjson",
+            },
+        )
+
+    def _update_request(
+        self, index: int
+    ) -> tuple[str, str, bytes, dict[str, str]]:
+        run_id, user_id = self.created_runs[index]
+
+        return (
+            "PATCH",
+            f"{self.path}/",
+            json.dumps({"id": run_id, **self._generate_run()}).encode(),
+            {
+                self.USER_HEADER: str(user_id),
+                "content-type": "application/json",
+            },
+        )
+
+    def _delete_request(
+        self, index: int
+    ) -> tuple[str, str, bytes, dict[str, str]]:
+        run_id, user_id = self.created_runs[index]
+
+        return (
+            "DELETE",
+            f"{self.path}/{run_id}",
+            b"",
+            {self.USER_HEADER: str(user_id)},
+        )
+
+    def _generate_run(self) -> dict:
+        distance_m: int = self.random.randint(3000, 12000)
+        run_date: date = date.today() - timedelta(
+            days=self.random.randint(0, 365)
+        )
+
+        return {
+            "distance_m": distance_m,
+            "duration_s": int(
+                distance_m / 1000 * self.random.randint(240, 420)
+            ),
+            "calories": int(distance_m / 1000 * 65),
+            "vo2max": self.random.randint(35, 60),
+            "run_date": run_date.isoformat(),
+        }
+
+    def _user_header(self, index: int) -> dict[str, str]:
+        return {
+            self.USER_HEADER: str(self.user_ids[index % len(self.user_ids)])
+        }
+
+    def _get_user_id(self, request: Request) -> int:
+        """stands in for the authenticated user, taken from a header so
+        requests can be spread over the generated users"""
+        return int(request.headers[self.USER_HEADER])
+
+    async def _get_csrf_headers(self, client: AsgiClient) -> dict[str, str]:
+        """get a csrf token and the session cookie holding it"""
+        response = await client.get(f"{settings.API_V1_STR}/auth/csrf")
+        response.raise_for_status()
+        cookie: str = next(
+            value.decode().split(";")[0]
+            for name, value in response.headers
+            if name == b"set-cookie"
+        )
+
+        return {"cookie": cookie, "x-csrf-token": json.loads(response.body)}
+
+    def _get_user_ids(self) -> list[int]:
+        with Session(database_manager.get_engine()) as session:
+            user_ids: list[int] = RunDataGenerator.get_user_ids(session)
+
+        if not user_ids:
+            raise RuntimeError(
+                "No generated users, run benchmark generate-data first"
+            )
+
+        return user_ids
+
+    def _get_max_run_id(self) -> int:
+        with Session(database_manager.get_engine()) as session:
+            return session.exec(select(func.max(Run.id))).one() or 0
+
+    def _get_created_runs(self, max_run_id: int) -> list[tuple[int, int]]:
+        """get the ids and users of the runs created by the benchmark"""
+        with Session(database_manager.get_engine()) as session:
+            return [
+                (run_id, user_id)
+                for run_id, user_id in session.exec(
+                    select(Run.id, Run.user_id)
+                    .where(col(Run.id) > max_run_id)
+                    .where(col(Run.user_id).in_(self.user_ids))
+                    .order_by(col(Run.id).asc())
+                ).all()
+            ]
+
+    def _remove_created_runs(self, max_run_id: int) -> None:
+        """remove the imported runs the delete scenario left behind and
+        rebuild the derived data of their users"""
+        with Session(database_manager.get_engine()) as session:
+            repository = RunsRepository(session)
+            user_ids: set[int] = {
+                user_id for _, user_id in self._get_created_runs(max_run_id)
+            }
+            session.exec(  # ty: ignore[no-matching-overload]
+                delete(Run)
+                .where(col(Run.id) > max_run_id)
+                .where(col(Run.user_id).in_(user_ids))
+            )
+
+            for user_id in user_ids:
+                repository.rebuild_run_rollups(user_id, commit=False)
+                repository.rebuild_personal_bests(user_id)
+
+    def _get_commit(self) -> str | None:
+        """get the commit being benchmarked so results can be compared"""
+        try:
+            return (
+                subprocess.run(  # nosec
+                    ["git", "rev-parse", "--short", "HEAD"],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    cwd=os.path.dirname(__file__),
+                ).stdout.strip()
+                or None
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _count_query(self, *args) -> None:
+        self.query_count += 1
+
+
+app = typer.Typer()
+
+
+@app.command()
+def endpoints(
+    requests: Annotated[int, typer.Option()] = 200,
+    concurrency: Annotated[int, typer.Option()] = 10,
+    cache: Annotated[bool, typer.Option()] = False,
+    seed: Annotated[int, typer.Option()] = 1,
+    output: Annotated[str | None, typer.Option()] = None,
+):
+    benchmark: dict = EndpointBenchmark(
+        requests, concurrency, cache, seed
+    ).run()
+
+    typer.echo(
+        f"{'scenario':>16} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'p99 ms':>9} {'queries':>8} {'errors':>7}"
+    )
+
+    for result in benchmark["results"]:
+        typer.echo(
+            f"{result['scenario']:>16} {result['requests_per_second']:>9} "
+            f"{result['p50_ms']:>9} {result['p95_ms']:>9} "
+            f"{result['p99_ms']:>9} {result['queries_per_request']:>8} "
+            f"{result['errors']:>7}"
+        )
+
+    output = output or (
+        f"benchmark-{benchmark['started_at'][:19].replace(':', '')}-"
+        f"{benchmark['commit'] or 'unknown'}.json"
+    )
+
+    with open(output, "w") as output_file:
+        json.dump(benchmark, output_file, indent=2)
+
+    typer.echo(f"results written to {output}")
+
+
+@app.command()
+def compare(baseline: str, current: str):
+    """compare the results of two endpoint benchmarks scenario by scenario"""
+    with open(baseline) as baseline_file, open(current) as current_file:
+        baseline_results: dict[str, dict] = {
+            result["scenario"]: result
+            for result in json.load(baseline_file)["results"]
+        }
+        current_results: list[dict] = json.load(current_file)["results"]
+
+    typer.echo(
+        f"{'scenario':>16} {'req/s':>9} {'change':>8} {'p95 ms':>9} "
+        f"{'change':>8} {'queries':>8}"
+    )
+
+    for result in current_results:
+        previous: dict | None = baseline_results.get(result["scenario"])
+
+        typer.echo(
+            f"{result['scenario']:>16} {result['requests_per_second']:>9} "
+            f"{_change(previous, result, 'requests_per_second'):>8} "
+            f"{result['p95_ms']:>9} {_change(previous, result, 'p95_ms'):>8} "
+            f"{result['queries_per_request']:>8}"
+        )
+
+
+def _change(previous: dict | None, result: dict, metric: str) -> str:
+    if not previous or not previous[metric]:
+        return "-"
+
+    return f"{(result[metric] / previous[metric] - 1) * 100:+.1f}%"
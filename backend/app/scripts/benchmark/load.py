@@ -0,0 +1,144 @@
+import asyncio
+from typing import Annotated
+
+import typer
+from fastapi import Depends, FastAPI
+
+from app.api.runs.models import PersonalBestsPublic, RunsPublic
+from app.api.runs.repository import AsyncRunsRepository, RunsRepository
+from app.core.database_manager import database_manager
+from app.scripts.benchmark.asgi_client import AsgiClient
+from app.scripts.benchmark.timing import RequestTimer
+
+
+class LoadBenchmark:
+    """compare requests/sec and latency of the sync database stack, run
+    in the starlette threadpool, with the async stack. Both modes serve
+    the same repository calls from minimal apps so only the database
+    stack differs"""
+
+    ENDPOINTS: dict[str, str] = {
+        "runs": "/runs/",
+        "personal-bests": "/runs/personal_bests",
+    }
+
+    def __init__(self, user_id: int, requests: int, endpoint: str) -> None:
+        self.user_id: int = user_id
+        self.requests: int = requests
+        self.path: str = self.ENDPOINTS[endpoint]
+
+    def run(self, concurrency_levels: list[int]) -> list[dict]:
+        return asyncio.run(self._run(concurrency_levels))
+
+    async def _run(self, concurrency_levels: list[int]) -> list[dict]:
+        """load each mode at each concurrency level"""
+        database_manager.startup()
+
+        try:
+            results: list[dict] = []
+
+            for concurrency in concurrency_levels:
+                for mode, app in [
+                    ("sync", self._sync_app()),
+                    ("async", self._async_app()),
+                ]:
+                    results.append(
+                        {
+                            "mode": mode,
+                            "concurrency": concurrency,
+                            **(await self._load(app, concurrency)),
+                        }
+                    )
+
+            return results
+        finally:
+            await database_manager.async_shutdown()
+
+    def _sync_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.get(self.ENDPOINTS["runs"])
+        def get_runs(
+            runs_repository: Annotated[RunsRepository, Depends(RunsRepository)],
+        ) -> RunsPublic:
+            return RunsPublic(
+                data=runs_repository.get_runs(self.user_id, None, None)
+            )
+
+        @app.get(self.ENDPOINTS["personal-bests"])
+        def get_personal_bests(
+            runs_repository: Annotated[RunsRepository, Depends(RunsRepository)],
+        ) -> PersonalBestsPublic:
+            return PersonalBestsPublic(
+                data=runs_repository.personal_bests(self.user_id)
+            )
+
+        return app
+
+    def _async_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.get(self.ENDPOINTS["runs"])
+        async def get_runs(
+            runs_repository: Annotated[
+                AsyncRunsRepository, Depends(AsyncRunsRepository)
+            ],
+        ) -> RunsPublic:
+            return RunsPublic(
+                data=await runs_repository.get_runs(self.user_id, None, None)
+            )
+
+        @app.get(self.ENDPOINTS["personal-bests"])
+        async def get_personal_bests(
+            runs_repository: Annotated[
+                AsyncRunsRepository, Depends(AsyncRunsRepository)
+            ],
+        ) -> PersonalBestsPublic:
+            return PersonalBestsPublic(
+                data=await runs_repository.personal_bests(self.user_id)
+            )
+
+        return app
+
+    async def _load(self, app: FastAPI, concurrency: int) -> dict:
+        """send the requests with at most concurrency in flight"""
+        client = AsgiClient(app)
+        timer = RequestTimer(self.requests, concurrency)
+
+        async def request(index: int) -> None:
+            response = await client.get(self.path)
+            response.raise_for_status()
+
+        await timer.run(request)
+
+        return {
+            "requests_per_second": timer.requests_per_second(),
+            **timer.summary("ms", [50, 99]),
+        }
+
+
+app = typer.Typer()
+
+
+@app.command()
+def load(
+    user_id: Annotated[int, typer.Option()] = 4,
+    requests: Annotated[int, typer.Option()] = 1000,
+    endpoint: Annotated[str, typer.Option()] = "runs",
+    concurrency: Annotated[list[int] | None, typer.Option()] = None,
+):
+    results = LoadBenchmark(user_id, requests, endpoint).run(
+        concurrency or [1, 10, 50]
+    )
+
+    typer.echo(
+        f"{'mode':>6} {'concurrency':>12} {'req/s':>9} "
+        f"{'p50 ms':>9} {'p99 ms':>9}"
+    )
+
+    for result in results:
+        typer.echo(
+            f"{result['mode']:>6} {result['concurrency']:>12} "
+            f"{result['requests_per_second']:>9} {result['p50_ms']:>9} "
+            f"{result['p99_ms']:>9}"
+        )
@@ -0,0 +1,195 @@
+import asyncio
+import json
+from typing import Annotated, Callable
+
+import typer
+from fastapi import FastAPI, Request, status
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.responses import JSONResponse, Response
+
+from app.core.config import settings
+from app.core.csrf import CSRFTokens
+from app.middleware.CSRFMiddleware import CSRFMiddleware
+from app.scripts.benchmark.asgi_client import AsgiClient
+from app.scripts.benchmark.timing import RequestTimer
+
+
+class LegacyCSRFMiddleware(BaseHTTPMiddleware):
+    """the previous BaseHTTPMiddleware implementation"""
+
+    CSRF_ERROR_MESSAGE: str = "CSRF token missing"
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        if request.method in ["GET", "HEAD", "OPTIONS"]:
+            return await call_next(request)
+
+        header_token = request.headers.get("x-csrf-token")
+        session_token = request.session.get("X-CSRF-Token")
+
+        if (
+            not header_token
+            or not session_token
+            or header_token != session_token
+        ):
+            return JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content=self.CSRF_ERROR_MESSAGE,
+            )
+
+        return await call_next(request)
+
+
+class MiddlewareBenchmark:
+    """measure the per request overhead of the middleware stack in front
+    of the api, the csrf, cors and session middleware configured as in
+    app.main, with the legacy and the ASGI csrf middleware checking the
+    session token and the ASGI csrf middleware checking signed tokens
+    without a session. Each stack serves the same trivial endpoints so the
+    time over the bare app is the cost of its middleware"""
+
+    STACKS: list[str] = ["bare", "legacy", "asgi", "signed"]
+    CSRF_MIDDLEWARE: dict[str, type] = {
+        "legacy": LegacyCSRFMiddleware,
+        "asgi": CSRFMiddleware,
+        "signed": CSRFMiddleware,
+    }
+
+    def __init__(self, requests: int) -> None:
+        self.requests: int = requests
+        self.tokens: CSRFTokens = CSRFTokens(
+            ["benchmark"],
+            settings.CSRF_TOKEN_TTL_S,
+            settings.CSRF_COOKIE_NAME,
+            settings.SESSION_COOKIE_SECURE,
+            settings.SESSION_SAME_SITE,
+        )
+
+    def run(self) -> list[dict]:
+        return asyncio.run(self._run())
+
+    async def _run(self) -> list[dict]:
+        results: list[dict] = []
+
+        for stack in self.STACKS:
+            client = AsgiClient(self._app(stack))
+
+            if stack != "bare":
+                client.headers.update(await self._get_csrf_headers(client))
+
+            for method in ["GET", "POST"]:
+                results.append(
+                    {
+                        "stack": stack,
+                        "method": method,
+                        **(await self._time(client, method)),
+                    }
+                )
+
+        baselines: dict[str, float] = {
+            result["method"]: result["mean_us"]
+            for result in results
+            if result["stack"] == "bare"
+        }
+
+        for result in results:
+            result["overhead_us"] = round(
+                result["mean_us"] - baselines[result["method"]], 1
+            )
+
+        return results
+
+    def _app(self, stack: str) -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/csrf")
+        def get_csrf_token(request: Request) -> str:
+            if stack == "signed":
+                return request.state.csrf_token
+
+            request.session["X-CSRF-Token"] = "benchmark-token"
+
+            return request.session["X-CSRF-Token"]
+
+        @app.get("/runs")
+        async def get_runs() -> dict:
+            return {"data": []}
+
+        @app.post("/runs")
+        async def post_runs() -> dict:
+            return {"data": []}
+
+        if stack == "bare":
+            return app
+
+        # noinspection PyTypeChecker
+        app.add_middleware(
+            self.CSRF_MIDDLEWARE[stack],  # ty: ignore[invalid-argument-type]
+            **({"tokens": self.tokens} if stack == "signed" else {}),
+        )
+        # noinspection PyTypeChecker
+        app.add_middleware(
+            CORSMiddleware,  # ty: ignore[invalid-argument-type]
+            allow_origins=settings.CORS_ORIGINS,
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+
+        if stack != "signed":
+            # noinspection PyTypeChecker
+            app.add_middleware(
+                SessionMiddleware,  # ty: ignore[invalid-argument-type]
+                secret_key="benchmark",
+                https_only=settings.SESSION_COOKIE_SECURE,
+                same_site=settings.SESSION_SAME_SITE,
+            )
+
+        return app
+
+    async def _get_csrf_headers(self, client: AsgiClient) -> dict[str, str]:
+        response = await client.get("/csrf")
+        cookies: list[str] = [
+            value.decode().split(";")[0]
+            for name, value in response.headers
+            if name == b"set-cookie"
+        ]
+
+        return {
+            "x-csrf-token": json.loads(response.body),
+            **({"cookie": cookies[0]} if cookies else {}),
+            "origin": settings.CORS_ORIGINS[0],
+        }
+
+    async def _time(self, client: AsgiClient, method: str) -> dict:
+        """send the requests one at a time so only the stack is measured"""
+        timer = RequestTimer(self.requests)
+
+        async def request(index: int) -> None:
+            response = await client.request(method, "/runs")
+            response.raise_for_status()
+
+        await timer.run(request)
+
+        return timer.summary("us", [50, 99], mean=True)
+
+
+app = typer.Typer()
+
+
+@app.command()
+def middleware(requests: Annotated[int, typer.Option()] = 10000):
+    results = MiddlewareBenchmark(requests).run()
+
+    typer.echo(
+        f"{'stack':>7} {'method':>7} {'mean us':>9} {'p50 us':>9} "
+        f"{'p99 us':>9} {'overhead us':>12}"
+    )
+
+    for result in results:
+        typer.echo(
+            f"{result['stack']:>7} {result['method']:>7} "
+            f"{result['mean_us']:>9} {result['p50_us']:>9} "
+            f"{result['p99_us']:>9} {result['overhead_us']:>12}"
+        )
@@ -0,0 +1,224 @@
+import statistics
+import time
+from typing import Annotated, Callable
+
+import typer
+from sqlalchemy import delete, event
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select, col
+
+from app.api.runs.models import (
+    PersonalBests,
+    PersonalBestType,
+    PersonalBestPublic,
+    Run,
+    RunPublic,
+)
+from app.api.runs.repository import RunsRepository
+from app.core.database_manager import database_manager
+
+
+class PersonalBestsBenchmark:
+    """compare the legacy per-type personal bests loop, the single
+    windowed query and the leaderboard lookup as the number of personal
+    best types grows. Synthetic personal best types are created inside a
+    transaction that is always rolled back"""
+
+    PERSONAL_BEST_TYPES: list[
+        tuple[PersonalBestType, int | None, int | None]
+    ] = [
+        (PersonalBestType.SPEED, 4900, 5100),
+        (PersonalBestType.SPEED, 9900, 10100),
+        (PersonalBestType.DISTANCE, None, None),
+        (PersonalBestType.DURATION, None, None),
+    ]
+
+    def __init__(self, user_id: int, iterations: int) -> None:
+        self.user_id: int = user_id
+        self.iterations: int = iterations
+        self.query_count: int = 0
+
+    IMPLEMENTATIONS: list[str] = ["legacy", "windowed", "leaderboard"]
+
+    def run(self, personal_best_type_counts: list[int]) -> list[dict]:
+        """run the benchmark for each personal best type count"""
+        database_manager.startup()
+        engine = database_manager.get_engine()
+        event.listen(engine, "before_cursor_execute", self._count_query)
+
+        try:
+            with engine.connect() as connection:
+                return [
+                    self._benchmark(connection, count)
+                    for count in personal_best_type_counts
+                ]
+        finally:
+            event.remove(engine, "before_cursor_execute", self._count_query)
+            database_manager.shutdown()
+
+    def _benchmark(self, connection: Connection, count: int) -> dict:
+        """benchmark both implementations against count personal best
+        types"""
+        transaction = connection.begin()
+
+        try:
+            session = Session(bind=connection)
+            repository = RunsRepository(session)
+            self._seed_personal_best_types(session, count)
+            repository.rebuild_personal_bests(self.user_id, commit=False)
+
+            return {
+                "personal_best_types": count,
+                "legacy": self._time(
+                    lambda: self._legacy_personal_bests(repository)
+                ),
+                "windowed": self._time(
+                    lambda: self._windowed_personal_bests(repository)
+                ),
+                "leaderboard": self._time(
+                    lambda: repository.personal_bests(self.user_id)
+                ),
+            }
+        finally:
+            transaction.rollback()
+
+    def _time(self, callback: Callable) -> dict:
+        """time callback, returning round trips per call and latency"""
+        timings: list[float] = []
+        self.query_count = 0
+
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            callback()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return {
+            "round_trips": self.query_count // self.iterations,
+            "mean_ms": round(statistics.mean(timings), 3),
+            "p95_ms": round(
+                statistics.quantiles(timings, n=20)[-1]
+                if len(timings) > 1
+                else timings[0],
+                3,
+            ),
+        }
+
+    def _seed_personal_best_types(self, session: Session, count: int) -> None:
+        """replace the users personal best types with count synthetic ones"""
+        session.exec(  # ty: ignore[no-matching-overload]
+            delete(PersonalBests).where(
+                col(PersonalBests.user_id) == self.user_id
+            )
+        )
+
+        for i in range(count):
+            (
+                personal_best_type,
+                min_distance_m,
+                max_distance_m,
+            ) = self.PERSONAL_BEST_TYPES[i % len(self.PERSONAL_BEST_TYPES)]
+            session.add(
+                PersonalBests(
+                    title=f"benchmark {i}",
+                    sort_order=i,
+                    type=personal_best_type,
+                    min_distance_m=min_distance_m,
+                    max_distance_m=max_distance_m,
+                    user_id=self.user_id,
+                )
+            )
+
+        session.flush()
+
+    def _legacy_personal_bests(
+        self, repository: RunsRepository
+    ) -> list[PersonalBestPublic]:
+        """the previous implementation, one query per personal best type"""
+        personal_bests = []
+
+        for personal_best_type in repository.execute_query(
+            select(PersonalBests)
+            .where(PersonalBests.user_id == self.user_id)
+            .order_by(col(PersonalBests.sort_order).asc())
+        ).all():
+            query = select(Run).where(Run.user_id == self.user_id).limit(10)
+
+            if personal_best_type.max_distance_m:
+                query = query.where(
+                    col(Run.distance_m) <= personal_best_type.max_distance_m
+                )
+
+            if personal_best_type.min_distance_m:
+                query = query.where(
+                    col(Run.distance_m) >= personal_best_type.min_distance_m
+                )
+
+            if personal_best_type.type == PersonalBestType.SPEED:
+                query = query.order_by(col(Run.speed_kmh).desc())
+            elif personal_best_type.type == PersonalBestType.DURATION:
+                query = query.order_by(col(Run.duration_s).desc())
+            else:
+                query = query.order_by(col(Run.distance_m).desc())
+
+            personal_bests.append(
+                PersonalBestPublic(
+                    **personal_best_type.model_dump(),
+                    runs=[
+                        RunPublic(**run.model_dump())
+                        for run in repository.execute_query(query).all()
+                    ],
+                )
+            )
+
+        return personal_bests
+
+    def _windowed_personal_bests(self, repository: RunsRepository) -> list:
+        """rank the full run history of every personal best type in one
+        query, as used to rebuild the leaderboard"""
+        ranking = repository._get_personal_best_ranking(self.user_id)
+
+        return list(
+            repository.execute_query(
+                select(PersonalBests, aliased(Run, ranking))
+                .join(ranking, ranking.c.personal_best_id == PersonalBests.id)
+                .where(
+                    ranking.c.position <= repository.PERSONAL_BEST_RUNS_LIMIT
+                )
+                .order_by(
+                    col(PersonalBests.sort_order).asc(),
+                    ranking.c.position.asc(),
+                )
+            ).all()
+        )
+
+    def _count_query(self, *args) -> None:
+        self.query_count += 1
+
+
+app = typer.Typer()
+
+
+@app.command()
+def personal_bests(
+    user_id: Annotated[int, typer.Option()] = 4,
+    personal_best_types: Annotated[list[int] | None, typer.Option()] = None,
+    iterations: Annotated[int, typer.Option()] = 50,
+):
+    results = PersonalBestsBenchmark(user_id, iterations).run(
+        personal_best_types or [1, 4, 8, 12]
+    )
+
+    typer.echo(
+        f"{'types':>6} {'impl':>13} {'round trips':>12} "
+        f"{'mean ms':>9} {'p95 ms':>9}"
+    )
+
+    for result in results:
+        for implementation in PersonalBestsBenchmark.IMPLEMENTATIONS:
+            timing = result[implementation]
+            typer.echo(
+                f"{result['personal_best_types']:>6} {implementation:>13} "
+                f"{timing['round_trips']:>12} {timing['mean_ms']:>9} "
+                f"{timing['p95_ms']:>9}"
+            )
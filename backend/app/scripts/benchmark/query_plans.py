@@ -0,0 +1,212 @@
+import json
+from datetime import date
+from typing import Annotated, Any
+
+import typer
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
+
+from app.api.runs.models import RunPublic, RunSort
+from app.api.runs.repository import RunsRepository
+from app.core.database_manager import database_manager
+
+
+class QueryPlans:
+    """run every RunsRepository query against a seeded database and
+    EXPLAIN it, failing if a table that grows with run history is read
+    with a sequential scan. Leaderboard and personal best tables hold a
+    handful of rows per user so scanning them is left to the planner.
+    The seed data is created inside a transaction that is always rolled
+    back"""
+
+    USER_ID_OFFSET: int = 1000000
+    CHECKED_TABLES: list[str] = ["run", "runrollup"]
+
+    SEED_USERS = text(
+        'INSERT INTO "user" (id, email) '
+        "SELECT :offset + g, 'query-plans-' || g || '@example.com' "
+        "FROM generate_series(1, :users) AS g"
+    )
+    SEED_RUNS = text(
+        "INSERT INTO run "
+        "(user_id, distance_m, duration_s, calories, vo2max, run_date) "
+        "SELECT :offset + u, 3000 + (random() * 12000)::int, "
+        "900 + (random() * 4500)::int, (random() * 900)::int, "
+        "35 + (random() * 20)::int, :start_date + d "
+        "FROM generate_series(1, :users) AS u, "
+        "generate_series(0, :days - 1) AS d"
+    )
+    SEED_PERSONAL_BESTS = text(
+        "INSERT INTO personalbests (user_id, title, sort_order, type, "
+        "min_distance_m, max_distance_m) "
+        "SELECT :offset + u, t.title, t.sort_order, "
+        "t.type::personalbesttype, t.min_distance_m, t.max_distance_m "
+        "FROM generate_series(1, :users) AS u, (VALUES "
+        "('5K', 0, 'SPEED', 4900, 5100), "
+        "('10K', 1, 'SPEED', 9900, 10100), "
+        "('Distance', 2, 'DISTANCE', NULL, NULL), "
+        "('Duration', 3, 'DURATION', NULL, NULL)"
+        ") AS t(title, sort_order, type, min_distance_m, max_distance_m)"
+    )
+
+    def __init__(self, users: int, years: int) -> None:
+        self.users: int = users
+        self.years: int = years
+        self.statements: list[tuple[str, Any]] = []
+
+    def run(self) -> list[dict]:
+        """seed, capture every repository statement and explain it"""
+        database_manager.startup()
+
+        try:
+            with database_manager.get_engine().connect() as connection:
+                transaction = connection.begin()
+
+                try:
+                    session = Session(bind=connection)
+                    repository = RunsRepository(session)
+
+                    self._seed(session, repository)
+                    self._capture(connection, repository)
+
+                    return [
+                        self._explain(connection, statement, parameters)
+                        for statement, parameters in self.statements
+                    ]
+                finally:
+                    transaction.rollback()
+        finally:
+            database_manager.shutdown()
+
+    def _seed(self, session: Session, repository: RunsRepository) -> None:
+        """seed users with years of daily runs and personal best types"""
+        parameters: dict = {
+            "offset": self.USER_ID_OFFSET,
+            "users": self.users,
+            "days": self.years * 365,
+            "start_date": date(date.today().year - self.years, 1, 1),
+        }
+
+        for statement in [
+            self.SEED_USERS,
+            self.SEED_RUNS,
+            self.SEED_PERSONAL_BESTS,
+        ]:
+            session.exec(statement, params=parameters)  # ty: ignore
+
+        for user in range(1, self.users + 1):
+            repository.rebuild_personal_bests(
+                self.USER_ID_OFFSET + user, commit=False
+            )
+            repository.rebuild_run_rollups(
+                self.USER_ID_OFFSET + user, commit=False
+            )
+
+        session.flush()
+        session.exec(text("ANALYZE"))  # ty: ignore[no-matching-overload]
+
+    def _capture(
+        self, connection: Connection, repository: RunsRepository
+    ) -> None:
+        """exercise every read and write path, recording the statements"""
+        user_id: int = self.USER_ID_OFFSET + 1
+        start_date: str = f"{date.today().year - 1}-03-15"
+        end_date: str = f"{date.today().year - 1}-09-20"
+
+        event.listen(connection, "before_cursor_execute", self._record)
+
+        try:
+            for group_by in ["daily", "weekly", "monthly", "yearly"]:
+                repository.get_runs(user_id, None, None, group_by)
+                repository.get_runs(user_id, start_date, end_date, group_by)
+
+            _, cursor = repository.get_runs_page(user_id, None, None, 50)
+            repository.get_runs_page(user_id, None, None, 50, cursor)
+            _, cursor = repository.get_runs_page(
+                user_id, None, None, 50, None, False, RunSort.PACE
+            )
+            repository.get_runs_page(
+                user_id, None, None, 50, cursor, False, RunSort.PACE
+            )
+            repository.get_runs(
+                user_id, None, None, "daily", False, RunSort.DATE, 14.0, 16.0
+            )
+            repository.personal_bests(user_id)
+
+            run = RunPublic(
+                distance_m=5000,
+                duration_s=1500,
+                calories=400,
+                vo2max=50,
+                run_date=start_date,
+            )
+            repository.add_run(user_id, run)
+            run.id = repository.get_runs(user_id, start_date, start_date)[0].id
+            repository.update_run(user_id, run)
+            repository.delete_run(user_id, run.id)
+        finally:
+            event.remove(connection, "before_cursor_execute", self._record)
+
+    def _record(
+        self, conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        if not executemany:
+            self.statements.append((statement, parameters))
+
+    def _explain(
+        self, connection: Connection, statement: str, parameters: Any
+    ) -> dict:
+        """explain a statement, listing sequential scans of checked tables"""
+        plan: dict = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        ).scalar()[0]["Plan"]
+
+        return {
+            "statement": " ".join(statement.split()),
+            "sequential_scans": sorted(set(self._sequential_scans(plan))),
+        }
+
+    def _sequential_scans(self, plan: dict) -> list[str]:
+        """walk a plan tree collecting sequential scans of checked tables"""
+        scans: list[str] = []
+
+        if (
+            plan["Node Type"] == "Seq Scan"
+            and plan["Relation Name"] in self.CHECKED_TABLES
+        ):
+            scans.append(plan["Relation Name"])
+
+        for child in plan.get("Plans", []):
+            scans.extend(self._sequential_scans(child))
+
+        return scans
+
+
+app = typer.Typer()
+
+
+@app.command()
+def query_plans(
+    users: Annotated[int, typer.Option()] = 20,
+    years: Annotated[int, typer.Option()] = 10,
+    output: Annotated[str | None, typer.Option()] = None,
+):
+    plans = QueryPlans(users, years).run()
+    failures = [plan for plan in plans if plan["sequential_scans"]]
+
+    for plan in failures:
+        typer.echo(
+            f"sequential scan of {', '.join(plan['sequential_scans'])}: "
+            f"{plan['statement']}",
+            err=True,
+        )
+
+    if output:
+        with open(output, "w") as output_file:
+            json.dump(plans, output_file, indent=2)
+
+    typer.echo(f"{len(plans)} statements explained, {len(failures)} failed")
+
+    if failures:
+        raise typer.Exit(code=1)
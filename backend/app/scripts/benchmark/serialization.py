@@ -0,0 +1,148 @@
+import asyncio
+import statistics
+import time
+from typing import Annotated, Any, Callable
+
+import typer
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlmodel import Session, col, func, select
+
+from app.api.runs.encoder import runs_encoder
+from app.api.runs.models import Run, RunsPublic
+from app.api.runs.repository import RunsRepository
+from app.core.database_manager import database_manager
+from app.scripts.benchmark.data_generator import RunDataGenerator
+
+
+class SerializationBenchmark:
+    """measure the per run cost of serializing GET /runs/ for the generated
+    user with the longest history. The model mode reads runs as models and
+    validates and encodes them through RunsPublic as FastAPI does, the rows
+    mode reads rows of the public columns and encodes them with the runs
+    encoder. Query and encoding time are reported separately, with whether
+    both modes produced the same bytes"""
+
+    MODES: list[str] = ["model", "rows"]
+    GROUPS: list[str] = ["daily", "weekly", "monthly"]
+
+    def __init__(self, repeats: int) -> None:
+        self.repeats: int = repeats
+        self.field = create_model_field("Response", RunsPublic)
+
+    def run(self) -> list[dict]:
+        return asyncio.run(self._run())
+
+    async def _run(self) -> list[dict]:
+        database_manager.startup()
+        results: list[dict] = []
+
+        with Session(database_manager.get_engine()) as session:
+            user_id: int = self._get_user_id(session)
+            repository: RunsRepository = RunsRepository(session)
+
+            for group_by in self.GROUPS:
+                bodies: dict[str, bytes] = {}
+
+                for mode in self.MODES:
+                    result: dict = await self._time(
+                        repository, user_id, group_by, mode
+                    )
+                    bodies[mode] = result.pop("body")
+                    results.append(result)
+
+                modes: int = len(self.MODES)
+
+                for result in results[-modes:]:
+                    result["identical"] = bodies["model"] == bodies["rows"]
+
+        return results
+
+    def _get_user_id(self, session: Session) -> int:
+        """the generated user with the most runs"""
+        user_ids: list[int] = RunDataGenerator.get_user_ids(session)
+
+        if not user_ids:
+            raise ValueError("No benchmark users, run generate-data first")
+
+        return session.exec(
+            select(Run.user_id)
+            .where(col(Run.user_id).in_(user_ids))
+            .group_by(col(Run.user_id))
+            .order_by(func.count().desc())
+            .limit(1)
+        ).one()
+
+    async def _time(
+        self,
+        repository: RunsRepository,
+        user_id: int,
+        group_by: str,
+        mode: str,
+    ) -> dict:
+        query_timings: list[float] = []
+        encode_timings: list[float] = []
+        encode: Callable = (
+            self._encode_models if mode == "model" else self._encode_rows
+        )
+        body: bytes = b""
+        runs: Any = []
+
+        for _ in range(self.repeats):
+            start = time.perf_counter()
+            runs = repository.get_runs(
+                user_id, None, None, group_by, mode == "rows"
+            )
+            query_timings.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            body = await encode(runs)
+            encode_timings.append(time.perf_counter() - start)
+
+        query_s: float = statistics.median(query_timings)
+        encode_s: float = statistics.median(encode_timings)
+
+        return {
+            "group_by": group_by,
+            "mode": mode,
+            "runs": len(runs),
+            "query_ms": round(query_s * 1000, 2),
+            "encode_ms": round(encode_s * 1000, 2),
+            "query_us_per_run": round(query_s * 1000000 / len(runs), 2),
+            "encode_us_per_run": round(encode_s * 1000000 / len(runs), 2),
+            "body": body,
+        }
+
+    async def _encode_models(self, runs: Any) -> bytes:
+        """validate, serialize and render the runs as the route does"""
+        content: Any = await serialize_response(
+            field=self.field, response_content=RunsPublic(data=runs)
+        )
+
+        return JSONResponse(content).body
+
+    async def _encode_rows(self, runs: Any) -> bytes:
+        return runs_encoder.encode(runs)
+
+
+app = typer.Typer()
+
+
+@app.command()
+def serialization(repeats: Annotated[int, typer.Option()] = 20):
+    results = SerializationBenchmark(repeats).run()
+
+    typer.echo(
+        f"{'group by':>8} {'mode':>6} {'runs':>6} {'query ms':>9} "
+        f"{'encode ms':>10} {'query us/run':>13} {'encode us/run':>14} "
+        f"{'identical':>10}"
+    )
+
+    for result in results:
+        typer.echo(
+            f"{result['group_by']:>8} {result['mode']:>6} "
+            f"{result['runs']:>6} {result['query_ms']:>9} "
+            f"{result['encode_ms']:>10} {result['query_us_per_run']:>13} "
+            f"{result['encode_us_per_run']:>14} {result['identical']!s:>10}"
+        )
@@ -0,0 +1,65 @@
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable
+
+
+class RequestTimer:
+    """send a number of requests with at most concurrency in flight,
+    timing each of them and the whole run, for the benchmarks driving an
+    app in process. A request is a callable sending the nth request"""
+
+    # the scale of a latency in seconds and the digits it is rounded to
+    UNITS: dict[str, tuple[int, int]] = {"ms": (1000, 2), "us": (1000000, 1)}
+
+    def __init__(self, requests: int, concurrency: int = 1) -> None:
+        self.requests: int = requests
+        self.concurrency: int = concurrency
+        self.latencies: list[float] = []
+        self.elapsed_s: float = 0.0
+
+    async def run(self, request: Callable[[int], Awaitable]) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self.latencies = []
+
+        async def send(index: int) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                await request(index)
+                self.latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[send(index) for index in range(self.requests)])
+        self.elapsed_s = time.perf_counter() - start
+
+    def requests_per_second(self) -> float:
+        if not self.elapsed_s:
+            return 0.0
+
+        return round(self.requests / self.elapsed_s, 1)
+
+    def summary(
+        self, unit: str, percentiles: list[int], mean: bool = False
+    ) -> dict:
+        """the latency percentiles, and optionally the mean, keyed by name
+        and unit like p99_ms"""
+        scale, digits = self.UNITS[unit]
+        latencies: list[float] = [latency * scale for latency in self.latencies]
+
+        # quantiles needs at least two latencies
+        if len(latencies) < 2:
+            latencies = latencies * 2 or [0.0, 0.0]
+
+        cut_points: list[float] = statistics.quantiles(latencies, n=100)
+        summary: dict = (
+            {f"mean_{unit}": round(statistics.mean(latencies), digits)}
+            if mean
+            else {}
+        )
+
+        for percentile in percentiles:
+            summary[f"p{percentile}_{unit}"] = round(
+                cut_points[percentile - 1], digits
+            )
+
+        return summary
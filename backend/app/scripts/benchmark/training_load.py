@@ -0,0 +1,118 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Annotated, Callable
+
+import typer
+
+from app.api.runs.training_load import TrainingLoad
+
+
+class TrainingLoadBenchmark:
+    """measure the training load of a synthetic history of a run a day.
+    Building the load from the daily totals, rendering the default 90 days,
+    a year and the whole history, and adding a run to the latest day, in
+    place and by rebuilding, are timed. The whole history is also totalled
+    by summing each window of days and averaging the loads day by day,
+    the O(days * window) calculation the cumulative sums replace"""
+
+    def __init__(self, years: int, repeats: int, seed: int) -> None:
+        self.repeats: int = repeats
+        generator: random.Random = random.Random(seed)
+        self.end_date: date = date.today()
+        self.start_date: date = self.end_date - timedelta(days=years * 365)
+        self.days: list[tuple[date, int, int]] = [
+            (
+                self.start_date + timedelta(days=day),
+                generator.randint(3000, 15000),
+                generator.randint(900, 5400),
+            )
+            for day in range(years * 365)
+        ]
+
+    def run(self) -> list[dict]:
+        training_load: TrainingLoad = TrainingLoad(self.start_date, self.days)
+        run: tuple[date, int, int] = (self.end_date, 5000, 1800)
+
+        return [
+            self._time(
+                "build", lambda: TrainingLoad(self.start_date, self.days)
+            ),
+            self._time(
+                "90 days",
+                lambda: training_load.public(
+                    self.end_date - timedelta(days=90), self.end_date
+                ),
+            ),
+            self._time(
+                "1 year",
+                lambda: training_load.public(
+                    self.end_date - timedelta(days=365), self.end_date
+                ),
+            ),
+            self._time(
+                "history",
+                lambda: training_load.public(self.start_date, self.end_date),
+            ),
+            self._time("add run", lambda: training_load.apply([run])),
+            self._time(
+                "add rebuild",
+                lambda: TrainingLoad(self.start_date, [*self.days, run]),
+            ),
+            self._time("windowed", self._total_windows),
+        ]
+
+    def _time(self, name: str, callback: Callable) -> dict:
+        timings: list[float] = []
+
+        for _ in range(self.repeats):
+            start = time.perf_counter()
+            callback()
+            timings.append(time.perf_counter() - start)
+
+        return {
+            "name": name,
+            "days": len(self.days),
+            "median_ms": round(statistics.median(timings) * 1000, 3),
+            "max_ms": round(max(timings) * 1000, 3),
+        }
+
+    def _total_windows(self) -> None:
+        """the totals and loads of every day without cumulative sums"""
+        distances_m: list[int] = [distance_m for _, distance_m, _ in self.days]
+        durations_s: list[int] = [duration_s for _, _, duration_s in self.days]
+        acute_load: float = 0.0
+        chronic_load: float = 0.0
+
+        for day in range(len(self.days)):
+            end: int = day + 1
+
+            for window in TrainingLoad.WINDOWS:
+                start: int = max(end - window, 0)
+                sum(distances_m[start:end])
+                sum(durations_s[start:end])
+
+            load: float = durations_s[day] / 60
+            acute_load += (load - acute_load) / TrainingLoad.ACUTE_DAYS
+            chronic_load += (load - chronic_load) / TrainingLoad.CHRONIC_DAYS
+
+
+app = typer.Typer()
+
+
+@app.command()
+def training_load(
+    years: Annotated[int, typer.Option()] = 12,
+    repeats: Annotated[int, typer.Option()] = 20,
+    seed: Annotated[int, typer.Option()] = 1,
+):
+    results = TrainingLoadBenchmark(years, repeats, seed).run()
+
+    typer.echo(f"{'':>12} {'days':>6} {'median ms':>10} {'max ms':>10}")
+
+    for result in results:
+        typer.echo(
+            f"{result['name']:>12} {result['days']:>6} "
+            f"{result['median_ms']:>10} {result['max_ms']:>10}"
+        )
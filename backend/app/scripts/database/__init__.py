@@ -2,8 +2,16 @@ import typer
 
 from .backport_db import app as backport_db_app
 from .backup_db import app as backup_db_app
+from .import_runs import app as import_runs_app
+from .rebuild_personal_bests import app as rebuild_personal_bests_app
+from .rebuild_run_rollups import app as rebuild_run_rollups_app
+from .ship_changes import app as ship_changes_app
 
 app = typer.Typer()
 
 app.add_typer(backport_db_app)
 app.add_typer(backup_db_app)
+app.add_typer(import_runs_app)
+app.add_typer(rebuild_personal_bests_app)
+app.add_typer(rebuild_run_rollups_app)
+app.add_typer(ship_changes_app)
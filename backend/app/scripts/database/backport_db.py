@@ -1,3 +1,4 @@
+import contextlib
 import typer
 from botocore.exceptions import ClientError
 from app.core.config import settings
@@ -5,71 +6,299 @@ from mypy_boto3_s3 import S3Client
 import boto3
 import tempfile
 import subprocess  # nosec
-import os
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Iterable, Iterator
+
+from sqlmodel import Session, select
+
+from app.api.changelog.repository import ChangeLogRepository
+from app.api.runs.repository import RunsRepository
+from app.api.user.models import User
+from app.core.database_manager import database_manager
+from app.core.metrics import job_metrics
+
+from app.scripts.database.backup_catalog import BackupCatalog, BackupEntry
+from app.scripts.database.backup_transfer import (
+    MB,
+    ParallelDownload,
+    decompress,
+)
 
 
 class BackportDB:
     ENV_VARS = {"PGPASSWORD": settings.POSTGRES_PASSWORD}
-    IMPORT_COMMAND = "psql " "-U{database_username} " "-h{database_host} "
+    CONNECTION_ARGS = (
+        "-U{database_username} "
+        "-h{database_host} "
+        "-p{database_port} "
+        "-d{database_name}"
+    )
+    IMPORT_COMMAND = "psql -v ON_ERROR_STOP=1 -q " + CONNECTION_ARGS
+    RESTORE_COMMAND = (
+        "pg_restore --clean --if-exists --no-owner --jobs={jobs} "
+        + CONNECTION_ARGS
+    )
+    LIST_COMMAND = "pg_restore --list"
+    # how long before a backup without a snapshot started changes are
+    # still replayed
+    REPLAY_OVERLAP: timedelta = timedelta(minutes=1)
 
-    def __init__(self):
+    def __init__(
+        self,
+        dry_run: bool = False,
+        jobs: int = settings.RESTORE_JOBS,
+        until: datetime | None = None,
+    ):
         self.s3_client: S3Client = self._initialize_s3_client()
+        self.catalog: BackupCatalog = BackupCatalog(
+            self.s3_client,
+            settings.AWS_S3_BUCKET_NAME,
+            settings.AWS_S3_BACKUP_PATH,
+        )
+        self.dry_run: bool = dry_run
+        self.jobs: int = max(jobs, 1)
+        self.until: datetime | None = (
+            until.replace(tzinfo=until.tzinfo or timezone.utc)
+            if until
+            else None
+        )
 
     @staticmethod
-    def backport_command():
-        BackportDB().perform_backport()
+    def backport_command(
+        dry_run: bool = False,
+        jobs: int = settings.RESTORE_JOBS,
+        until: datetime | None = None,
+    ):
+        BackportDB(dry_run, jobs, until).perform_backport()
 
     def perform_backport(self):
+        """stream the latest backup from S3 into the database and replay the
+        changes shipped since, or restore to a point in time with the last
+        backup before it and the changes up to it. A dry run only checks
+        the backup and changes can be read"""
         try:
-            if not settings.DEVELOPMENT:
+            if not settings.DEVELOPMENT and not self.dry_run:
                 raise RuntimeError("Backports are disabled in production mode")
 
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                file: dict = self._get_latest_backup_file()
-                file_name: str = file["Key"].split("/")[-1]
-                file_name: str = f"{tmp_dir}/{file_name}"
-
-                self.s3_client.download_file(
-                    settings.AWS_S3_BUCKET_NAME, file["Key"], file_name
+            with job_metrics.track(
+                "backport_check" if self.dry_run else "backport"
+            ) as job:
+                backup: BackupEntry = self.catalog.latest(self.until)
+                download = ParallelDownload(
+                    self.s3_client,
+                    settings.AWS_S3_BUCKET_NAME,
+                    backup.key,
+                    settings.BACKUP_PART_SIZE_MB * MB,
+                    settings.BACKUP_DOWNLOAD_CONCURRENCY,
                 )
+                started: float = time.perf_counter()
 
-                if (
-                    not os.path.isfile(file_name)
-                    or not (file_stats := os.stat(file_name))
-                    or not file_stats.st_size
-                ):
-                    raise FileNotFoundError
+                with self._download(backup, download, started) as dump:
+                    if backup.key.endswith(".gz"):
+                        dump = decompress(dump)
 
-                import_command = self.IMPORT_COMMAND.format(
-                    database_username=settings.POSTGRES_USER,
-                    database_host=settings.POSTGRES_SERVER,
-                ).split(" ")
+                    if backup.format == "custom":
+                        self._restore_custom(dump)
+                    else:
+                        self._restore_plain(dump)
 
-                with open(file_name, "r") as backup_file:
-                    subprocess.run(  # nosec
-                        import_command, env=self.ENV_VARS, stdin=backup_file
-                    )
+                # a dry run streams the backup, so it is checked once read
+                self._verify_checksum(backup, download)
 
-        except (KeyError, IndexError, FileNotFoundError):
+                typer.echo(
+                    f"{'checked' if self.dry_run else 'restored'} "
+                    f"{backup.key}: {download.size / MB:.1f}MB in "
+                    f"{time.perf_counter() - started:.1f}s"
+                )
+                job["last_size_bytes"] = download.size
+                job["last_changes"] = self._replay_changes(backup)
+        except (KeyError, IndexError, ClientError):
             raise RuntimeError("Failed to retrieve DB dump")
+        except zlib.error:
+            raise RuntimeError("DB dump is corrupt")
         except RuntimeError as e:
             raise e
 
-    def _get_latest_backup_file(self) -> dict:
-        files: dict = {}
+    @contextlib.contextmanager
+    def _download(
+        self, backup: BackupEntry, download: ParallelDownload, started: float
+    ) -> Iterator[Iterable[bytes]]:
+        """the downloaded backup. When a checksum was recorded it is spooled
+        to a temp file and verified before any of it is restored, so a
+        corrupt backup never reaches the database. A dry run, which writes
+        nothing, and a backup without a checksum are streamed"""
+        parts: Iterable[bytes] = self._report_progress(download, started)
+
+        if self.dry_run or not backup.checksum:
+            yield parts
+            return
+
+        with tempfile.TemporaryFile() as spool:
+            for data in parts:
+                spool.write(data)
+
+            self._verify_checksum(backup, download)
+            spool.seek(0)
+
+            yield iter(lambda: spool.read(MB), b"")
+
+    def _verify_checksum(
+        self, backup: BackupEntry, download: ParallelDownload
+    ) -> None:
+        if backup.checksum and backup.checksum != download.checksum.hexdigest():
+            raise zlib.error("Checksum mismatch")
+
+    def _replay_changes(self, backup: BackupEntry) -> int:
+        """replay the change batches shipped since the backup started in one
+        transaction, then rebuild the leaderboards and rollups derived from
+        the replayed tables, returning the number of changes replayed"""
+        replayed: int = 0
+        # a batch shipped again after failing to leave the queue repeats
+        # changes, each is replayed once
+        seen: set[tuple[int, str]] = set()
+        database_manager.startup()
+
+        try:
+            with Session(database_manager.get_engine()) as session:
+                repository = ChangeLogRepository(session)
+
+                for key in self.catalog.list_changes(after=backup):
+                    changes: list[dict] = []
+
+                    for change in self.catalog.read_changes(key):
+                        change_key = (change["id"], change["changed_at"])
+
+                        if change_key not in seen and self._is_replayed(
+                            change, backup
+                        ):
+                            seen.add(change_key)
+                            changes.append(change)
+
+                    if not self.dry_run:
+                        repository.apply_changes(changes)
+
+                    replayed += len(changes)
 
-        for file in self.s3_client.list_objects(
-            Bucket=settings.AWS_S3_BUCKET_NAME
-        )["Contents"]:
-            if (
-                f"{settings.AWS_S3_BACKUP_PATH}" in file["Key"]
-                and ".sql" in file["Key"]
-            ):
-                files[file["LastModified"].strftime("%s")] = file
+                if replayed and not self.dry_run:
+                    repository.reset_sequences()
+                    repository.commit()
+                    self._rebuild_derived_tables(session)
+                    repository.clear()
+        finally:
+            database_manager.shutdown()
 
-        file: dict = dict(sorted(files.items(), reverse=True))
+        typer.echo(
+            f"{'checked' if self.dry_run else 'replayed'} {replayed} changes"
+        )
+
+        return replayed
+
+    def _is_replayed(self, change: dict, backup: BackupEntry) -> bool:
+        """whether a change is missing from the backup and before the point
+        in time. A change is in the backup when its transaction committed
+        before the snapshot the backup was dumped from, however long before
+        the backup it began. Replaying those over later states of the same
+        rows can break unique constraints"""
+        changed_at: datetime = datetime.fromisoformat(change["changed_at"])
+
+        if self.until and changed_at > self.until:
+            return False
+
+        if backup.snapshot and change.get("txid") is not None:
+            return not backup.includes(change["txid"])
+
+        # backups and changes from before snapshots were recorded
+        return changed_at >= backup.created_at - self.REPLAY_OVERLAP
+
+    def _rebuild_derived_tables(self, session: Session) -> None:
+        repository = RunsRepository(session)
+
+        for user_id in session.exec(select(User.id)).all():
+            repository.rebuild_personal_bests(user_id)
+            repository.rebuild_run_rollups(user_id)
+
+    def _restore_plain(self, dump: Iterable[bytes]) -> None:
+        """pipe a plain SQL dump into psql, a dry run only reads it"""
+        if self.dry_run:
+            for _ in dump:
+                pass
+        else:
+            self._pipe(dump, self._get_command(self.IMPORT_COMMAND))
+
+    def _restore_custom(self, dump: Iterable[bytes]) -> None:
+        """restore a custom format dump with pg_restore. Parallel jobs need
+        a seekable archive so it is spooled to a temp file first, a single
+        job restores straight from the stream. A dry run lists the archive
+        contents and reads the rest of the stream"""
+        if self.dry_run:
+            self._pipe(dump, self.LIST_COMMAND.split(" "), quiet=True)
+        elif self.jobs == 1:
+            self._pipe(dump, self._get_command(self.RESTORE_COMMAND))
+        else:
+            with tempfile.NamedTemporaryFile(suffix=".dump") as backup_file:
+                for data in dump:
+                    backup_file.write(data)
+
+                backup_file.flush()
+                self._run(
+                    self._get_command(self.RESTORE_COMMAND) + [backup_file.name]
+                )
+
+    def _pipe(
+        self, dump: Iterable[bytes], command: list[str], quiet: bool = False
+    ) -> None:
+        """write the dump to the stdin of command. When the command exits
+        without reading all of it, as pg_restore --list does, the rest of
+        the dump is still read so its checksum is verified"""
+        with subprocess.Popen(  # nosec
+            command,
+            env=self.ENV_VARS,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL if quiet else None,
+            bufsize=0,
+        ) as process:
+            try:
+                for data in dump:
+                    with contextlib.suppress(BrokenPipeError):
+                        process.stdin.write(data)
+
+                process.stdin.close()
+            except BaseException:
+                process.kill()
+                raise
+
+            if process.wait():
+                raise RuntimeError("Failed to import DB dump")
+
+    def _run(self, command: list[str]) -> None:
+        if subprocess.run(command, env=self.ENV_VARS).returncode:  # nosec
+            raise RuntimeError("Failed to import DB dump")
+
+    def _get_command(self, command: str) -> list[str]:
+        return command.format(
+            database_username=settings.POSTGRES_USER,
+            database_host=settings.POSTGRES_SERVER,
+            database_port=settings.POSTGRES_PORT,
+            database_name=settings.POSTGRES_DB,
+            jobs=self.jobs,
+        ).split(" ")
+
+    def _report_progress(
+        self, download: ParallelDownload, started: float
+    ) -> Iterable[bytes]:
+        """pass the downloaded parts through, echoing progress and
+        throughput after each"""
+        for data in download:
+            elapsed_s: float = time.perf_counter() - started
+            typer.echo(
+                f"downloaded {download.downloaded_bytes / MB:.1f}/"
+                f"{download.size / MB:.1f}MB "
+                f"({download.downloaded_bytes / MB / elapsed_s:.1f}MB/s)"
+            )
 
-        return file[list(file)[0]]
+            yield data
 
     def _initialize_s3_client(self) -> S3Client:
         """initialize boto S3 client"""
@@ -78,6 +307,7 @@ class BackportDB:
                 "s3",
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
             )
         except ClientError:
             raise RuntimeError("Failed to connect to S3")
@@ -87,5 +317,9 @@ app = typer.Typer()
 
 
 @app.command()
-def backport_db():
-    BackportDB.backport_command()
+def backport_db(
+    dry_run: Annotated[bool, typer.Option()] = False,
+    jobs: Annotated[int, typer.Option()] = settings.RESTORE_JOBS,
+    until: Annotated[datetime | None, typer.Option()] = None,
+):
+    BackportDB.backport_command(dry_run, jobs, until)
@@ -0,0 +1,236 @@
+import gzip
+import json
+from datetime import datetime
+from typing import Iterator, Literal
+
+from botocore.exceptions import ClientError
+from mypy_boto3_s3 import S3Client
+from sqlmodel import SQLModel
+
+
+class BackupEntry(SQLModel):
+    key: str
+    size: int
+    checksum: str | None = None
+    format: Literal["custom", "plain"]
+    created_at: datetime
+    # the pg_current_snapshot, xmin:xmax:xip, the backup was dumped from
+    snapshot: str | None = None
+
+    def includes(self, txid: int) -> bool:
+        """whether the changes of a committed transaction are in the backup,
+        those that committed before its snapshot was taken"""
+        if self.snapshot is None:
+            raise ValueError("Backup has no snapshot")
+
+        xmin, xmax, in_progress = self.snapshot.split(":")
+
+        return txid < int(xmin) or (
+            txid < int(xmax) and str(txid) not in in_progress.split(",")
+        )
+
+
+class BackupManifest(SQLModel):
+    backups: list[BackupEntry] = []
+
+
+class BackupCatalog:
+    """catalog of the backups under a prefix, kept in a manifest object
+    alongside them so finding the latest backup and enforcing retention
+    read one object rather than listing the bucket. The manifest is
+    rebuilt from a paginated listing of the prefix when it is missing.
+
+    batches of changes shipped between backups are stored under the changes
+    path, keyed by time so those since a backup are a single listing"""
+
+    MANIFEST_NAME: str = "manifest.json"
+    EXTENSIONS: dict[str, Literal["custom", "plain"]] = {
+        ".dump.gz": "custom",
+        ".sql.gz": "plain",
+        # uncompressed plain dumps are from before backups were streamed
+        ".sql": "plain",
+    }
+    DELETE_BATCH_SIZE: int = 1000
+    CHANGES_PATH: str = "changes/"
+    CHANGES_TIME_FORMAT: str = "%Y%m%dT%H%M%S%fZ"
+
+    def __init__(self, s3_client: S3Client, bucket: str, prefix: str):
+        self.s3_client: S3Client = s3_client
+        self.bucket: str = bucket
+        self.prefix: str = prefix
+        self.manifest_key: str = f"{prefix}{self.MANIFEST_NAME}"
+
+    def latest(self, before: datetime | None = None) -> BackupEntry:
+        """get the most recent backup, or the most recent started before a
+        point in time, raising IndexError when there is none"""
+        return [
+            backup
+            for backup in self.get_manifest().backups
+            if before is None or backup.created_at <= before
+        ][0]
+
+    def add(self, entry: BackupEntry) -> None:
+        """record a new backup as the latest, replacing any earlier entry
+        for the same key"""
+        manifest: BackupManifest = self.get_manifest()
+        manifest.backups = [
+            backup for backup in manifest.backups if backup.key != entry.key
+        ]
+        manifest.backups.insert(0, entry)
+        self._save_manifest(manifest)
+
+    def expire(self, keep: int) -> list[BackupEntry]:
+        """delete all but the keep most recent backups, and the change
+        batches shipped before the oldest of those, in batched
+        delete_objects calls, returning the backups deleted"""
+        manifest: BackupManifest = self.get_manifest()
+        expired: list[BackupEntry] = manifest.backups[keep:]
+
+        self._delete([backup.key for backup in expired])
+        manifest.backups = manifest.backups[:keep]
+        self._save_manifest(manifest)
+
+        if manifest.backups:
+            self._delete(list(self.list_changes(before=manifest.backups[-1])))
+
+        return expired
+
+    def add_changes(self, changes: list[dict], shipped_at: datetime) -> str:
+        """store a batch of changes as gzipped NDJSON, keyed by the time
+        it was shipped so batches list in the order they were taken"""
+        key: str = (
+            f"{self.prefix}{self.CHANGES_PATH}"
+            f"{shipped_at.strftime(self.CHANGES_TIME_FORMAT)}-"
+            f"{changes[0]['id']}-{changes[-1]['id']}.ndjson.gz"
+        )
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=gzip.compress(
+                "".join(
+                    json.dumps(change, default=str) + "\n" for change in changes
+                ).encode()
+            ),
+        )
+
+        return key
+
+    def list_changes(
+        self,
+        after: BackupEntry | None = None,
+        before: BackupEntry | None = None,
+    ) -> Iterator[str]:
+        """list the keys of the change batches shipped after a backup
+        started, or before it, in the order they were shipped"""
+        changes_prefix: str = f"{self.prefix}{self.CHANGES_PATH}"
+        options: dict = {"Bucket": self.bucket, "Prefix": changes_prefix}
+
+        if after:
+            options["StartAfter"] = changes_prefix + after.created_at.strftime(
+                self.CHANGES_TIME_FORMAT
+            )
+
+        for page in self.s3_client.get_paginator("list_objects_v2").paginate(
+            **options
+        ):
+            for file in page.get("Contents", []):
+                if before and file["Key"] >= changes_prefix + (
+                    before.created_at.strftime(self.CHANGES_TIME_FORMAT)
+                ):
+                    return
+
+                yield file["Key"]
+
+    def read_changes(self, key: str) -> list[dict]:
+        """read a batch of changes"""
+        return [
+            json.loads(line)
+            for line in gzip.decompress(
+                self.s3_client.get_object(Bucket=self.bucket, Key=key)[
+                    "Body"
+                ].read()
+            ).splitlines()
+        ]
+
+    def get_manifest(self) -> BackupManifest:
+        """read the manifest, rebuilding it when it does not exist yet"""
+        try:
+            manifest: BackupManifest = BackupManifest.model_validate_json(
+                self.s3_client.get_object(
+                    Bucket=self.bucket, Key=self.manifest_key
+                )["Body"].read()
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("NoSuchKey", "404"):
+                raise
+
+            return self.rebuild()
+
+        manifest.backups.sort(
+            key=lambda backup: backup.created_at, reverse=True
+        )
+
+        return manifest
+
+    def rebuild(self) -> BackupManifest:
+        """rebuild the manifest from a paginated listing of the prefix"""
+        manifest: BackupManifest = BackupManifest(
+            backups=sorted(
+                self._list_backups(),
+                key=lambda backup: backup.created_at,
+                reverse=True,
+            )
+        )
+        self._save_manifest(manifest)
+
+        return manifest
+
+    def get_format(self, key: str) -> Literal["custom", "plain"] | None:
+        """get the dump format of a backup from its key"""
+        for extension, backup_format in self.EXTENSIONS.items():
+            if key.endswith(extension):
+                return backup_format
+
+        return None
+
+    def _list_backups(self) -> list[BackupEntry]:
+        backups: list[BackupEntry] = []
+
+        for page in self.s3_client.get_paginator("list_objects_v2").paginate(
+            Bucket=self.bucket, Prefix=self.prefix
+        ):
+            for file in page.get("Contents", []):
+                if backup_format := self.get_format(file["Key"]):
+                    backups.append(
+                        BackupEntry(
+                            key=file["Key"],
+                            size=file["Size"],
+                            format=backup_format,
+                            created_at=file["LastModified"],
+                        )
+                    )
+
+        return backups
+
+    def _delete(self, keys: list[str]) -> None:
+        """delete objects in batches of up to a thousand keys"""
+        for start in range(0, len(keys), self.DELETE_BATCH_SIZE):
+            end: int = start + self.DELETE_BATCH_SIZE
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket,
+                Delete={
+                    "Objects": [{"Key": key} for key in keys[start:end]],
+                    "Quiet": True,
+                },
+            )
+
+            if response.get("Errors"):
+                raise RuntimeError("Failed deleting old backup")
+
+    def _save_manifest(self, manifest: BackupManifest) -> None:
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self.manifest_key,
+            Body=manifest.model_dump_json(indent=2).encode(),
+            ContentType="application/json",
+        )
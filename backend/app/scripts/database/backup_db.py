@@ -1,12 +1,24 @@
+import contextlib
 import typer
 from botocore.exceptions import ClientError
 from app.core.config import settings
 import boto3
 from mypy_boto3_s3 import S3Client
-from datetime import datetime
-import os
+from datetime import datetime, timezone
 import subprocess  # nosec
-import tempfile
+import time
+from typing import Iterator
+
+from sqlalchemy import text
+
+from app.core.database_manager import database_manager
+from app.core.metrics import job_metrics
+from app.scripts.database.backup_catalog import BackupCatalog, BackupEntry
+from app.scripts.database.backup_transfer import (
+    MB,
+    CompressingReader,
+    MultipartUpload,
+)
 
 app = typer.Typer()
 
@@ -14,87 +26,157 @@ app = typer.Typer()
 class BackupDB:
     ENV_VARS = {"PGPASSWORD": settings.POSTGRES_PASSWORD}
 
-    BACKUP_COMMAND = (
-        "pg_dump --clean --inserts "
-        "-U{database_username} "
-        "-h{database_host}"
-    )
+    BACKUP_COMMANDS = {
+        "custom": (
+            "pg_dump --format=custom --compress=0 "
+            "--exclude-table-data=changelog "
+            "-U{database_username} "
+            "-h{database_host} "
+            "-p{database_port} "
+            "-d{database_name}"
+        ),
+        "plain": (
+            "pg_dump --clean --if-exists "
+            "--exclude-table-data=changelog "
+            "-U{database_username} "
+            "-h{database_host} "
+            "-p{database_port} "
+            "-d{database_name}"
+        ),
+    }
+    EXTENSIONS = {"custom": ".dump.gz", "plain": ".sql.gz"}
 
     def __init__(self):
         self.s3_client: S3Client = self._initialize_s3_client()
+        self.catalog: BackupCatalog = BackupCatalog(
+            self.s3_client,
+            settings.AWS_S3_BUCKET_NAME,
+            settings.AWS_S3_BACKUP_PATH,
+        )
 
     @staticmethod
     def backup_command():
         BackupDB().perform_backup()
 
     def perform_backup(self):
-        """dump database to file and upload to S3"""
+        """stream a compressed database dump to S3"""
         try:
             if settings.DEVELOPMENT:
                 raise RuntimeError("Backups are disabled in development mode")
 
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                file_name = (
-                    f"db_backup_{datetime.today().strftime('%Y-%m-%d')}.sql"
-                )
-                full_backup_path = f"/{tmp_dir}/{file_name}"
+            file_name = (
+                f"db_backup_{datetime.today().strftime('%Y-%m-%d')}"
+                f"{self.EXTENSIONS[settings.BACKUP_FORMAT]}"
+            )
 
-                self._dump_database(full_backup_path)
-                self.s3_client.upload_file(
-                    full_backup_path,
-                    settings.AWS_S3_BUCKET_NAME,
-                    f"{settings.AWS_S3_BACKUP_PATH}{file_name}",
+            with job_metrics.track("backup") as job:
+                dump: CompressingReader = self._stream_backup(
+                    f"{settings.AWS_S3_BACKUP_PATH}{file_name}"
                 )
+                job["last_raw_bytes"] = dump.raw_bytes
+                job["last_size_bytes"] = dump.compressed_bytes
                 self._clean_old_dumps()
         except ClientError:
             raise RuntimeError("Failed to upload DB dump to S3")
         except RuntimeError as e:
             raise e
 
-    def _dump_database(self, full_backup_path: str) -> None:
-        """dump database to file"""
-        backup_command = self.BACKUP_COMMAND.format(
-            database_username=settings.POSTGRES_USER,
-            database_host=settings.POSTGRES_SERVER,
-            full_backup_path=full_backup_path,
-        ).split(" ")
-
-        with open(full_backup_path, "w") as backup_file:
-            subprocess.run(  # nosec
-                backup_command, env=self.ENV_VARS, stdout=backup_file
+    def _stream_backup(self, key: str) -> CompressingReader:
+        """pipe the dump through gzip straight into a multipart upload, so
+        no local disk is needed and compression overlaps the upload"""
+        backup_command = (
+            self.BACKUP_COMMANDS[settings.BACKUP_FORMAT]
+            .format(
+                database_username=settings.POSTGRES_USER,
+                database_host=settings.POSTGRES_SERVER,
+                database_port=settings.POSTGRES_PORT,
+                database_name=settings.POSTGRES_DB,
             )
-
-        if (
-            not os.path.isfile(full_backup_path)
-            or not (file_stats := os.stat(full_backup_path))
-            or not file_stats.st_size
+            .split(" ")
+        )
+        started: float = time.perf_counter()
+        started_at: datetime = datetime.now(timezone.utc)
+
+        with (
+            self._export_snapshot() as (snapshot_id, snapshot),
+            subprocess.Popen(  # nosec
+                backup_command + [f"--snapshot={snapshot_id}"],
+                env=self.ENV_VARS,
+                stdout=subprocess.PIPE,
+            ) as process,
         ):
-            raise RuntimeError("Failed to generate DB dump")
+            dump = CompressingReader(
+                process.stdout, settings.BACKUP_COMPRESSION_LEVEL
+            )
+
+            try:
+                with MultipartUpload(
+                    self.s3_client,
+                    settings.AWS_S3_BUCKET_NAME,
+                    key,
+                    settings.BACKUP_PART_SIZE_MB * MB,
+                    settings.BACKUP_UPLOAD_CONCURRENCY,
+                ) as upload:
+                    upload.upload(dump)
+
+                    if process.wait() or not dump.raw_bytes:
+                        raise RuntimeError("Failed to generate DB dump")
+            except BaseException:
+                process.kill()
+                raise
+
+        self.catalog.add(
+            BackupEntry(
+                key=key,
+                size=dump.compressed_bytes,
+                checksum=dump.checksum.hexdigest(),
+                format=settings.BACKUP_FORMAT,
+                created_at=started_at,
+                snapshot=snapshot,
+            )
+        )
+        self._report(key, dump, time.perf_counter() - started)
+
+        return dump
+
+    @contextlib.contextmanager
+    def _export_snapshot(self) -> Iterator[tuple[str, str]]:
+        """export a snapshot for pg_dump to dump from, held open in a
+        repeatable read transaction until the dump ends. The snapshot is
+        also returned as xmin:xmax:xip, so a backport replays exactly the
+        changes of the transactions it does not include"""
+        database_manager.startup()
 
-    def _clean_old_dumps(self) -> None:
-        """clean old dumps from S3"""
         try:
-            files = {}
-
-            for file in self.s3_client.list_objects(
-                Bucket=settings.AWS_S3_BUCKET_NAME
-            )["Contents"]:
-                if (
-                    f"{settings.AWS_S3_BACKUP_PATH}" in file["Key"]
-                    and ".sql" in file["Key"]
-                ):
-                    files[file["LastModified"].strftime("%s")] = file
-
-            for i, file in enumerate(dict(sorted(files.items(), reverse=True))):
-                if i > (settings.DAYS_BACKUPS_TO_KEEP - 1):
-                    self.s3_client.delete_object(
-                        Bucket=settings.AWS_S3_BUCKET_NAME,
-                        Key=files[file]["Key"],
-                    )
-        except KeyError:
-            raise RuntimeError("Failed to retrieve old backups")
-        except (TypeError, ClientError):
-            raise RuntimeError("Failed deleting old backup")
+            with database_manager.get_engine().connect() as connection:
+                connection.execution_options(isolation_level="REPEATABLE READ")
+
+                with connection.begin():
+                    snapshot_id, snapshot = connection.execute(
+                        text(
+                            "SELECT pg_export_snapshot(), "
+                            "pg_current_snapshot()::text"
+                        )
+                    ).one()
+
+                    yield snapshot_id, snapshot
+        finally:
+            database_manager.shutdown()
+
+    def _clean_old_dumps(self) -> None:
+        """delete the backups beyond those to keep"""
+        if expired := self.catalog.expire(settings.DAYS_BACKUPS_TO_KEEP):
+            typer.echo(f"deleted {len(expired)} old backups")
+
+    def _report(
+        self, key: str, dump: CompressingReader, elapsed_s: float
+    ) -> None:
+        typer.echo(
+            f"uploaded {key}: {dump.raw_bytes / MB:.1f}MB dumped, "
+            f"{dump.compressed_bytes / MB:.1f}MB stored, "
+            f"compression ratio {dump.ratio:.2f}, "
+            f"{dump.raw_bytes / MB / elapsed_s:.1f}MB/s in {elapsed_s:.1f}s"
+        )
 
     def _initialize_s3_client(self) -> S3Client:
         """initialize boto S3 client"""
@@ -103,6 +185,7 @@ class BackupDB:
                 "s3",
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
             )
         except ClientError:
             raise RuntimeError("Failed to connect to S3")
@@ -0,0 +1,202 @@
+import hashlib
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import BinaryIO, Iterable, Iterator
+
+from mypy_boto3_s3 import S3Client
+
+MB: int = 1024 * 1024
+
+
+class CompressingReader:
+    """file like wrapper gzip compressing a binary stream as it is read,
+    counting the bytes read from the stream and checksumming and counting
+    the bytes produced"""
+
+    READ_SIZE: int = MB
+
+    def __init__(self, stream: BinaryIO, level: int):
+        self.stream: BinaryIO = stream
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        self.buffer: bytearray = bytearray()
+        self.eof: bool = False
+        self.raw_bytes: int = 0
+        self.compressed_bytes: int = 0
+        self.checksum = hashlib.sha256()
+
+    def read(self, size: int) -> bytes:
+        """read up to size compressed bytes, fewer only at the end"""
+        while len(self.buffer) < size and not self.eof:
+            if chunk := self.stream.read(self.READ_SIZE):
+                self.raw_bytes += len(chunk)
+                self.buffer += self.compressor.compress(chunk)
+            else:
+                self.buffer += self.compressor.flush()
+                self.eof = True
+
+        data: bytes = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.compressed_bytes += len(data)
+        self.checksum.update(data)
+
+        return data
+
+    @property
+    def ratio(self) -> float:
+        if not self.compressed_bytes:
+            return 0.0
+
+        return self.raw_bytes / self.compressed_bytes
+
+
+class MultipartUpload:
+    """upload a stream to S3 in parts of part_size bytes with up to
+    concurrency parts in flight, so memory use is bounded by part size and
+    concurrency rather than the size of the stream. The upload is completed
+    when the context exits cleanly and aborted otherwise"""
+
+    MIN_PART_SIZE: int = 5 * MB
+
+    def __init__(
+        self,
+        s3_client: S3Client,
+        bucket: str,
+        key: str,
+        part_size: int,
+        concurrency: int,
+    ):
+        self.s3_client: S3Client = s3_client
+        self.bucket: str = bucket
+        self.key: str = key
+        self.part_size: int = max(part_size, self.MIN_PART_SIZE)
+        self.concurrency: int = max(concurrency, 1)
+        self.parts: list[dict] = []
+        self.upload_id: str | None = None
+        self.executor: ThreadPoolExecutor | None = None
+
+    def __enter__(self) -> "MultipartUpload":
+        self.upload_id = self.s3_client.create_multipart_upload(
+            Bucket=self.bucket, Key=self.key
+        )["UploadId"]
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+        if exc_type or not self.parts:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+        else:
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={
+                    "Parts": sorted(
+                        self.parts, key=lambda part: part["PartNumber"]
+                    )
+                },
+            )
+
+    def upload(self, stream: CompressingReader | BinaryIO) -> None:
+        """read the stream a part at a time, uploading each part once a
+        slot is free"""
+        in_flight: set[Future] = set()
+        part_number: int = 0
+
+        while data := stream.read(self.part_size):
+            if len(in_flight) >= self.concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                self.parts.extend(future.result() for future in done)
+
+            part_number += 1
+            in_flight.add(
+                self.executor.submit(self._upload_part, part_number, data)
+            )
+
+        self.parts.extend(future.result() for future in wait(in_flight).done)
+
+    def _upload_part(self, part_number: int, data: bytes) -> dict:
+        return {
+            "PartNumber": part_number,
+            "ETag": self.s3_client.upload_part(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                PartNumber=part_number,
+                Body=data,
+            )["ETag"],
+        }
+
+
+class ParallelDownload:
+    """download an S3 object as ranged GETs of part_size bytes with up to
+    concurrency in flight, yielding the parts in order and checksumming
+    them as they are yielded"""
+
+    def __init__(
+        self,
+        s3_client: S3Client,
+        bucket: str,
+        key: str,
+        part_size: int,
+        concurrency: int,
+    ):
+        self.s3_client: S3Client = s3_client
+        self.bucket: str = bucket
+        self.key: str = key
+        self.part_size: int = max(part_size, MB)
+        self.concurrency: int = max(concurrency, 1)
+        self.size: int = 0
+        self.downloaded_bytes: int = 0
+        self.checksum = hashlib.sha256()
+
+    def __iter__(self) -> Iterator[bytes]:
+        self.size = self.s3_client.head_object(
+            Bucket=self.bucket, Key=self.key
+        )["ContentLength"]
+        executor: ThreadPoolExecutor = ThreadPoolExecutor(self.concurrency)
+        pending: deque[Future] = deque()
+
+        try:
+            for start in range(0, self.size, self.part_size):
+                pending.append(executor.submit(self._get_range, start))
+
+                if len(pending) >= self.concurrency:
+                    yield self._next_part(pending)
+
+            while pending:
+                yield self._next_part(pending)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _next_part(self, pending: deque[Future]) -> bytes:
+        data: bytes = pending.popleft().result()
+        self.downloaded_bytes += len(data)
+        self.checksum.update(data)
+
+        return data
+
+    def _get_range(self, start: int) -> bytes:
+        end: int = min(start + self.part_size, self.size) - 1
+
+        return self.s3_client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end}"
+        )["Body"].read()
+
+
+def decompress(parts: Iterable[bytes]) -> Iterator[bytes]:
+    """gunzip a stream of parts, raising when it is truncated. The gzip
+    trailer checksum and length are verified as the stream ends"""
+    decompressor = zlib.decompressobj(31)
+
+    for part in parts:
+        if data := decompressor.decompress(part):
+            yield data
+
+    if not decompressor.eof:
+        raise zlib.error("Compressed stream is truncated")
@@ -0,0 +1,98 @@
+from pathlib import Path
+from typing import Annotated
+
+import typer
+from sqlmodel import Session
+
+from app.api.runs.importer import RunImporter
+from app.api.runs.models import RunImportPublic
+from app.api.runs.repository import RunsRepository
+from app.core.database_manager import database_manager
+
+
+class ImportRuns:
+    def __init__(
+        self,
+        path: Path,
+        user_id: int,
+        import_format: str | None = None,
+        chunk_size: int = RunImporter.CHUNK_SIZE,
+    ):
+        self.path: Path = path
+        self.user_id: int = user_id
+        self.import_format: str | None = import_format
+        self.chunk_size: int = chunk_size
+
+    @staticmethod
+    def import_command(
+        path: Path,
+        user_id: int,
+        import_format: str | None = None,
+        chunk_size: int = RunImporter.CHUNK_SIZE,
+    ):
+        ImportRuns(path, user_id, import_format, chunk_size).perform_import()
+
+    def perform_import(self) -> None:
+        """bulk import a CSV or NDJSON file of runs for a user, a transaction
+        per chunk and one rebuilding the leaderboards the runs qualify for"""
+        import_format: str | None = (
+            self.import_format or RunImporter.get_format(self.path.name)
+        )
+
+        if import_format not in RunImporter.FORMATS:
+            typer.echo(f"unable to determine the format of {self.path}")
+            raise typer.Exit(code=1)
+
+        importer: RunImporter = RunImporter(import_format, self.chunk_size)
+        database_manager.startup()
+
+        try:
+            with (
+                Session(database_manager.get_engine()) as session,
+                self.path.open(encoding="utf-8-sig", newline="") as lines,
+            ):
+                repository: RunsRepository = RunsRepository(session)
+                personal_best_ids: set[int] = set()
+
+                # the chunks committed before a failure are still ranked
+                try:
+                    for chunk in importer.chunks(lines):
+                        importer.record(
+                            chunk,
+                            repository.add_runs(
+                                self.user_id,
+                                [run for _, run in chunk],
+                                personal_best_ids,
+                            ),
+                        )
+                        typer.echo(f"imported {importer.imported} runs")
+                finally:
+                    repository.rebuild_personal_bests(
+                        self.user_id, sorted(personal_best_ids)
+                    )
+        finally:
+            database_manager.shutdown()
+
+        self._report(importer.result())
+
+    def _report(self, result: RunImportPublic) -> None:
+        for error in result.errors:
+            typer.echo(f"row {error.row}: {error.error}", err=True)
+
+        typer.echo(
+            f"imported {result.imported} runs, {result.failed} failed in "
+            f"{result.elapsed_s}s ({result.rows_per_s} rows/s)"
+        )
+
+
+app = typer.Typer()
+
+
+@app.command()
+def import_runs(
+    path: Annotated[Path, typer.Argument(exists=True, dir_okay=False)],
+    user_id: Annotated[int, typer.Option()],
+    import_format: Annotated[str | None, typer.Option("--format")] = None,
+    chunk_size: Annotated[int, typer.Option()] = RunImporter.CHUNK_SIZE,
+):
+    ImportRuns.import_command(path, user_id, import_format, chunk_size)
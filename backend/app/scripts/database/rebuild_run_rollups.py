@@ -0,0 +1,47 @@
+from typing import Annotated
+
+import typer
+from sqlmodel import Session, select
+
+from app.api.runs.repository import RunsRepository
+from app.api.user.models import User
+from app.core.database_manager import database_manager
+
+
+class RebuildRunRollups:
+    def __init__(self, user_id: int | None = None):
+        self.user_id: int | None = user_id
+
+    @staticmethod
+    def rebuild_command(user_id: int | None = None):
+        RebuildRunRollups(user_id).perform_rebuild()
+
+    def perform_rebuild(self):
+        """rebuild the weekly, monthly and yearly run rollups from scratch"""
+        database_manager.startup()
+
+        try:
+            with Session(database_manager.get_engine()) as session:
+                repository = RunsRepository(session)
+
+                for user_id in self._get_user_ids(session):
+                    repository.rebuild_run_rollups(user_id)
+                    typer.echo(f"rebuilt run rollups for user {user_id}")
+        finally:
+            database_manager.shutdown()
+
+    def _get_user_ids(self, session: Session) -> list[int]:
+        if self.user_id:
+            return [self.user_id]
+
+        return list(session.exec(select(User.id)).all())
+
+
+app = typer.Typer()
+
+
+@app.command()
+def rebuild_run_rollups(
+    user_id: Annotated[int | None, typer.Option()] = None,
+):
+    RebuildRunRollups.rebuild_command(user_id)
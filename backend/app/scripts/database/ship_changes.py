@@ -0,0 +1,116 @@
+import time
+from datetime import datetime, timezone
+from typing import Annotated
+
+import boto3
+import typer
+from botocore.exceptions import ClientError
+from mypy_boto3_s3 import S3Client
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session
+
+from app.api.changelog.models import ChangeLog
+from app.api.changelog.repository import ChangeLogRepository
+from app.core.config import settings
+from app.core.database_manager import database_manager
+from app.core.metrics import job_metrics
+from app.scripts.database.backup_catalog import BackupCatalog
+
+
+class ShipChanges:
+    """continuous backup, ships the changes logged since the last run to
+    S3 in batches so the cost follows the amount of change rather than the
+    size of the database. Run it frequently between full backups"""
+
+    def __init__(self):
+        self.s3_client: S3Client = self._initialize_s3_client()
+        self.catalog: BackupCatalog = BackupCatalog(
+            self.s3_client,
+            settings.AWS_S3_BUCKET_NAME,
+            settings.AWS_S3_BACKUP_PATH,
+        )
+
+    @staticmethod
+    def ship_command(follow: bool = False):
+        if follow:
+            ShipChanges().follow()
+        else:
+            ShipChanges().perform_ship()
+
+    def follow(self):
+        """ship changes every CHANGE_SHIP_INTERVAL_S until stopped, a failed
+        run leaves its changes queued for the next"""
+        if settings.DEVELOPMENT:
+            raise RuntimeError("Backups are disabled in development mode")
+
+        while True:
+            try:
+                self.perform_ship()
+            except (RuntimeError, SQLAlchemyError) as error:
+                typer.echo(f"shipping changes failed: {error}", err=True)
+
+            time.sleep(settings.CHANGE_SHIP_INTERVAL_S)
+
+    def perform_ship(self):
+        """ship queued changes a batch at a time, each batch is removed from
+        the queue only once it is stored"""
+        if settings.DEVELOPMENT:
+            raise RuntimeError("Backups are disabled in development mode")
+
+        shipped: int = 0
+        database_manager.startup()
+
+        try:
+            with (
+                job_metrics.track("ship_changes") as job,
+                Session(database_manager.get_engine()) as session,
+            ):
+                repository = ChangeLogRepository(session)
+
+                while changes := repository.get_changes(
+                    settings.CHANGE_BATCH_SIZE
+                ):
+                    key: str = self.catalog.add_changes(
+                        [self._serialize(change) for change in changes],
+                        datetime.now(timezone.utc),
+                    )
+                    repository.delete_changes([change.id for change in changes])
+                    shipped += len(changes)
+                    job["last_changes"] = shipped
+                    typer.echo(f"shipped {len(changes)} changes to {key}")
+        except ClientError:
+            raise RuntimeError("Failed to upload changes to S3")
+        finally:
+            database_manager.shutdown()
+
+        typer.echo(f"shipped {shipped} changes")
+
+    def _serialize(self, change: ChangeLog) -> dict:
+        return {
+            "id": change.id,
+            "table_name": change.table_name,
+            "operation": change.operation,
+            "data": change.data,
+            "changed_at": change.changed_at.isoformat(),
+            "txid": change.txid,
+        }
+
+    def _initialize_s3_client(self) -> S3Client:
+        """initialize boto S3 client"""
+        try:
+            return boto3.client(
+                "s3",
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+            )
+        except ClientError:
+            raise RuntimeError("Failed to connect to S3")
+
+
+app = typer.Typer()
+
+
+@app.command()
+def ship_changes(follow: Annotated[bool, typer.Option()] = False):
+    ShipChanges.ship_command(follow)
@@ -1,8 +1,12 @@
 import typer
+from .benchmark import app as benchmark_app
 from .database import app as database_app
+from .user import app as user_app
 
 app = typer.Typer()
 app.add_typer(database_app, name="database")
+app.add_typer(benchmark_app, name="benchmark")
+app.add_typer(user_app, name="user")
 
 if __name__ == "__main__":
     app()
@@ -0,0 +1,7 @@
+import typer
+
+from .set_password import app as set_password_app
+
+app = typer.Typer()
+
+app.add_typer(set_password_app)
@@ -0,0 +1,45 @@
+from typing import Annotated
+
+import typer
+from sqlmodel import Session
+
+from app.api.user.repository import UserRepository
+from app.core.authentication import passwords
+from app.core.database_manager import database_manager
+
+
+class SetPassword:
+    def __init__(self, email: str, password: str):
+        self.email: str = email
+        self.password: str = password
+
+    @staticmethod
+    def set_password_command(email: str, password: str):
+        SetPassword(email, password).perform_set_password()
+
+    def perform_set_password(self):
+        """hash and store the password a user logs in with"""
+        database_manager.startup()
+
+        try:
+            with Session(database_manager.get_engine()) as session:
+                UserRepository(session).set_password(
+                    self.email, passwords.hash(self.password)
+                )
+                typer.echo(f"set password for {self.email}")
+        finally:
+            database_manager.shutdown()
+
+
+app = typer.Typer()
+
+
+@app.command()
+def set_password(
+    email: Annotated[str, typer.Option()],
+    password: Annotated[
+        str,
+        typer.Option(prompt=True, hide_input=True, confirmation_prompt=True),
+    ],
+):
+    SetPassword.set_password_command(email, password)
@@ -1,3 +1,7 @@
 #!/usr/bin/env bash
 
-cd /opt/treadmilltracker.zz50.co.uk && python -m app.scripts.main database backup-db
\ No newline at end of file
+cd /opt/treadmilltracker.zz50.co.uk || exit 1
+
+# ship the queued changes first, a failure must not stop the full backup
+python -m app.scripts.main database ship-changes
+python -m app.scripts.main database backup-db
\ No newline at end of file
@@ -5,5 +5,7 @@ alembic upgrade head
 if [ "$ENVIRONMENT" == "development" ] ; then
   uvicorn app.main:app --host=0.0.0.0 --port=8001 --reload --log-level=debug
 else
+  # changes are only logged outside development, ship them as they queue
+  python -m app.scripts.main database ship-changes --follow &
   uvicorn app.main:app --host=0.0.0.0 --port=8001 --log-level=warning
 fi
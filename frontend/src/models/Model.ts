@@ -45,6 +45,9 @@ export class Model {
 
         if (response.status === StatusCodes.INTERNAL_SERVER_ERROR) {
           throw new Error(this.errorMessage(response))
+        } else if (response.status === StatusCodes.UNAUTHORIZED) {
+          this._store.user.logout()
+          throw new Error(this.errorMessage(response))
         } else if (response.status === StatusCodes.FORBIDDEN) {
           this._store.user.logout()
           throw new Error('403: Forbidden')
@@ -114,7 +117,7 @@ export class Model {
   }
 
   protected async getCSRFToken(): Promise<string> {
-    let csrf_token: string | undefined = Cookies.get('session')
+    let csrf_token: string | undefined = Cookies.get('csrf_token')
 
     if (!csrf_token) {
       csrf_token = await this.fetch('/api/auth/csrf', { method: 'GET' }).then(
@@ -1,10 +1,19 @@
 import { Model } from '@/models/Model'
-import type { ResponsePayload, Run } from '@/types/types.d.ts'
+import type {
+  HeatmapDay,
+  HeatmapPayload,
+  ResponsePayload,
+  Run,
+  SeriesPayload,
+} from '@/types/types.d.ts'
 import { RunModel } from '@/models/RunModel'
+import moment from 'moment'
 import { ref, type Ref } from 'vue'
 
 export class RunsModel extends Model {
   public runs: Ref<Array<Run>> = ref([])
+  public heatmap: Ref<Array<HeatmapDay>> = ref([])
+  public series: Ref<SeriesPayload | null> = ref(null)
 
   public getRuns(
     group_by: string = 'daily',
@@ -34,4 +43,68 @@ export class RunsModel extends Model {
       }
     })
   }
+
+  public getHeatmap(start_date: string, end_date: string): Promise<ResponsePayload | void> {
+    this.heatmap.value = []
+
+    const url: string = 'api/runs/heatmap?start_date=' + start_date + '&end_date=' + end_date
+
+    return this.fetch(url, { method: 'GET' }).then((response: ResponsePayload | void) => {
+      if (
+        response &&
+        typeof response === 'object' &&
+        response.data &&
+        typeof response.data === 'object' &&
+        'days' in response.data &&
+        'distances_m' in response.data
+      ) {
+        const heatmap: HeatmapPayload = response.data as HeatmapPayload
+        const runDate = moment(heatmap.start_date)
+
+        // each day is the number of days after the previous day with runs
+        heatmap.days.forEach((days: number, index: number) => {
+          runDate.add(days, 'days')
+          this.heatmap.value.push({
+            date: runDate.format('YYYY-MM-DD'),
+            distance_m: heatmap.distances_m[index],
+          })
+        })
+      }
+    })
+  }
+
+  public getSeries(
+    metric: string,
+    group_by: string,
+    start_date: string,
+    end_date: string,
+    points: number,
+  ): Promise<ResponsePayload | void> {
+    this.series.value = null
+
+    const url: string =
+      'api/runs/series?metric=' +
+      metric +
+      '&group_by=' +
+      group_by +
+      '&start_date=' +
+      start_date +
+      '&end_date=' +
+      end_date +
+      '&points=' +
+      points
+
+    return this.fetch(url, { method: 'GET' }).then((response: ResponsePayload | void) => {
+      if (
+        response &&
+        typeof response === 'object' &&
+        response.data &&
+        typeof response.data === 'object' &&
+        'dates' in response.data &&
+        'values' in response.data
+      ) {
+        this.series.value = response.data as SeriesPayload
+      }
+    })
+  }
 }
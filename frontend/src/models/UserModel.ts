@@ -1,7 +1,31 @@
 import { Model } from '@/models/Model.ts'
+import { StatusCodes } from 'http-status-codes'
+import type { ResponsePayload, UserPayload } from '@/types/types.d.ts'
 
 export class UserModel extends Model {
   public constructor() {
     super()
   }
+
+  public login(email: string, password: string): Promise<void> {
+    return this.save('api/auth/login', { email: email, password: password }).then(
+      (response: ResponsePayload) => {
+        this._store.user.login(response.data as UserPayload)
+      },
+    )
+  }
+
+  public logout(): Promise<void> {
+    return this.fetch('api/auth/logout', { method: 'POST' }).then(() => {
+      this._store.user.logout()
+    })
+  }
+
+  public getUser(): Promise<void> {
+    return this.fetch('api/auth/user', { method: 'GET' }).then((response: ResponsePayload) => {
+      if (response.status === StatusCodes.OK) {
+        this._store.user.login(response.data as UserPayload)
+      }
+    })
+  }
 }
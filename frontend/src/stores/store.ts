@@ -1,7 +1,7 @@
 import { type Reactive, reactive, type Ref, ref, type UnwrapRef } from 'vue'
 import { defineStore } from 'pinia'
 import { useLoadingState } from '@/composables/LoadingState.ts'
-import type { tUser } from '@/types/types.d.ts'
+import type { tUser, UserPayload } from '@/types/types.d.ts'
 
 export const store = defineStore('store', () => {
   const resync_runs: Ref<number> = ref(0)
@@ -9,15 +9,17 @@ export const store = defineStore('store', () => {
 
   const user: Reactive<UnwrapRef<tUser>> = reactive<tUser>({
     authenticated: false,
-    name: 'David',
+    name: '',
     registrationDate: '2025-01-01',
     get isAuthenticated(): boolean {
       return this.authenticated
     },
-    login(): void {
+    login(user: UserPayload): void {
+      this.name = user.full_name ?? user.email
       this.authenticated = true
     },
     logout(): void {
+      this.name = ''
       this.authenticated = false
     },
   })
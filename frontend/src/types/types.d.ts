@@ -20,6 +20,26 @@ export interface Run extends RunData {
 
 export type PersonalBests = Record<'title' | 'date' | 'time', string>
 
+export type HeatmapPayload = {
+  start_date: string
+  end_date: string
+  days: Array<number>
+  distances_m: Array<number>
+}
+
+export type HeatmapDay = {
+  date: string
+  distance_m: number
+}
+
+export type SeriesPayload = {
+  metric: string
+  method: string
+  total: number
+  dates: Array<string>
+  values: Array<number>
+}
+
 export type filterHistoryModelType = {
   viewChoices: string
   groupByChoices: string
@@ -30,12 +50,18 @@ export type ResponsePayload = {
   data: object | string | Array<object>
 }
 
+export type UserPayload = {
+  id: number
+  email: string
+  full_name: string | null
+}
+
 export type tUser = {
   name: string
   authenticated: boolean
   registrationDate: string
   isAuthenticated: boolean
-  login(): void
+  login(user: UserPayload): void
   logout(): void
 }
 